@@ -23,6 +23,7 @@ Requires:       kobo-rpmlib
 Requires:       koji
 Requires:       patternfly1
 Requires:       productmd >= 1.1
+Requires:       python-ijson
 Requires:       python-django-filter >= 0.9.2
 Requires:       python-ldap
 Requires:       python-markdown
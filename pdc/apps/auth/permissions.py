@@ -1,12 +1,107 @@
 import re
+import threading
+import time
+
 from restfw_composed_permissions.base import BasePermissionComponent, BaseComposedPermision
 from restfw_composed_permissions.generic.components import AllowAll
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models import signals
+from django.dispatch import receiver
 
-from pdc.apps.auth.models import Resource, GroupResourcePermission
+from pdc.apps.auth.models import Resource, ActionPermission, ResourcePermission, GroupResourcePermission
 from pdc.apps.utils.utils import read_permission_for_all
 
 
+class PermissionCache(object):
+    """
+    Process-wide cache of resources and of permissions granted to users via
+    their groups. Resources are kept per view with the regular expressions
+    in their names compiled. Both parts expire after `timeout` seconds so
+    that changes made by other processes are picked up, and are dropped
+    right away when related rows are changed in this process.
+    """
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._lock = threading.RLock()
+        self._resources = None
+        self._resources_expire = 0
+        self._users = {}
+
+    def clear(self):
+        with self._lock:
+            self._resources = None
+            self._users = {}
+
+    def _get_resources(self):
+        with self._lock:
+            if self._resources is None or self._resources_expire <= time.time():
+                resources = {}
+                for resource_id, name, view in Resource.objects.values_list('id', 'name', 'view'):
+                    try:
+                        regexp = re.compile(name)
+                    except re.error:
+                        regexp = None
+                    resources.setdefault(view, []).append((resource_id, name, regexp))
+                self._resources = resources
+                self._resources_expire = time.time() + self.timeout
+            return self._resources
+
+    def get_resource_id(self, view, api_name):
+        """
+        Find resource controlling access to given view and API path. Return
+        None if the view is not under permission control.
+        """
+        resources = self._get_resources().get(view, [])
+        if len(resources) == 1:
+            return resources[0][0]
+        # multiple api map to one view
+        for resource_id, name, _ in resources:
+            if name == api_name:
+                return resource_id
+        # maybe resource name is regexp
+        if len(api_name.split('/')) > 1:
+            for resource_id, _, regexp in resources:
+                if regexp and regexp.match(api_name):
+                    return resource_id
+        return None
+
+    def get_user_permissions(self, user):
+        """
+        Return set of (resource id, permission name) pairs granted to the
+        user by any of their groups.
+        """
+        if not user.pk:
+            return frozenset()
+        with self._lock:
+            expire, permissions = self._users.get(user.pk, (0, None))
+            if expire <= time.time():
+                permissions = frozenset(GroupResourcePermission.objects
+                                        .filter(group__user=user)
+                                        .values_list('resource_permission__resource_id',
+                                                     'resource_permission__permission__name'))
+                self._users[user.pk] = (time.time() + self.timeout, permissions)
+            return permissions
+
+
+PERMISSION_CACHE = PermissionCache(getattr(settings, 'PERMISSION_CACHE_SECONDS', 60))
+
+
+@receiver(signals.post_save, sender=Resource)
+@receiver(signals.post_delete, sender=Resource)
+@receiver(signals.post_save, sender=ActionPermission)
+@receiver(signals.post_delete, sender=ActionPermission)
+@receiver(signals.post_save, sender=ResourcePermission)
+@receiver(signals.post_delete, sender=ResourcePermission)
+@receiver(signals.post_save, sender=GroupResourcePermission)
+@receiver(signals.post_delete, sender=GroupResourcePermission)
+@receiver(signals.post_delete, sender=Group)
+@receiver(signals.m2m_changed, sender=get_user_model().groups.through)
+def _clear_permission_cache(**kwargs):
+    PERMISSION_CACHE.clear()
+
+
 class APIPermissionComponent(BasePermissionComponent):
     """
     Allow only anonymous requests.
@@ -23,40 +118,11 @@ class APIPermissionComponent(BasePermissionComponent):
         return self._has_permission(internal_permission, request.user, str(view.__class__), api_name)
 
     def _has_permission(self, internal_permission, user, view, api_name):
-        resources = Resource.objects.filter(view=view).all()
-        resource = None
-
-        if len(resources) == 1:
-            resource = resources[0]
-        elif len(resources) > 1:
-            # multiple api map to one view
-            resources = [obj for obj in Resource.objects.filter(view=view, name=api_name).all()]
-            if len(resources) == 1:
-                resource = resources[0]
-            else:
-                # maybe resouce name is regexp
-                resource = self._try_regexp_resource_match(api_name, resources)
-        if not resource:
+        resource_id = PERMISSION_CACHE.get_resource_id(view, api_name)
+        if resource_id is None:
             # not restrict access to resource that is not in permission control
-            result = True
-        else:
-            group_id_list = [group.id for group in user.groups.all()]
-            result = GroupResourcePermission.objects.filter(
-                group__id__in=group_id_list, resource_permission__resource=resource,
-                resource_permission__permission__name=internal_permission).exists()
-
-        return result
-
-    @staticmethod
-    def _try_regexp_resource_match(api_name, resources):
-        result = None
-        api_str_list = api_name.split('/')
-        if len(api_str_list) > 1 and resources:
-            for resource_obj in resources:
-                if re.match(resource_obj.name, api_name):
-                    result = resource_obj
-                    break
-        return result
+            return True
+        return (resource_id, internal_permission) in PERMISSION_CACHE.get_user_permissions(user)
 
     @staticmethod
     def _convert_permission(in_method):
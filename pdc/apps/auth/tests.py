@@ -17,6 +17,7 @@ from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
 
 from . import backends
+from .permissions import PERMISSION_CACHE
 from .models import Resource, ResourcePermission, GroupResourcePermission, ActionPermission
 from pdc.apps.common.test_utils import TestCaseWithChangeSetMixin
 
@@ -605,6 +606,23 @@ class GroupResourcePermissionsTestCase(APITestCase):
             response = self.client.get(url, format='json')
             self.assertNotEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_permission_cache(self):
+        view = "<class 'pdc.apps.component.views.ReleaseComponentViewSet'>"
+        resource_id = PERMISSION_CACHE.get_resource_id(view, 'release-components')
+        self.assertEqual(resource_id, Resource.objects.get(name='release-components').pk)
+        self.assertNotIn((resource_id, 'read'), PERMISSION_CACHE.get_user_permissions(self.user))
+        with self.assertNumQueries(0):
+            PERMISSION_CACHE.get_resource_id(view, 'release-components')
+            PERMISSION_CACHE.get_user_permissions(self.user)
+
+        GroupResourcePermission.objects.create(
+            group=self.group,
+            resource_permission=ResourcePermission.objects.get(resource__name='release-components',
+                                                               permission__name='read'))
+        self.assertIn((resource_id, 'read'), PERMISSION_CACHE.get_user_permissions(self.user))
+        self.group.user_set.remove(self.user)
+        self.assertNotIn((resource_id, 'read'), PERMISSION_CACHE.get_user_permissions(self.user))
+
     def test_delete_group_permission(self):
         # grant user's group read permission
         permission_url = reverse('groupresourcepermissions-list')
@@ -3,7 +3,10 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
+import json
+
 import django.forms.widgets as widgets
+from django.db.models import Q
 
 import django_filters
 
@@ -27,19 +30,24 @@ class ChangesetFilterSet(django_filters.FilterSet):
 
     @value_is_not_empty
     def filter_author(self, qs, value):
-        return qs.filter(author__username__in=value).distinct()
+        return qs.filter(author__username__in=value)
 
     @value_is_not_empty
     def filter_resource(self, qs, value):
-        return qs.filter(change__target_class__in=value).distinct()
+        # A subquery does not multiply the rows, so no distinct is needed.
+        changes = models.Change.objects.filter(target_class__in=value)
+        q = Q(pk__in=changes.values('changeset_id'))
+        for target_class in value:
+            q |= Q(archived=True, archive__target_classes__contains=json.dumps(target_class))
+        return qs.filter(q)
 
     @value_is_not_empty
     def filter_committed_since(self, qs, value):
-        return qs.filter(committed_on__gte=value).distinct()
+        return qs.filter(committed_on__gte=value)
 
     @value_is_not_empty
     def filter_committed_until(self, qs, value):
-        return qs.filter(committed_on__lte=value).distinct()
+        return qs.filter(committed_on__lte=value)
 
     class Meta:
         model = models.Changeset
@@ -0,0 +1,56 @@
+#
+# Copyright (c) 2015 Red Hat
+# Licensed under The MIT License (MIT)
+# http://opensource.org/licenses/MIT
+#
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from pdc.apps.changeset.models import Changeset, ChangesetArchive
+
+
+logger = logging.getLogger(__name__)
+
+
+def archive_changesets(days, batch_size, pause=0):
+    """
+    Archive changesets committed more than `days` ago. Each batch runs in its
+    own short transaction, so the command can be stopped at any time and run
+    again later. Returns the number of archived changesets.
+    """
+    horizon = timezone.now() - timedelta(days=days)
+    archived = 0
+    while True:
+        with transaction.atomic():
+            batch = list(Changeset.objects.filter(archived=False, committed_on__lt=horizon)
+                         .order_by('id')[:batch_size])
+            if not batch:
+                return archived
+            ChangesetArchive.archive(batch)
+        archived += len(batch)
+        logger.info('Archived %d changesets, last one is %s.' % (archived, batch[-1].pk))
+        if pause:
+            time.sleep(pause)
+
+
+class Command(BaseCommand):
+    help = 'Move changes of old changesets to compressed archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=getattr(settings, 'CHANGESET_ARCHIVE_DAYS', 365),
+                            help='Archive changesets older than this number of days.')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Number of changesets archived in one transaction.')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Number of seconds to wait between batches.')
+
+    def handle(self, *args, **options):
+        archived = archive_changesets(options['days'], max(1, options['batch_size']), options['pause'])
+        self.stdout.write('Archived %d changesets.' % archived)
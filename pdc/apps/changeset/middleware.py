@@ -8,6 +8,8 @@ import logging
 
 from datetime import datetime
 from django.db import transaction
+from pdc.apps.common.models import clear_lookup_caches
+from pdc.apps.utils.messaging import store_messages
 from . import models
 
 # trap wrong HTTP methods
@@ -91,10 +93,13 @@ class ChangesetMiddleware(object):
                         # done to database
                         request.changeset.reset()
                         transaction.set_rollback(True)
+                        clear_lookup_caches()
                     else:
                         request.changeset.commit()
+                        store_messages(request)
                         self._may_announce_big_change(request.changeset, request)
             except:
+                clear_lookup_caches()
                 # NOTE: catch all errors that were raised by view.
                 # And log the trace back to the file.
                 logger.error('View Function Error: %s', request.path,
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changeset', '0007_auto_20160714_1244'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='change',
+            name='compact',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def populate_latest_changes(apps, schema_editor):
+    Change = apps.get_model('changeset', 'Change')
+    LatestChange = apps.get_model('changeset', 'LatestChange')
+    latest = Change.objects.values('target_class').annotate(latest=models.Max('changeset'))
+    LatestChange.objects.bulk_create([LatestChange(target_class=item['target_class'],
+                                                   changeset_id=item['latest'])
+                                      for item in latest])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changeset', '0008_change_compact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestChange',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('target_class', models.CharField(unique=True, max_length=200)),
+                ('changeset', models.ForeignKey(to='changeset.Changeset')),
+            ],
+        ),
+        migrations.RunPython(populate_latest_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changeset', '0009_latestchange'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='changeset',
+            name='committed_on',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='changeset',
+            index_together=set([('author', 'committed_on')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='change',
+            index_together=set([('target_class', 'changeset')]),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changeset', '0010_changeset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeset',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ChangesetArchive',
+            fields=[
+                ('changeset', models.OneToOneField(related_name='archive', primary_key=True, serialize=False, to='changeset.Changeset')),
+                ('changes_count', models.PositiveIntegerField()),
+                ('target_classes', models.TextField()),
+                ('data', models.BinaryField()),
+            ],
+        ),
+    ]
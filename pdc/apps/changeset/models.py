@@ -3,9 +3,47 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
-from django.db import models
+import json
+import zlib
+
+from django.db import models, connection
+from django.db.models import Count
 from django.conf import settings
 
+from pdc.apps.common.hacks import bulk_insert_ignore
+
+
+def _make_diff(old_value, new_value):
+    """
+    Return JSON encoded difference between two JSON encoded objects. It lists
+    keys with changed or added values and removed keys. If either value is
+    not an object, `None` is returned.
+    """
+    try:
+        old, new = json.loads(old_value), json.loads(new_value)
+    except ValueError:
+        return None
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None
+    return json.dumps({
+        'set': dict((key, value) for key, value in new.iteritems()
+                    if key not in old or old[key] != value),
+        'unset': [key for key in old if key not in new],
+    })
+
+
+def _apply_diff(old_value, diff):
+    """
+    Rebuild JSON encoded new value from old value and a diff created by
+    `_make_diff`.
+    """
+    result = json.loads(old_value)
+    diff = json.loads(diff)
+    for key in diff['unset']:
+        result.pop(key, None)
+    result.update(diff['set'])
+    return json.dumps(result)
+
 
 class Changeset(models.Model):
     """
@@ -16,8 +54,15 @@ class Changeset(models.Model):
     """
     author = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True)
     requested_on = models.DateTimeField()
-    committed_on = models.DateTimeField(auto_now_add=True)
+    committed_on = models.DateTimeField(auto_now_add=True, db_index=True)
     comment = models.TextField(null=True, blank=True)
+    # Changes of archived changesets are stored in `ChangesetArchive`.
+    archived = models.BooleanField(default=False)
+
+    class Meta:
+        index_together = (
+            ('author', 'committed_on'),
+        )
 
     def __init__(self, *args, **kwargs):
         self.tmp_changes = []
@@ -50,17 +95,88 @@ class Changeset(models.Model):
         """
         Commit changeset into database. If there are no changes associated with
         this changeset, nothing will be savd.
+
+        The changes are inserted in batches. With `CHANGESET_COMPACT_STORAGE`
+        setting enabled, updates are stored as a difference against the old
+        value.
         """
         if self.tmp_changes:
             self.save()
+            compact = getattr(settings, 'CHANGESET_COMPACT_STORAGE', False)
             for change in self.tmp_changes:
                 change.changeset = self
-                change.save()
+                if compact:
+                    change.compact_new_value()
+            batch_size = min(getattr(settings, 'CHANGESET_COMMIT_BATCH_SIZE', 1000),
+                             connection.ops.bulk_batch_size(Change._meta.concrete_fields, self.tmp_changes))
+            Change.objects.bulk_create(self.tmp_changes, batch_size=max(batch_size, 1))
+            LatestChange.update(self, set(change.target_class for change in self.tmp_changes))
 
     @property
     def duration(self):
         return self.committed_on - self.requested_on
 
+    def get_changes(self):
+        """Return all changes of this changeset, including archived ones."""
+        if self.archived:
+            return self.archive.load_changes()
+        return list(self.change_set.order_by('id'))
+
+    def get_changes_preview(self):
+        """
+        Return at most `CHANGESET_MAX_CHANGES` changes of this changeset. All
+        of them can be listed via the changes sub-resource.
+        """
+        if not hasattr(self, '_changes_preview'):
+            Changeset.prefetch_changes([self])
+        return self._changes_preview
+
+    def get_changes_count(self):
+        if not hasattr(self, '_changes_count'):
+            Changeset.prefetch_changes_count([self])
+        return self._changes_count
+
+    @staticmethod
+    def prefetch_changes_count(changesets):
+        """
+        Load number of changes of all given changesets for
+        `get_changes_count` with at most two queries.
+        """
+        pks = [changeset.pk for changeset in changesets if not changeset.archived]
+        counts = dict(Change.objects.filter(changeset__in=pks).order_by()
+                      .values_list('changeset').annotate(count=Count('id')))
+        archived = [changeset.pk for changeset in changesets if changeset.archived]
+        if archived:
+            counts.update(ChangesetArchive.objects.filter(changeset__in=archived)
+                          .values_list('changeset', 'changes_count'))
+        for changeset in changesets:
+            changeset._changes_count = counts.get(changeset.pk, 0)
+
+    @staticmethod
+    def prefetch_changes(changesets):
+        """
+        Load changes of all given changesets for `get_changes_preview`. The
+        changesets with at most `CHANGESET_MAX_CHANGES` changes are loaded by
+        one query, larger ones by one limited query each.
+        """
+        limit = getattr(settings, 'CHANGESET_MAX_CHANGES', 1000)
+        Changeset.prefetch_changes_count(changesets)
+        changes = {}
+        archived = [changeset.pk for changeset in changesets if changeset.archived]
+        if archived:
+            for archive in ChangesetArchive.objects.filter(changeset__in=archived):
+                changes[archive.changeset_id] = archive.load_changes()[:limit]
+        pks = [changeset.pk for changeset in changesets if not changeset.archived]
+        counts = dict((changeset.pk, changeset._changes_count) for changeset in changesets)
+        small = [pk for pk in pks if counts[pk] <= limit]
+        for change in Change.objects.filter(changeset__in=small).order_by('id'):
+            changes.setdefault(change.changeset_id, []).append(change)
+        for pk in pks:
+            if counts[pk] > limit:
+                changes[pk] = list(Change.objects.filter(changeset=pk).order_by('id')[:limit])
+        for changeset in changesets:
+            changeset._changes_preview = changes.get(changeset.pk, [])
+
 
 class Change(models.Model):
     changeset = models.ForeignKey(Changeset)
@@ -68,10 +184,39 @@ class Change(models.Model):
     target_id = models.PositiveIntegerField()
     old_value = models.TextField()
     new_value = models.TextField()
+    # New value is stored as a difference against the old value. The full
+    # value is rebuilt when the change is loaded from database.
+    compact = models.BooleanField(default=False)
+
+    class Meta:
+        index_together = (
+            ('target_class', 'changeset'),
+        )
 
     def __unicode__(self):
         return u"change-%s" % self.id
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Change, cls).from_db(db, field_names, values)
+        loaded = instance.__dict__
+        if loaded.get('compact') and 'old_value' in loaded and 'new_value' in loaded:
+            instance.new_value = _apply_diff(instance.old_value, instance.new_value)
+            instance.compact = False
+        return instance
+
+    def compact_new_value(self):
+        """
+        Replace new value with a difference against the old value if that is
+        shorter. Only updates of objects can be stored this way.
+        """
+        if self.compact or not self.is_update():
+            return
+        diff = _make_diff(self.old_value, self.new_value)
+        if diff is not None and len(diff) < len(self.new_value):
+            self.new_value = diff
+            self.compact = True
+
     def is_insert(self):
         """Check if a change is an insertion."""
         return self.old_value == 'null' and self.new_value != 'null'
@@ -83,3 +228,73 @@ class Change(models.Model):
     def is_update(self):
         """Check if a change is an update."""
         return self.old_value != 'null' and self.new_value != 'null'
+
+
+class LatestChange(models.Model):
+    """
+    The most recent changeset for each target class. It is updated whenever
+    a changeset is committed, so that time of last modification of a
+    resource can be found without searching through all the changes.
+    """
+    target_class = models.CharField(max_length=200, unique=True)
+    changeset = models.ForeignKey(Changeset)
+
+    def __unicode__(self):
+        return u"%s-%s" % (self.target_class, self.changeset_id)
+
+    @staticmethod
+    def update(changeset, target_classes):
+        """
+        Mark `changeset` as the latest one for all given target classes.
+        """
+        bulk_insert_ignore(connection.cursor(), LatestChange._meta.db_table,
+                           ['target_class', 'changeset_id'],
+                           [(target_class, changeset.pk) for target_class in target_classes])
+        # A concurrent commit of a newer changeset must not be overwritten.
+        LatestChange.objects.filter(target_class__in=target_classes,
+                                    changeset_id__lt=changeset.pk).update(changeset=changeset)
+
+
+class ChangesetArchive(models.Model):
+    """
+    Changes of an old changeset compressed into a single row. The changeset
+    itself stays in place (marked as archived) and the changes are deleted
+    from the `Change` table, which keeps that table small.
+    """
+    changeset = models.OneToOneField(Changeset, primary_key=True, related_name='archive')
+    changes_count = models.PositiveIntegerField()
+    # JSON list of target classes of the changes, used for filtering.
+    target_classes = models.TextField()
+    # zlib compressed JSON list of [id, target_class, target_id, old_value, new_value].
+    data = models.BinaryField()
+
+    def __unicode__(self):
+        return u"archive-%s" % self.changeset_id
+
+    def load_changes(self):
+        """Return the archived changes as (unsaved) `Change` instances."""
+        return [Change(id=pk, changeset_id=self.changeset_id, target_class=target_class,
+                       target_id=target_id, old_value=old_value, new_value=new_value)
+                for pk, target_class, target_id, old_value, new_value
+                in json.loads(zlib.decompress(bytes(self.data)))]
+
+    @staticmethod
+    def archive(changesets):
+        """
+        Move changes of given changesets to the archive. This should run in a
+        transaction.
+        """
+        pks = [changeset.pk for changeset in changesets]
+        changes = {}
+        for change in Change.objects.filter(changeset__in=pks).order_by('id'):
+            changes.setdefault(change.changeset_id, []).append(
+                [change.pk, change.target_class, change.target_id, change.old_value, change.new_value])
+        ChangesetArchive.objects.bulk_create([
+            ChangesetArchive(changeset_id=pk,
+                             changes_count=len(changes.get(pk, [])),
+                             target_classes=json.dumps(sorted(set(c[1] for c in changes.get(pk, [])))),
+                             data=zlib.compress(json.dumps(changes.get(pk, []))))
+            for pk in pks
+        ])
+        Change.objects.filter(changeset__in=pks).delete()
+        Changeset.objects.filter(pk__in=pks).update(archived=True)
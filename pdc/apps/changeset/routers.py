@@ -9,3 +9,5 @@ from pdc.apps.utils.SortedRouter import router
 
 
 router.register(r'changesets', views.ChangesetViewSet)
+router.register(r'changesets/(?P<changeset_id>[^/]+)/changes', views.ChangesetChangeViewSet,
+                base_name='changesetchange')
@@ -3,6 +3,7 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
+from django.db import models
 from rest_framework import serializers
 
 from pdc.apps.common.serializers import StrictSerializerMixin
@@ -18,10 +19,23 @@ class ChangeSerializer(StrictSerializerMixin, serializers.ModelSerializer):
         fields = ('resource', 'resource_id', 'old_value', 'new_value')
 
 
+class ChangesetListSerializer(serializers.ListSerializer):
+    """
+    Load changes of all serialized changesets at once.
+    """
+    def to_representation(self, data):
+        changesets = list(data.all() if isinstance(data, models.Manager) else data)
+        Changeset.prefetch_changes(changesets)
+        return super(ChangesetListSerializer, self).to_representation(changesets)
+
+
 class ChangesetSerializer(StrictSerializerMixin, serializers.ModelSerializer):
     author = serializers.StringRelatedField(read_only=True)
-    changes = ChangeSerializer(source='change_set', many=True, read_only=True)
+    changes = ChangeSerializer(source='get_changes_preview', many=True, read_only=True)
+    changes_count = serializers.IntegerField(source='get_changes_count', read_only=True)
 
     class Meta:
         model = Changeset
-        fields = ('id', 'author', 'requested_on', 'committed_on', 'duration', 'changes', 'comment')
+        fields = ('id', 'author', 'requested_on', 'committed_on', 'duration', 'changes', 'changes_count',
+                  'comment')
+        list_serializer_class = ChangesetListSerializer
@@ -3,15 +3,21 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
+import json
+from StringIO import StringIO
+
 from mock import Mock, call, patch
 
+from django.core.management import call_command
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.core.urlresolvers import reverse
 
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from .middleware import ChangesetMiddleware
+from .models import Changeset, Change, LatestChange
 from .middleware import logger as changeset_logger
 
 
@@ -49,6 +55,44 @@ class ChangesetMiddlewareTestCase(TestCase):
             self.assertTrue(changeset_logger.error.called)
 
 
+class ChangesetCommitTestCase(TestCase):
+    @override_settings(CHANGESET_COMMIT_BATCH_SIZE=100)
+    def test_commit_changes_in_batches(self):
+        changeset = Changeset(requested_on='2015-01-01T00:00:00Z')
+        for i in range(250):
+            changeset.add('Label', i, 'null', '{"name": "label-%d"}' % i)
+        # One query for changeset, one for each batch of changes and two for
+        # marking the latest changeset of the label class.
+        with self.assertNumQueries(6):
+            changeset.commit()
+        self.assertEqual(changeset.change_set.count(), 250)
+
+    def test_older_changeset_does_not_replace_latest_change(self):
+        older = Changeset(requested_on='2015-01-01T00:00:00Z')
+        older.add('Label', 1, 'null', '{"name": "label-1"}')
+        older.save()
+        newer = Changeset(requested_on='2015-01-01T00:00:00Z')
+        newer.add('Label', 2, 'null', '{"name": "label-2"}')
+        newer.commit()
+        LatestChange.update(older, ['label'])
+        self.assertEqual(LatestChange.objects.get(target_class='label').changeset, newer)
+
+    @override_settings(CHANGESET_COMPACT_STORAGE=True)
+    def test_compact_storage(self):
+        old_value = '{"name": "bash", "description": "%s", "removed": 1}' % ('x' * 100)
+        new_value = '{"name": "zsh", "description": "%s"}' % ('x' * 100)
+        changeset = Changeset(requested_on='2015-01-01T00:00:00Z')
+        changeset.add('Label', 1, old_value, new_value)
+        changeset.add('Label', 2, 'null', new_value)
+        changeset.commit()
+        stored = dict(Change.objects.values_list('target_id', 'compact'))
+        self.assertEqual(stored, {1: True, 2: False})
+        changes = dict((change.target_id, change) for change in changeset.change_set.all())
+        self.assertEqual(json.loads(changes[1].old_value), json.loads(old_value))
+        self.assertEqual(json.loads(changes[1].new_value), json.loads(new_value))
+        self.assertEqual(changes[2].new_value, new_value)
+
+
 class ChangesetRESTTestCase(APITestCase):
     fixtures = ['pdc/apps/changeset/fixtures/tests/changeset.json',
                 "pdc/apps/component/fixtures/tests/bugzilla_component.json"]
@@ -61,6 +105,54 @@ class ChangesetRESTTestCase(APITestCase):
         self.assertEqual(len(response.data.get('changes')), 2)
         self.assertEqual(response.data.get("id"), 1)
 
+    @override_settings(CHANGESET_MAX_CHANGES=1)
+    def test_large_changeset_is_truncated(self):
+        response = self.client.get(reverse('changeset-detail', args=[1]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['changes']), 1)
+        self.assertEqual(response.data['changes_count'], 2)
+
+        response = self.client.get(reverse('changesetchange-list', args=[1]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_list_changes_of_nonexisting_changeset(self):
+        response = self.client.get(reverse('changesetchange-list', args=[999]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_archived_changesets_are_still_available(self):
+        url = reverse('changeset-detail', args=[1])
+        expected = self.client.get(url, format='json').data
+        call_command('archive_changesets', stdout=StringIO())
+        self.assertEqual(Change.objects.count(), 0)
+        self.assertTrue(Changeset.objects.get(pk=1).archived)
+
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected)
+        response = self.client.get(reverse('changesetchange-list', args=[1]), format='json')
+        self.assertEqual(response.data['count'], 2)
+        ids = [change['resource_id'] for change in response.data['results']]
+        response = self.client.get(reverse('changesetchange-list', args=[1]),
+                                   {'cursor': '', 'page_size': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([change['resource_id'] for change in response.data['results']], ids[:1])
+        response = self.client.get(response.data['next'], format='json')
+        self.assertEqual([change['resource_id'] for change in response.data['results']], ids[1:])
+        self.assertIsNone(response.data['next'])
+        response = self.client.get(response.data['previous'], format='json')
+        self.assertEqual([change['resource_id'] for change in response.data['results']], ids[:1])
+        response = self.client.get(reverse('changeset-list') + '?resource=contact', format='json')
+        self.assertEqual([changeset['id'] for changeset in response.data['results']], [1])
+
+    def test_html_list_shows_number_of_changes(self):
+        call_command('archive_changesets', stdout=StringIO())
+        response = self.client.get(reverse('changeset/list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = dict((changeset.pk, changeset.get_changes_count())
+                      for changeset in response.context['changeset_list'])
+        self.assertEqual(counts[1], 2)
+
     def test_list_order(self):
         url = reverse('changeset-list')
         response = self.client.get(url, format='json')
@@ -5,16 +5,18 @@
 #
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from django.views.generic import ListView, DetailView
 
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 
 from pdc.apps.auth.permissions import APIPermission
-from pdc.apps.common.viewsets import StrictQueryParamMixin
+from pdc.apps.common.viewsets import StrictQueryParamMixin, StreamingListModelMixin
 from . import models
 from .filters import ChangesetFilterSet
-from .serializers import ChangesetSerializer
+from .serializers import ChangesetSerializer, ChangeSerializer
 
 
 class ChangesetListView(ListView):
@@ -24,6 +26,11 @@ class ChangesetListView(ListView):
     context_object_name = 'changeset_list'
     paginate_by = settings.ITEMS_PER_PAGE
 
+    def get_context_data(self, **kwargs):
+        context = super(ChangesetListView, self).get_context_data(**kwargs)
+        models.Changeset.prefetch_changes_count(context['changeset_list'])
+        return context
+
 
 class ChangesetDetailView(DetailView):
     model = models.Changeset
@@ -32,6 +39,7 @@ class ChangesetDetailView(DetailView):
 
 
 class ChangesetViewSet(StrictQueryParamMixin,
+                       StreamingListModelMixin,
                        viewsets.ReadOnlyModelViewSet):
     """
     PDC tracks every modification that was made through any of the API
@@ -54,6 +62,14 @@ class ChangesetViewSet(StrictQueryParamMixin,
     following for more details. The access to this data is read-only. It is
     possible to either request all changesets satisfying given criteria, or
     view detail of a particular changeset.
+
+    Changesets with a lot of changes only include the first changes (see
+    `changes_count` for the total). All the changes can be listed at
+    $LINK:changesetchange-list:changeset_id$.
+
+    Changes of old changesets are archived (see `archive_changesets`
+    management command). They are still returned by this API, only loaded
+    from the archive.
     """
 
     def list(self, request, *args, **kwargs):
@@ -109,6 +125,7 @@ class ChangesetViewSet(StrictQueryParamMixin,
                                     "new_value": "new"
                                 }
                             ],
+                            "changes_count": 1,
                             "comment": "xxx"
                         }
                     },
@@ -139,6 +156,7 @@ class ChangesetViewSet(StrictQueryParamMixin,
                                     "new_value": "new"
                                 }
                             ],
+                            "changes_count": 1,
                             "comment": "xxx"
                         }
                 ]
@@ -182,6 +200,7 @@ class ChangesetViewSet(StrictQueryParamMixin,
                        "new_value": "new"
                    }
                 ],
+                "changes_count": 1,
                 "comment": "xxx"
             }
         """
@@ -191,3 +210,43 @@ class ChangesetViewSet(StrictQueryParamMixin,
     queryset = models.Changeset.objects.all().order_by('-committed_on')
     filter_class = ChangesetFilterSet
     permission_classes = (APIPermission,)
+
+
+class ChangesetChangeViewSet(StrictQueryParamMixin,
+                             StreamingListModelMixin,
+                             viewsets.GenericViewSet):
+    """
+    All changes of a changeset. The changeset API only includes first changes
+    of large changesets, this end-point lists all of them.
+    """
+    serializer_class = ChangeSerializer
+    queryset = models.Change.objects.all().order_by('id')
+    permission_classes = (APIPermission,)
+
+    def get_queryset(self):
+        changeset_id = self.kwargs['changeset_id']
+        if not changeset_id.isdigit():
+            raise Http404('Changeset %s does not exist.' % changeset_id)
+        changeset = get_object_or_404(models.Changeset, pk=changeset_id)
+        if changeset.archived:
+            return changeset.get_changes()
+        return self.queryset.filter(changeset=changeset)
+
+    def filter_queryset(self, queryset):
+        if isinstance(queryset, list):
+            # Archived changes are not in database.
+            return queryset
+        return super(ChangesetChangeViewSet, self).filter_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        """
+        __Method__:
+        GET
+
+        __URL__: $LINK:changesetchange-list:changeset_id$
+
+        __Response__: a paged list of following objects
+
+        %(SERIALIZER)s
+        """
+        return super(ChangesetChangeViewSet, self).list(request, *args, **kwargs)
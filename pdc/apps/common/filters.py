@@ -5,11 +5,14 @@
 # http://opensource.org/licenses/MIT
 #
 import functools
+import re
+import time
 
 from django import forms
 from django.core.exceptions import ValidationError
 from django.core.validators import EMPTY_VALUES
-from django.db.models import Q
+from django.db import connections
+from django.db.models import Q, sql
 from django.utils import six
 from django_filters.filterset import (BaseFilterSet,
                                       FilterSet,
@@ -73,12 +76,110 @@ class MultiValueCaseInsensitiveFilter(MultiValueFilter):
         return qs
 
 
+# Ways of evaluating a regular expression filter, from the cheapest one.
+REGEX_FILTER_STRATEGIES = ('exact', 'prefix', 'substring', 'regex')
+
+# Literal substrings shorter than this can not use trigram index.
+MIN_SUBSTRING_LENGTH = 3
+
+_LITERAL_RE = re.compile(r'^(\^?)((?:[^\\.^$*+?()\[\]{}|]|\\[^A-Za-z0-9])*)(\.\*)?(\$?)$')
+
+_regex_filter_stats = dict((strategy, {'queries': 0, 'seconds': 0.0}) for strategy in REGEX_FILTER_STRATEGIES)
+
+
+def analyze_regexp(pattern):
+    """
+    Find out how a regular expression can be evaluated. Returns a tuple of
+    strategy and literal string. Patterns like `^abc$` are `exact` matches,
+    `^abc` (optionally followed by `.*`) are `prefix` matches and plain
+    literals are `substring` matches. Everything else needs `regex`.
+    """
+    m = _LITERAL_RE.match(pattern)
+    if not m:
+        return 'regex', pattern
+    anchored, literal, any_suffix, end = m.groups()
+    literal = re.sub(r'\\(.)', r'\1', literal)
+    if anchored and end and not any_suffix:
+        return 'exact', literal
+    if anchored:
+        return 'prefix', literal
+    if not end and len(literal) >= MIN_SUBSTRING_LENGTH:
+        return 'substring', literal
+    return 'regex', pattern
+
+
+def get_regex_filter_stats():
+    """
+    Return number of queries using regular expression filters and time spent
+    evaluating them, per the most expensive strategy used in the query.
+    """
+    return dict((strategy, dict(stats)) for strategy, stats in _regex_filter_stats.iteritems())
+
+
+def reset_regex_filter_stats():
+    for stats in _regex_filter_stats.itervalues():
+        stats['queries'] = 0
+        stats['seconds'] = 0.0
+
+
+class RegexTimedQuery(sql.Query):
+    """
+    Query that adds time spent on its execution to statistics of regular
+    expression filter strategy stored in its context.
+    """
+    def get_compiler(self, using=None, connection=None):
+        compiler = super(RegexTimedQuery, self).get_compiler(using, connection)
+        strategy = self.get_context('regex_filter_strategy')
+        if not strategy:
+            return compiler
+        execute_sql = compiler.execute_sql
+
+        def timed_execute_sql(*args, **kwargs):
+            start = time.time()
+            try:
+                return execute_sql(*args, **kwargs)
+            finally:
+                _regex_filter_stats[strategy]['queries'] += 1
+                _regex_filter_stats[strategy]['seconds'] += time.time() - start
+
+        compiler.execute_sql = timed_execute_sql
+        return compiler
+
+
 class MultiValueRegexFilter(MultiValueFilter):
     """
     Filter that allows multiple terms to be present and treats them as
     alternatives with  regular expression match,
     i.e. it performs OR search.
+
+    Patterns that are in fact exact values, prefixes or literal substrings
+    are looked up without regular expression, so that database indexes can
+    be used (btree with pattern ops for prefixes, trigram index for
+    substrings where available). Prefixes and substrings are looked up this
+    way only on backends where the lookups are case-sensitive, the same as
+    the regular expression.
     """
+    lookups = {
+        'exact': '',
+        'prefix': '__startswith',
+        'substring': '__contains',
+        'regex': '__regex',
+    }
+    # SQLite uses LIKE, which ignores case.
+    case_sensitive_like_vendors = ('postgresql', 'mysql')
+
+    def _get_condition(self, vendor, pattern):
+        """Return strategy and condition for matching the pattern."""
+        strategy, term = analyze_regexp(pattern)
+        if strategy in ('prefix', 'substring') and vendor not in self.case_sensitive_like_vendors:
+            strategy, term = 'regex', pattern
+        condition = Q(**{self.name + self.lookups[strategy]: term})
+        if strategy == 'exact' and vendor == 'mysql':
+            # Equality ignores case in default MySQL collations, LIKE BINARY
+            # of the same value does not.
+            condition &= Q(**{self.name + '__startswith': term})
+        return strategy, condition
+
     @value_is_not_empty
     def filter(self, qs, value):
         if value:
@@ -86,9 +187,19 @@ class MultiValueRegexFilter(MultiValueFilter):
                 if not is_valid_regexp(i):
                     raise ValidationError('At least one parameter is invalid regular expression: %s' % str(i))
             condition_list = []
+            # Another regular expression filter may have been applied already.
+            strategies = set(filter(None, [qs.query.get_context('regex_filter_strategy')]))
+            vendor = connections[qs.db].vendor
             for i in value:
-                condition_list.append(Q(**{self.name + '__regex': i}))
+                strategy, condition = self._get_condition(vendor, i)
+                strategies.add(strategy)
+                condition_list.append(condition)
             qs = qs.filter(reduce(operator.or_, condition_list))
+            # Queries of other classes are not timed, so that they are kept.
+            if type(qs.query) is sql.Query:
+                qs.query = qs.query.clone(klass=RegexTimedQuery)
+            qs.query.add_context('regex_filter_strategy',
+                                 max(strategies, key=REGEX_FILTER_STRATEGIES.index))
             if self.distinct:
                 qs = qs.distinct()
         else:
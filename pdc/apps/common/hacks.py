@@ -6,7 +6,8 @@
 #
 import re
 
-from django.db import connection
+from django.db import connection, transaction
+from django.db.utils import IntegrityError
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from rest_framework import serializers
@@ -45,6 +46,57 @@ def add_returning(sql):
     return sql + add_returning._returning
 
 
+def _insert_ignore_template(table, columns):
+    """
+    Return SQL template for a multi-row INSERT that silently skips rows
+    violating a unique constraint, or None if the backend has no such syntax.
+    The template contains a `%s` placeholder for the VALUES rows.
+    """
+    head = "INTO %s (%s) VALUES %%s" % (table, ', '.join(columns))
+    if connection.vendor == 'postgresql' and connection.pg_version >= 90500:
+        return "INSERT " + head + " ON CONFLICT DO NOTHING"
+    if connection.vendor == 'sqlite':
+        return "INSERT OR IGNORE " + head
+    if connection.vendor == 'mysql':
+        return "INSERT IGNORE " + head
+    return None
+
+
+def bulk_insert_ignore(cursor, table, columns, rows, batch_size=1000):
+    """
+    Insert `rows` (a list of tuples matching `columns`) into `table` with
+    multi-row INSERT statements. Rows that would violate a unique constraint
+    are skipped. Ids of inserted rows are not returned; callers need to look
+    them up by their natural key.
+
+    On backends without native support for ignoring conflicts, each batch is
+    tried in a savepoint and inserted row by row if it fails.
+    """
+    template = _insert_ignore_template(table, columns)
+    row_sql = '(%s)' % ', '.join(['%s'] * len(columns))
+    batch_size = max(1, min(batch_size, connection.ops.bulk_batch_size(columns, rows)))
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        params = [value for row in batch for value in row]
+        if template:
+            cursor.execute(template % ', '.join([row_sql] * len(batch)), params)
+            continue
+        sql = "INSERT INTO %s (%s) VALUES %%s" % (table, ', '.join(columns))
+        sid = transaction.savepoint()
+        try:
+            cursor.execute(sql % ', '.join([row_sql] * len(batch)), params)
+            transaction.savepoint_commit(sid)
+        except IntegrityError:
+            transaction.savepoint_rollback(sid)
+            for row in batch:
+                sid = transaction.savepoint()
+                try:
+                    cursor.execute(sql % row_sql, list(row))
+                    transaction.savepoint_commit(sid)
+                except IntegrityError:
+                    transaction.savepoint_rollback(sid)
+
+
 def bool_from_native(value):
     """Convert value to bool."""
     if value in ('false', 'f', 'False', '0'):
@@ -106,6 +158,15 @@ def srpm_name_to_component_names(srpm_name):
         return [srpm_name]
 
 
+def encode_sortable_int(value):
+    """
+    Encode non-negative integer as a string of digits. Ordering of the
+    strings matches ordering of the numbers.
+    """
+    digits = str(value)
+    return '%02d%s' % (len(digits), digits)
+
+
 def parse_epoch_version(version):
     """
     Wrapper around `pkg_resources.parse_version` that can handle epochs
@@ -6,24 +6,137 @@
 #
 
 
+import threading
+from collections import OrderedDict
+
 from django.db import models
+from django.db.models import signals
 
 from pdc.apps.common.validators import validate_sigkey
 
 
-def get_cached_id(cls, cache_field, value, create=False):
-    """cached `value` to database `id`"""
-    if not value:
-        return None
-    result = cls.CACHE.get(value, None)
-    if result is None:
+# All lookup caches created in this process.
+LOOKUP_CACHES = []
+
+
+class LookupCache(object):
+    """
+    Process-wide cache translating a unique field of a lookup model to
+    database id. It is used by assigning it to `CACHE` attribute of the model
+    class.
+
+    Without `max_size`, the whole table is loaded on first use. With
+    `max_size`, values are loaded one at a time and the least recently used
+    ones are evicted. Entries of saved or deleted instances are dropped via
+    model signals. Values missing from the cache are always looked up in the
+    database, so rows created by other processes are found as well.
+    """
+    def __init__(self, field, max_size=None):
+        self.field = field
+        self.max_size = max_size
+        self.model = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._ids = None
+        self._values = {}
+
+    def contribute_to_class(self, cls, name):
+        self.model = cls
+        setattr(cls, name, self)
+        LOOKUP_CACHES.append(self)
+        signals.post_save.connect(self._invalidate, sender=cls, weak=False)
+        signals.post_delete.connect(self._invalidate, sender=cls, weak=False)
+
+    def _invalidate(self, instance, **kwargs):
+        with self._lock:
+            self._discard(getattr(instance, self.field), self._values.get(instance.pk))
+
+    def _discard(self, *values):
+        if self._ids is None:
+            return
+        for value in values:
+            pk = self._ids.pop(value, None)
+            self._values.pop(pk, None)
+
+    def _load(self):
+        self._values = {}
+        if self.max_size:
+            self._ids = OrderedDict()
+            return
+        self._ids = dict(self.model.objects.values_list(self.field, 'id'))
+        self._values = dict((pk, value) for value, pk in self._ids.iteritems())
+
+    def _store(self, value, pk):
+        if self._ids is None:
+            return
+        self._discard(value, self._values.get(pk))
+        self._ids[value] = pk
+        self._values[pk] = value
+        if self.max_size and len(self._ids) > self.max_size:
+            _, evicted = self._ids.popitem(last=False)
+            self._values.pop(evicted, None)
+
+    def get_id(self, value, create=False):
+        """
+        Return id of object with given value. If there is no such object, it
+        is created if `create` is true, otherwise `DoesNotExist` is raised.
+        Empty value is translated to `None`.
+        """
+        if not value:
+            return None
+        with self._lock:
+            if self._ids is None:
+                self._load()
+            pk = self._ids.get(value)
+            if pk is not None:
+                self.hits += 1
+                if self.max_size:
+                    # Mark as recently used.
+                    self._ids[value] = self._ids.pop(value)
+                return pk
+            self.misses += 1
         if create:
-            obj, _ = cls.objects.get_or_create(**{cache_field: value})
+            obj, _ = self.model.objects.get_or_create(**{self.field: value})
         else:
-            obj = cls.objects.get(**{cache_field: value})
-        cls.CACHE[value] = obj.id
-        result = obj.id
-    return result
+            obj = self.model.objects.get(**{self.field: value})
+        with self._lock:
+            self._store(value, obj.pk)
+        return obj.pk
+
+    def clear(self):
+        with self._lock:
+            self._ids = None
+            self._values = {}
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._ids or ())}
+
+
+def clear_lookup_caches():
+    """
+    Drop content of all lookup caches. This is needed after a transaction is
+    rolled back, as the caches may contain ids of rows that were not
+    committed.
+    """
+    for cache in LOOKUP_CACHES:
+        cache.clear()
+
+
+def get_lookup_cache_stats():
+    """
+    Return hit and miss counters and current size of each lookup cache as a
+    dict keyed by `app_label.ModelName`.
+    """
+    return dict(('%s.%s' % (cache.model._meta.app_label, cache.model._meta.object_name), cache.stats())
+                for cache in LOOKUP_CACHES)
+
+
+def get_cached_id(cls, value, create=False):
+    """cached `value` to database `id`"""
+    return cls.CACHE.get_id(value, create=create)
 
 
 class Arch(models.Model):
@@ -35,6 +148,13 @@ class Arch(models.Model):
     def __unicode__(self):
         return u"%s" % (self.name, )
 
+    CACHE = LookupCache('name')
+
+    @classmethod
+    def get_cached_id(cls, value):
+        """cached `name` to `id`"""
+        return get_cached_id(cls, value)
+
     def export(self):
         # FIXME: export has been deprecated, use serializer instead.
         return {"name": self.name}
@@ -48,12 +168,12 @@ class SigKey(models.Model):
     def __unicode__(self):
         return u"%s" % self.key_id
 
-    CACHE = {}
+    CACHE = LookupCache('key_id')
 
     @classmethod
     def get_cached_id(cls, value, create=False):
         """cached `key_id` to `id`"""
-        return get_cached_id(cls, "key_id", value, create=create)
+        return get_cached_id(cls, value, create=create)
 
     def export(self):
         return {
@@ -3,14 +3,126 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
+import base64
+import binascii
+import json
 import os
+from collections import OrderedDict
 
 from django.conf import settings
+from django.core.exceptions import FieldError, FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q, QuerySet
 
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _resolve_ordering_field(model, name):
+    """
+    Convert name of field used for ordering to a name that can be used for
+    keyset comparisons, i.e. relations are replaced by primary key of the
+    related model. Raise `FieldError` if the field does not exist or if it
+    goes through a relation with multiple items (the position of an item
+    would not be unique then).
+    """
+    parts = name.split('__')
+    for i, part in enumerate(parts):
+        if part == 'pk':
+            return name
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            raise FieldError('Cursor pagination can not order by %s.' % name)
+        if not field.is_relation:
+            return name
+        if field.many_to_many or field.one_to_many:
+            raise FieldError('Cursor pagination can not order by %s.' % name)
+        model = field.related_model
+        if i == len(parts) - 1:
+            return name + '__pk'
+    return name
+
+
+def _get_position(instance, field):
+    value = instance
+    for part in field.split('__'):
+        if value is None:
+            break
+        value = getattr(value, part)
+    return value
+
+
+def get_keyset_ordering(queryset):
+    """
+    Return ordering of the queryset with primary key appended so that each
+    item has a unique position. Raise `FieldError` if the ordering can not be
+    used for keyset pagination.
+    """
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+    result = []
+    for field in ordering:
+        if not isinstance(field, basestring) or field == '?':
+            raise FieldError('Cursor pagination can not order by %s.' % field)
+        prefix = '-' if field.startswith('-') else ''
+        name = _resolve_ordering_field(queryset.model, field.lstrip('-'))
+        result.append(prefix + ('pk' if name == 'id' else name))
+    if not result or result[-1].lstrip('-') != 'pk':
+        result.append('pk')
+    return result
+
+
+def get_keyset_position(instance, ordering):
+    """Return values of ordering fields of given instance."""
+    return [_get_position(instance, field.lstrip('-')) for field in ordering]
+
+
+def _keyset_condition(name, value, greater):
+    """
+    Build condition for values of field `name` greater (or lesser) than
+    `value`. NULL values are placed the same way the database orders them.
+    """
+    nulls_largest = connection.features.nulls_order_largest
+    if value is None:
+        if greater == nulls_largest:
+            return None
+        return Q(**{name + '__isnull': False})
+    condition = Q(**{name + ('__gt' if greater else '__lt'): value})
+    if greater == nulls_largest:
+        condition |= Q(**{name + '__isnull': True})
+    return condition
+
+
+def keyset_filter(ordering, position, reverse=False):
+    """
+    Build condition selecting items following the `position` (or preceding
+    it if `reverse` is true) in given ordering.
+    """
+    result = Q()
+    equal = Q()
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        condition = _keyset_condition(name, value, field.startswith('-') == reverse)
+        if condition is not None:
+            result |= equal & condition
+        if value is None:
+            equal &= Q(**{name + '__isnull': True})
+        else:
+            equal &= Q(**{name: value})
+    return result
 
 
 class AutoDetectedPageNumberPagination(pagination.PageNumberPagination):
+    """
+    Page number pagination with optional cursor mode. When `cursor` query
+    parameter is present (its value is empty for first page), results are
+    filtered by the position of last seen item instead of using an offset
+    and the total count is not computed. Lists that are not querysets can be
+    paginated with cursor only if they are sorted by primary key.
+    """
     template = os.path.join(os.path.dirname(__file__), 'templates/browsable_api/numbers.html')
     page_size = getattr(settings, 'REST_API_PAGE_SIZE', 20)
     page_size_query_param = getattr(settings,
@@ -19,6 +131,8 @@ class AutoDetectedPageNumberPagination(pagination.PageNumberPagination):
     max_page_size = getattr(settings,
                             'REST_API_MAX_PAGE_SIZE',
                             100)
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
 
     def get_page_size(self, request):
         if self.page_size_query_param:
@@ -35,3 +149,100 @@ class AutoDetectedPageNumberPagination(pagination.PageNumberPagination):
                 pass
 
         return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super(AutoDetectedPageNumberPagination, self).paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.request = request
+        if isinstance(queryset, QuerySet):
+            self.ordering = get_keyset_ordering(queryset)
+        else:
+            # Lists of items not stored in database must be sorted by primary key.
+            self.ordering = ['pk']
+        position, reverse = self.decode_cursor(request)
+        if position is not None and len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        if isinstance(queryset, QuerySet):
+            queryset = queryset.order_by(*(self._reverse(self.ordering) if reverse else self.ordering))
+            if position is not None:
+                queryset = queryset.filter(keyset_filter(self.ordering, position, reverse))
+        else:
+            queryset = self._filter_list(queryset, position, reverse)
+
+        results = list(queryset[:page_size + 1])
+        self.page = results[:page_size]
+        has_more = len(results) > page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    @staticmethod
+    def _filter_list(items, position, reverse):
+        if reverse:
+            items = items[::-1]
+        if position is not None:
+            items = [item for item in items
+                     if (item.pk < position[0] if reverse else item.pk > position[0])]
+        return items
+
+    @staticmethod
+    def _reverse(ordering):
+        return [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+
+    def decode_cursor(self, request):
+        """
+        Return position and direction from cursor in the request. Empty
+        cursor means first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return list(data['p']), bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        data = {'p': get_keyset_position(instance, self.ordering)}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data, cls=DjangoJSONEncoder))
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super(AutoDetectedPageNumberPagination, self).get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super(AutoDetectedPageNumberPagination, self).get_previous_link()
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, '')
+        return self.encode_cursor(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super(AutoDetectedPageNumberPagination, self).get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
@@ -7,6 +7,8 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth import authenticate
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from exceptions import AssertionError
 
 from pdc.apps.changeset import models
@@ -47,6 +49,20 @@ def create_user(username, groups=None, perms=None, is_super=False):
     return user
 
 
+def count_get_queries(client, url, data=None):
+    """
+    Return number of queries run by GET request to given URL and the
+    response. The first request of a user records its usage with extra
+    queries, so the request is done once before counting. Cached content
+    types are cleared, so that the count does not depend on earlier tests.
+    """
+    client.get(url, data or {})
+    ContentType.objects.clear_cache()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, data or {})
+    return len(queries), response
+
+
 class TestCaseWithChangeSetMixin(object):
     def assertNumChanges(self, num_changes=[]):
         """
@@ -10,16 +10,18 @@ from django.test import TestCase
 from django.core.exceptions import ValidationError
 from django.utils.datastructures import MultiValueDict
 from django.core.urlresolvers import reverse
+from django.db.models import QuerySet
 
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework import serializers
 
 from .serializers import DynamicFieldsSerializerMixin
-from .models import Label, SigKey
+from .models import Label, SigKey, Arch, LookupCache, clear_lookup_caches
 from pdc.apps.common import validators
+from pdc.apps.changeset.models import LatestChange
 from .test_utils import TestCaseWithChangeSetMixin
-from . import renderers, views
+from . import filters, renderers, views
 
 
 class ValidatorTestCase(TestCase):
@@ -283,6 +285,58 @@ class LabelRESTTestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.assertEqual(response.data.get('detail'), 'Not found.')
 
 
+class LookupCacheTestCase(TestCase):
+    def setUp(self):
+        clear_lookup_caches()
+        self.cache = Arch.CACHE
+
+    def tearDown(self):
+        clear_lookup_caches()
+
+    def test_preloads_whole_table(self):
+        x86_64 = Arch.objects.get(name='x86_64')
+        ppc64 = Arch.objects.get(name='ppc64')
+        with self.assertNumQueries(1):
+            self.assertEqual(Arch.get_cached_id('x86_64'), x86_64.pk)
+            self.assertEqual(Arch.get_cached_id('ppc64'), ppc64.pk)
+            self.assertEqual(Arch.get_cached_id('x86_64'), x86_64.pk)
+
+    def test_counts_hits_and_misses(self):
+        hits, misses = self.cache.hits, self.cache.misses
+        Arch.get_cached_id('x86_64')
+        Arch.get_cached_id('x86_64')
+        self.assertRaises(Arch.DoesNotExist, Arch.get_cached_id, 'no-such-arch')
+        self.assertEqual(self.cache.hits - hits, 2)
+        self.assertEqual(self.cache.misses - misses, 1)
+
+    def test_finds_new_object(self):
+        Arch.get_cached_id('x86_64')
+        arch = Arch.objects.create(name='new-arch')
+        self.assertEqual(Arch.get_cached_id('new-arch'), arch.pk)
+
+    def test_invalidated_on_rename_and_delete(self):
+        arch = Arch.objects.create(name='new-arch')
+        self.assertEqual(Arch.get_cached_id('new-arch'), arch.pk)
+        arch.name = 'renamed-arch'
+        arch.save()
+        self.assertRaises(Arch.DoesNotExist, Arch.get_cached_id, 'new-arch')
+        self.assertEqual(Arch.get_cached_id('renamed-arch'), arch.pk)
+        arch.delete()
+        self.assertRaises(Arch.DoesNotExist, Arch.get_cached_id, 'renamed-arch')
+
+    def test_evicts_least_recently_used(self):
+        cache = LookupCache('key_id', max_size=2)
+        cache.model = SigKey
+        ids = [cache.get_id(key_id, create=True) for key_id in ('1234abcd', 'abcd1234')]
+        cache.get_id('1234abcd')
+        cache.get_id('aaaa5555', create=True)
+        self.assertEqual(cache.stats()['size'], 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get_id('1234abcd'), ids[0])
+        with self.assertNumQueries(1):
+            self.assertEqual(cache.get_id('abcd1234'), ids[1])
+
+
 class ArchRESTTestCase(APITestCase):
     def test_list_all_arches(self):
         url = reverse('arch-list')
@@ -301,6 +355,55 @@ class ArchRESTTestCase(APITestCase):
         response = self.client.post(url, format='json', data={"name": "a" * 100})
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_cursor_pagination(self):
+        url = reverse('arch-list')
+        all_arches = [arch['name'] for arch in self.client.get(url, {'page_size': -1}).data]
+        arches = []
+        pages = []
+        response = self.client.get(url, {'cursor': '', 'page_size': 20})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            pages.append(response.data)
+            arches.extend(arch['name'] for arch in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(arches, all_arches)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+        response = self.client.get(pages[1]['previous'])
+        self.assertEqual(response.data['results'], pages[0]['results'])
+
+    def test_cursor_pagination_with_ordering(self):
+        url = reverse('arch-list')
+        response = self.client.get(url, {'cursor': '', 'page_size': 30, 'ordering': '-name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(response.data['next'])
+        names = [arch['name'] for arch in response.data['results']]
+        self.assertEqual(len(names), 18)
+        self.assertEqual(names, sorted(names, reverse=True))
+
+    def test_cursor_pagination_with_invalid_cursor(self):
+        response = self.client.get(reverse('arch-list'), {'cursor': 'foo'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_conditional_get_with_etag(self):
+        url = reverse('arch-list')
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.post(url, format='json', data={"name": "arm"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(LatestChange.objects.get(target_class='arch').changeset.change_set.count(), 1)
+
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
 
 class SigKeyRESTTestCase(TestCaseWithChangeSetMixin, APITestCase):
     def setUp(self):
@@ -426,6 +529,28 @@ class SigKeyRESTTestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.assertNumChanges([1])
 
 
+class AnalyzeRegexpTestCase(TestCase):
+    def test_strategies(self):
+        data = [('^bash$', ('exact', 'bash')),
+                ('^bash', ('prefix', 'bash')),
+                ('^python\\-.*', ('prefix', 'python-')),
+                ('lib\\.so', ('substring', 'lib.so')),
+                ('so', ('regex', 'so')),
+                ('lib.so', ('regex', 'lib.so')),
+                ('doc$', ('regex', 'doc$')),
+                ('^a[bc]', ('regex', '^a[bc]'))]
+        for pattern, expected in data:
+            self.assertEqual(filters.analyze_regexp(pattern), expected, msg=pattern)
+
+    def test_filter_keeps_queryset_class(self):
+        class CustomQuerySet(QuerySet):
+            pass
+        regex_filter = filters.MultiValueRegexFilter(name='name')
+        queryset = regex_filter.filter(CustomQuerySet(model=Arch), ['^x86_64$'])
+        self.assertIsInstance(queryset, CustomQuerySet)
+        self.assertEqual(list(queryset.values_list('name', flat=True)), ['x86_64'])
+
+
 class FilterDocumentingTestCase(TestCase):
     def test_result_is_cached(self):
         viewset = mock.Mock(spec=[])
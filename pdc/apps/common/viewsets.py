@@ -4,23 +4,27 @@
 # http://opensource.org/licenses/MIT
 #
 import datetime
+import hashlib
 import re
 import json
 
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import FieldError
-from django.http import Http404
+from django.db.models.query import QuerySet
+from django.http import Http404, StreamingHttpResponse
 from django.conf import settings
 from django.views.decorators.http import condition
 
 from contrib import drf_introspection
 
 from rest_framework import mixins, status, viewsets
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
 from pdc.apps.auth.permissions import APIPermission
+from pdc.apps.common import pagination
 from pdc.apps.utils.utils import generate_warning_header_dict, get_model_name_from_obj_or_cls
-from pdc.apps.changeset.models import Change
+from pdc.apps.changeset.models import LatestChange
 
 
 class NoSetattrInPreSaveMixin(object):
@@ -123,11 +127,63 @@ class ChangeSetDestroyModelMixin(mixins.DestroyModelMixin):
                                    'null')
 
 
+class StreamingListModelMixin(mixins.ListModelMixin):
+    """
+    List mixin that streams unpaginated JSON responses. The queryset is read
+    and serialized in chunks of `stream_chunk_size` items, so memory usage
+    does not depend on number of results. Other formats (e.g. the browsable
+    API) and querysets that can not be read in chunks use the default
+    behaviour. A queryset can be read in chunks if its ordering can be used
+    for keyset pagination (see `pagination.get_keyset_ordering`).
+    """
+    stream_chunk_size = getattr(settings, 'REST_API_STREAM_CHUNK_SIZE', 1000)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        if isinstance(request.accepted_renderer, JSONRenderer) and isinstance(queryset, QuerySet):
+            try:
+                ordering = pagination.get_keyset_ordering(queryset)
+            except FieldError:
+                pass
+            else:
+                return StreamingHttpResponse(self._stream_list(request, queryset.order_by(*ordering), ordering),
+                                             content_type=request.accepted_renderer.media_type)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def _stream_list(self, request, queryset, ordering):
+        renderer = request.accepted_renderer
+        yield b'['
+        position = None
+        separator = b''
+        while True:
+            chunk_queryset = queryset
+            if position is not None:
+                chunk_queryset = queryset.filter(pagination.keyset_filter(ordering, position))
+            chunk = list(chunk_queryset[:self.stream_chunk_size])
+            if chunk:
+                data = renderer.render(self.get_serializer(chunk, many=True).data)
+                # Strip the brackets of rendered list.
+                yield separator + data[1:-1]
+                separator = b','
+            if len(chunk) < self.stream_chunk_size:
+                break
+            position = pagination.get_keyset_position(chunk[-1], ordering)
+        yield b']'
+
+
 class ChangeSetModelMixin(ChangeSetCreateModelMixin,
                           ChangeSetUpdateModelMixin,
                           ChangeSetDestroyModelMixin,
                           mixins.RetrieveModelMixin,
-                          mixins.ListModelMixin):
+                          StreamingListModelMixin):
     """
     Model viewset that provides default `list()`, `retrieve()`,
     with logging the changes in `create`, `update()`, `partial_update()`
@@ -137,24 +193,54 @@ class ChangeSetModelMixin(ChangeSetCreateModelMixin,
 
 
 class ConditionalProcessingMixin(object):
+    """
+    Add `Last-Modified` and `ETag` headers to responses and answer
+    conditional requests with `304 Not Modified`. Both values are derived
+    from the latest changesets touching the model classes of the view (given
+    by `related_model_classes` or taken from the serializer).
+    """
     @staticmethod
-    def latest_change(request, *args, **kwargs):
-        view_class = request.resolver_match.func.cls
-        if hasattr(view_class, 'related_model_classes'):
-            related_model_list = [get_model_name_from_obj_or_cls(model_cls)
-                                  for model_cls in view_class.related_model_classes]
-        else:
-            # use serializer' model class
-            related_model_list = [get_model_name_from_obj_or_cls(view_class.serializer_class.Meta.model)]
+    def _get_latest_changesets(request):
+        """
+        Return list of (target_class, changeset_id, committed_on) triples for
+        all related model classes. The result is cached on the request.
+        """
+        if not hasattr(request, '_latest_changesets'):
+            view_class = request.resolver_match.func.cls
+            if hasattr(view_class, 'related_model_classes'):
+                related_model_list = [get_model_name_from_obj_or_cls(model_cls)
+                                      for model_cls in view_class.related_model_classes]
+            else:
+                # use serializer' model class
+                related_model_list = [get_model_name_from_obj_or_cls(view_class.serializer_class.Meta.model)]
+            request._latest_changesets = sorted(
+                LatestChange.objects.filter(target_class__in=related_model_list)
+                                    .values_list('target_class', 'changeset_id', 'changeset__committed_on')
+            )
+        return request._latest_changesets
 
+    @staticmethod
+    def latest_change(request, *args, **kwargs):
         result = datetime.datetime(1970, 1, 2)
-        if Change.objects.filter(target_class__in=related_model_list).exists():
-            result = Change.objects.filter(
-                target_class__in=related_model_list).order_by('-id')[0].changeset.committed_on
+        changesets = ConditionalProcessingMixin._get_latest_changesets(request)
+        if changesets:
+            result = max(committed_on for _, _, committed_on in changesets)
         return result
 
+    @staticmethod
+    def etag(request, *args, **kwargs):
+        """
+        The tag identifies the latest changesets of related models and the
+        requested representation (URL including query string and accepted
+        media types).
+        """
+        changesets = ConditionalProcessingMixin._get_latest_changesets(request)
+        key = [request.get_full_path(), request.META.get('HTTP_ACCEPT', '')]
+        key.extend('%s:%s' % (target_class, changeset_id) for target_class, changeset_id, _ in changesets)
+        return hashlib.sha1('\n'.join(key).encode('utf-8')).hexdigest()
+
     def dispatch(self, request, *args, **kwargs):
-        @condition(etag_func=None, last_modified_func=self.latest_change)
+        @condition(etag_func=self.etag, last_modified_func=self.latest_change)
         def _dispatch(request, *args, **kwargs):
             return super(ConditionalProcessingMixin, self).dispatch(request, *args, **kwargs)
         return _dispatch(request, *args, **kwargs)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def populate_path_names(apps, schema_editor):
+    BugzillaComponent = apps.get_model('component', 'BugzillaComponent')
+    path_names = {}
+    # Parents always precede their children in tree order.
+    for pk, name, parent_pk in (BugzillaComponent.objects
+                                .order_by('tree_id', 'lft')
+                                .values_list('pk', 'name', 'parent_component_id')):
+        path_names[pk] = '%s/%s' % (path_names[parent_pk], name) if parent_pk else name
+        BugzillaComponent.objects.filter(pk=pk).update(path_name=path_names[pk])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('component', '0011_auto_20151126_0602'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bugzillacomponent',
+            name='path_name',
+            field=models.CharField(default='', max_length=1000, editable=False, db_index=True),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_path_names, migrations.RunPython.noop),
+    ]
@@ -4,11 +4,15 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
+import bisect
 import json
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 
 from mptt import models as mptt_models
@@ -17,7 +21,7 @@ from pdc.apps.common.models import Label
 from pdc.apps.common import hacks
 from pdc.apps.release.models import Release
 from pdc.apps.release import signals
-from .signals import releasecomponent_clone
+from .signals import releasecomponent_clone, releasecomponent_clone_many
 
 
 def validate_bc_name(name):
@@ -53,6 +57,9 @@ class Upstream(models.Model):
 class BugzillaComponent(mptt_models.MPTTModel):
     name                        = models.CharField(max_length=100, validators=[validate_bc_name])
     parent_component = mptt_models.TreeForeignKey('self', null=True, blank=True, related_name='children')
+    # Names of all ancestors and this component joined with slashes. It is
+    # updated on every save, descendants are updated when it changes.
+    path_name                   = models.CharField(max_length=1000, db_index=True, editable=False)
 
     class Meta:
         unique_together = [
@@ -67,18 +74,37 @@ class BugzillaComponent(mptt_models.MPTTModel):
         return self.name
 
     def get_path_name(self):
-        bugzilla_subcomponents = []
-        for node in self.get_ancestors(include_self=True):
-            bugzilla_subcomponents.append(node.name)
-        return u"%s" % "/".join(bugzilla_subcomponents)
+        return self.path_name
 
     def get_subcomponents(self):
-        path_name = self.get_path_name()
-        result = []
-        for descendant in self.get_descendants():
-            descendant_path_name = descendant.get_path_name().replace(path_name + '/', "", 1)
-            result.append(descendant_path_name)
-        return result
+        if hasattr(self, '_subcomponents'):
+            return self._subcomponents
+        prefix_length = len(self.path_name) + 1
+        return [path_name[prefix_length:]
+                for path_name in self.get_descendants().values_list('path_name', flat=True)]
+
+    @staticmethod
+    def prefetch_subcomponents(components):
+        """
+        Load subcomponents of all given components with one query per tree
+        and cache them on the instances.
+        """
+        trees = {}
+        for component in components:
+            trees.setdefault(component.tree_id, []).append(component)
+        for tree_id, nodes in trees.iteritems():
+            rows = list(BugzillaComponent.objects
+                        .filter(tree_id=tree_id,
+                                lft__gt=min(node.lft for node in nodes),
+                                rght__lt=max(node.rght for node in nodes))
+                        .order_by('lft')
+                        .values_list('lft', 'path_name'))
+            lfts = [lft for lft, _ in rows]
+            for node in nodes:
+                prefix_length = len(node.path_name) + 1
+                start = bisect.bisect_right(lfts, node.lft)
+                end = bisect.bisect_left(lfts, node.rght)
+                node._subcomponents = [path_name[prefix_length:] for _, path_name in rows[start:end]]
 
     def export(self, fields=None):
         _fields = ['name', 'parent_component', 'subcomponents'] if fields is None else fields
@@ -92,6 +118,27 @@ class BugzillaComponent(mptt_models.MPTTModel):
         return result
 
 
+@receiver(pre_save, sender=BugzillaComponent)
+def _set_bugzilla_component_path_name(sender, instance, **kwargs):
+    instance._old_path_name = instance.path_name
+    if instance.parent_component_id:
+        instance.path_name = u'%s/%s' % (instance.parent_component.path_name, instance.name)
+    else:
+        instance.path_name = instance.name
+
+
+@receiver(post_save, sender=BugzillaComponent)
+def _update_descendant_path_names(sender, instance, created, raw, **kwargs):
+    old_path_name = getattr(instance, '_old_path_name', None)
+    if created or raw or not old_path_name or old_path_name == instance.path_name:
+        return
+    # Renamed or moved, replace the old prefix of descendants.
+    instance.get_descendants().update(
+        path_name=Concat(Value(instance.path_name), Substr('path_name', len(old_path_name) + 1),
+                         output_field=models.CharField())
+    )
+
+
 class GlobalComponent(models.Model):
     """Record generic component"""
 
@@ -289,6 +336,109 @@ class ReleaseComponentRelationship(models.Model):
         return result
 
 
+# Number of rows inserted by one query when cloning components.
+CLONE_BATCH_SIZE = 1000
+
+
+def _clone_components(original_release, release, include_inactive, new_dist_git_branch):
+    """
+    Copy components of original release to the new one. Return list of
+    (primary key of original component, new component) pairs.
+    """
+    queryset = (ReleaseComponent.objects.filter(release=original_release)
+                .select_related('global_component', 'bugzilla_component', 'type')
+                .order_by('pk'))
+    if not include_inactive:
+        queryset = queryset.filter(active=True)
+    components = []
+    for rc in queryset:
+        org_rc_pk = rc.pk
+        rc.pk = None
+        rc.release = release
+        if new_dist_git_branch:
+            rc.dist_git_branch = new_dist_git_branch
+        components.append((org_rc_pk, rc))
+    ReleaseComponent.objects.bulk_create([rc for _, rc in components], batch_size=CLONE_BATCH_SIZE)
+    # Ids of inserted rows are not returned, names are unique in a release.
+    ids = dict(ReleaseComponent.objects.filter(release=release).values_list('name', 'pk'))
+    for _, rc in components:
+        rc.pk = ids[rc.name]
+    return components
+
+
+def _clone_groups(original_release, release, rc_map):
+    """
+    Copy component groups of original release to the new one together with
+    the cloned components. Return list of the new groups.
+    """
+    groups = list(ReleaseComponentGroup.objects.filter(release=original_release).order_by('pk'))
+    if not groups:
+        return []
+    through = ReleaseComponentGroup.components.through
+    members = {}
+    for group_id, component_id in (through.objects.filter(releasecomponentgroup__release=original_release)
+                                   .order_by('pk')
+                                   .values_list('releasecomponentgroup_id', 'releasecomponent_id')):
+        if component_id in rc_map:
+            members.setdefault(group_id, []).append(rc_map[component_id].pk)
+    group_map = {}
+    for group in groups:
+        group_map[(group.group_type_id, group.description)] = group.pk
+        group.pk = None
+        group.release = release
+    ReleaseComponentGroup.objects.bulk_create(groups, batch_size=CLONE_BATCH_SIZE)
+    new_groups = {}
+    for pk, group_type_id, description in (ReleaseComponentGroup.objects.filter(release=release)
+                                           .values_list('pk', 'group_type_id', 'description')):
+        new_groups[group_map.get((group_type_id, description))] = pk
+    through.objects.bulk_create([through(releasecomponentgroup_id=new_groups[org_group_pk],
+                                         releasecomponent_id=component_id)
+                                 for org_group_pk in sorted(members)
+                                 for component_id in members[org_group_pk]],
+                                batch_size=CLONE_BATCH_SIZE)
+    component_queryset = ReleaseComponent.objects.select_related('release', 'global_component',
+                                                                 'bugzilla_component', 'type')
+    return list(ReleaseComponentGroup.objects
+                .filter(pk__in=[new_groups[org_group_pk] for org_group_pk in group_map.values()])
+                .select_related('group_type', 'release')
+                .prefetch_related(models.Prefetch('components', queryset=component_queryset))
+                .order_by('pk'))
+
+
+def _clone_relationships(original_release, rc_map):
+    """
+    Copy relationships between cloned components. Return list of the new
+    relationships.
+    """
+    relationships = []
+    for relationship in (ReleaseComponentRelationship.objects
+                         .filter(from_component__release=original_release,
+                                 to_component__release=original_release)
+                         .select_related('relation_type')
+                         .order_by('pk')):
+        if relationship.from_component_id not in rc_map or relationship.to_component_id not in rc_map:
+            continue
+        relationship.pk = None
+        relationship.from_component = rc_map[relationship.from_component_id]
+        relationship.to_component = rc_map[relationship.to_component_id]
+        relationships.append(relationship)
+    if not relationships:
+        return []
+    ReleaseComponentRelationship.objects.bulk_create(relationships, batch_size=CLONE_BATCH_SIZE)
+    release = relationships[0].from_component.release
+    ids = dict(((relation_type_id, from_id, to_id), pk)
+               for pk, relation_type_id, from_id, to_id in (ReleaseComponentRelationship.objects
+                                                            .filter(from_component__release=release,
+                                                                    to_component__release=release)
+                                                            .values_list('pk', 'relation_type_id',
+                                                                         'from_component_id', 'to_component_id')))
+    for relationship in relationships:
+        relationship.pk = ids[(relationship.relation_type_id,
+                               relationship.from_component_id,
+                               relationship.to_component_id)]
+    return relationships
+
+
 @receiver(signals.rpc_release_clone_component)
 @receiver(signals.release_clone)
 def clone_release_components_and_groups(sender, request, original_release, release, **kwargs):
@@ -298,47 +448,28 @@ def clone_release_components_and_groups(sender, request, original_release, relea
                         hacks.convert_str_to_bool(include_inactive, name='include_inactive'))
     new_dist_git_branch = data.pop('component_dist_git_branch', None)
 
-    rc_map = dict()
-    for rc in ReleaseComponent.objects.filter(release=original_release):
-        if not include_inactive and not rc.active:
-            continue
-        org_rc_pk = rc.pk
-        rc.pk = None
-        rc.release = release
-        if new_dist_git_branch:
-            rc.dist_git_branch = new_dist_git_branch
-        rc.save()
+    components = _clone_components(original_release, release, include_inactive, new_dist_git_branch)
+    rc_map = dict(components)
+
+    responses = releasecomponent_clone_many.send(sender=ReleaseComponent,
+                                                 request=request,
+                                                 original_release=original_release,
+                                                 release=release,
+                                                 components=components)
+    for org_rc_pk, rc in components:
         request.changeset.add('releasecomponent', rc.pk, 'null', json.dumps(rc.export()))
-        rc_map[org_rc_pk] = rc
+        for _, changes in responses:
+            for change in (changes or {}).get(org_rc_pk, []):
+                request.changeset.add(*change)
 
         releasecomponent_clone.send(sender=rc.__class__,
                                     request=request,
                                     orig_component_pk=org_rc_pk,
                                     component=rc)
 
-    for group in ReleaseComponentGroup.objects.filter(release=original_release):
-        group_type = group.group_type
-        description = group.description
-        org_components = group.components.all()
-
-        group.pk = None
-        group.description = description
-        group.group_type = group_type
-        group.release = release
-        group.save()
-        for component in org_components:
-            new_rc = rc_map.get(component.pk)
-            if new_rc:
-                group.components.add(new_rc)
+    for group in _clone_groups(original_release, release, rc_map):
         request.changeset.add('ReleaseComponentGroup', group.pk, 'null', json.dumps(group.export()))
 
-    for relationship in ReleaseComponentRelationship.objects.filter(from_component__release=original_release,
-                                                                    to_component__release=original_release):
-        if relationship.from_component.pk not in rc_map or relationship.to_component.pk not in rc_map:
-            continue
-        relationship.from_component = rc_map[relationship.from_component.pk]
-        relationship.to_component = rc_map[relationship.to_component.pk]
-        relationship.pk = None
-        relationship.save()
+    for relationship in _clone_relationships(original_release, rc_map):
         request.changeset.add('ReleaseComponentRelationship', relationship.pk, 'null',
                               json.dumps(relationship.export()))
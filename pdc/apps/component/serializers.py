@@ -7,6 +7,7 @@ import json
 
 from django.contrib.contenttypes.models import ContentType
 from django.core.urlresolvers import reverse
+from django.db import models
 
 from rest_framework import serializers
 
@@ -97,33 +98,27 @@ class TreeForeignKeyField(serializers.Field):
     def to_internal_value(self, data):
         if data.strip() == "":
             raise serializers.ValidationError({'bugzilla_component': 'This field is required.'})
-        else:
-            components = data.strip("/").split("/")
-            len_components = len(components)
-            bc = None
-            # Only Bugzilla component name exists, parent component name will be considered as None.
-            if len_components == 1:
-                try:
-                    bc = BugzillaComponent.objects.get(name=components[0], parent_component=None)
-                except:
-                    raise serializers.ValidationError({'bugzilla_component': ("Bugzilla component with name %s does not exist."
-                                                                              % data)})
-            # Not only bugzilla Component, but also its ancestors exist.
-            if len_components > 1:
-                z = zip(components, components[1:])
-                root_bc_name, bc_name = z[0]
-                qs = BugzillaComponent.objects.filter(name=bc_name, parent_component__name=root_bc_name)
-                for _, bc_name in z[1:]:
-                    qs = BugzillaComponent.objects.filter(name=bc_name, parent_component__in=qs)
-                if not qs:
-                    raise serializers.ValidationError({'bugzilla_component': ("Bugzilla component with name %s does not exist."
-                                                                              % data)})
-                if len(qs) > 1:
-                    raise serializers.ValidationError({'bugzilla_component': ("Duplicate Bugzilla component with name %s exists."
-                                                                              % data)})
-                if qs:
-                    bc = qs[0]
-            return bc
+        # Single name means a component without parent, otherwise the whole
+        # path from root component is given.
+        qs = list(BugzillaComponent.objects.filter(path_name=data.strip("/"))[:2])
+        if not qs:
+            raise serializers.ValidationError({'bugzilla_component': ("Bugzilla component with name %s does not exist."
+                                                                      % data)})
+        if len(qs) > 1:
+            raise serializers.ValidationError({'bugzilla_component': ("Duplicate Bugzilla component with name %s exists."
+                                                                      % data)})
+        return qs[0]
+
+
+class BugzillaComponentListSerializer(serializers.ListSerializer):
+    """
+    Load subcomponents of all serialized Bugzilla components at once.
+    """
+    def to_representation(self, data):
+        data = list(data.all() if isinstance(data, models.Manager) else data)
+        if 'subcomponents' in self.child.fields:
+            BugzillaComponent.prefetch_subcomponents(data)
+        return super(BugzillaComponentListSerializer, self).to_representation(data)
 
 
 class BugzillaComponentSerializer(DynamicFieldsSerializerMixin,
@@ -145,6 +140,7 @@ class BugzillaComponentSerializer(DynamicFieldsSerializerMixin,
     class Meta:
         model = BugzillaComponent
         fields = ('id', 'name', 'parent_component', 'subcomponents')
+        list_serializer_class = BugzillaComponentListSerializer
 
 
 class ReleaseField(serializers.SlugRelatedField):
@@ -167,6 +163,19 @@ class ReleaseComponentTypeSerializer(StrictSerializerMixin, serializers.ModelSer
         fields = ('name', 'has_osbs')
 
 
+class ReleaseComponentListSerializer(serializers.ListSerializer):
+    """
+    Load subcomponents of Bugzilla components of all serialized release
+    components at once.
+    """
+    def to_representation(self, data):
+        data = list(data.all() if isinstance(data, models.Manager) else data)
+        if 'bugzilla_component' in self.child.fields:
+            BugzillaComponent.prefetch_subcomponents([rc.bugzilla_component for rc in data
+                                                      if rc.bugzilla_component_id])
+        return super(ReleaseComponentListSerializer, self).to_representation(data)
+
+
 class ReleaseComponentSerializer(DynamicFieldsSerializerMixin,
                                  StrictSerializerMixin,
                                  serializers.HyperlinkedModelSerializer):
@@ -220,6 +229,7 @@ class ReleaseComponentSerializer(DynamicFieldsSerializerMixin,
         model = ReleaseComponent
         fields = ('id', 'release', 'bugzilla_component', 'brew_package', 'global_component',
                   'name', 'dist_git_branch', 'dist_git_web_url', 'active', 'type')
+        list_serializer_class = ReleaseComponentListSerializer
 
 
 class GroupTypeSerializer(StrictSerializerMixin, serializers.ModelSerializer):
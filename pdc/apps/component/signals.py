@@ -34,3 +34,16 @@ releasecomponent_serializer_post_update = dispatch.Signal(providing_args=['relea
 releasecomponent_clone = dispatch.Signal(providing_args=['request',
                                                          'orig_component_pk',
                                                          'new_component'])
+
+# This signal is sent once after all components of a release are cloned,
+# before `releasecomponent_clone` is sent for the individual components. Apart
+# from the releases, the handler gets `components` argument, a list of
+# (primary key of the cloned component, new instance) pairs. Handlers should copy their data for all components at
+# once and must not add the changes to changeset directly. They return a dict
+# mapping primary key of the cloned component to a list of changes as
+# (target_class, target_id, old_value, new_value) tuples. These are logged
+# right after the change of their component.
+releasecomponent_clone_many = dispatch.Signal(providing_args=['request',
+                                                              'original_release',
+                                                              'release',
+                                                              'components'])
@@ -3,6 +3,7 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
+import json
 import mock
 import unittest
 
@@ -10,6 +11,7 @@ from django.core.urlresolvers import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from pdc.apps.changeset.models import Change
 from pdc.apps.common.test_utils import TestCaseWithChangeSetMixin
 from pdc.apps.release.models import Release, ProductVersion
 from . import models
@@ -1114,6 +1116,23 @@ class ReleaseCloneWithComponentsTestCase(TestCaseWithChangeSetMixin, APITestCase
         self.assertGreater(relations[0].id, 2)
         self.assertNumChanges([6])
 
+    def test_clone_logs_changes_in_order(self):
+        response = self.client.post(reverse('releaseclone-list'),
+                                    {'old_release_id': 'release-1.0', 'version': '1.1'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        changes = Change.objects.order_by('pk')
+        self.assertEqual([change.target_class for change in changes],
+                         ['release', 'releasecomponent', 'releasecomponent', 'releasecomponentgroup',
+                          'releasecomponentrelationship', 'releasecomponentrelationship'])
+        for change in changes[1:3]:
+            rc = models.ReleaseComponent.objects.get(pk=change.target_id)
+            self.assertEqual(rc.release.release_id, 'release-1.1')
+            self.assertEqual(json.loads(change.new_value), rc.export())
+        group = models.ReleaseComponentGroup.objects.get(release__release_id='release-1.1')
+        self.assertEqual(changes[3].target_id, group.pk)
+        self.assertEqual(json.loads(changes[3].new_value), group.export())
+
     def test_clone_components_change_dist_git_branch(self):
         response = self.client.post(reverse('releaseclone-list'),
                                     {'old_release_id': 'release-1.0', 'version': '1.1',
@@ -1316,6 +1335,17 @@ class BugzillaComponentRESTTestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.assertEqual(response.data['name'], 'lib64')
         self.assertNumChanges([1])
 
+    def test_rename_bugzilla_component_updates_descendant_paths(self):
+        models.BugzillaComponent.objects.create(name='bin', parent_component_id=2)
+        url = reverse('bugzillacomponent-detail', kwargs={'pk': 1})
+        response = self.client.patch(url, {'name': 'python3'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['subcomponents'], ['lib', 'lib/bin'])
+        self.assertEqual(models.BugzillaComponent.objects.get(name='bin').path_name, 'python3/lib/bin')
+        response = self.client.get(reverse('bugzillacomponent-list'), format='json')
+        self.assertEqual([bc['subcomponents'] for bc in response.data['results']],
+                         [['lib', 'lib/bin'], ['bin'], []])
+
     def test_partial_update_empty(self):
         url = reverse('bugzillacomponent-detail', kwargs={'pk': 2})
         response = self.client.patch(url, {}, format='json')
@@ -455,7 +455,7 @@ class ReleaseComponentViewSet(viewsets.PDCModelViewSet):
     docstring_macros = PUT_OPTIONAL_PARAM_WARNING
 
     def get_queryset(self):
-        qs = self.model.objects.all()
+        qs = self.model.objects.select_related('bugzilla_component__parent_component')
         query_params = self.request.query_params
         # include_inactive_release is not a field in model ReleaseComponent, so
         # it can not use django-filter to handle.
@@ -748,7 +748,7 @@ class BugzillaComponentViewSet(viewsets.PDCModelViewSet):
 
     """
     model = BugzillaComponent
-    queryset = model.objects.all().order_by('id')
+    queryset = model.objects.select_related('parent_component').order_by('id')
     serializer_class = BugzillaComponentSerializer
     filter_class = BugzillaComponentFilter
 
@@ -11,7 +11,7 @@ from django.core.exceptions import ValidationError
 
 from pdc.apps.common.filters import value_is_not_empty, MultiValueFilter, CaseInsensitiveBooleanFilter, \
     MultiValueCaseInsensitiveFilter
-from .models import Compose, OverrideRPM, ComposeTree, ComposeImage, VariantArch
+from .models import Compose, OverrideRPM, ComposeTree, ComposeImage, VariantArch, ComposeImportJob
 
 
 class ComposeFilter(django_filters.FilterSet):
@@ -107,3 +107,14 @@ class ComposeImageRTTTestFilter(django_filters.FilterSet):
     class Meta:
         model = ComposeImage
         fields = ('compose', 'variant', 'arch', 'file_name', 'test_result')
+
+
+class ComposeImportJobFilter(django_filters.FilterSet):
+    kind            = MultiValueFilter(name='kind')
+    state           = MultiValueFilter(name='state')
+    compose_id      = MultiValueFilter(name='compose_id')
+    author          = MultiValueFilter(name='author__username')
+
+    class Meta:
+        model = ComposeImportJob
+        fields = ('kind', 'state', 'compose_id', 'author')
@@ -7,17 +7,23 @@
 
 import os
 import json
+import logging
+from io import BytesIO
 
 import kobo
 import productmd
 from productmd.rpms import Rpms
 
-from django.db import transaction, connection
+from django.conf import settings
+from django.db import transaction, connection, connections
 from django.db.models import Q
+from django.http import QueryDict
 from rest_framework import serializers
 
 from pdc.apps.package.models import RPM
+from pdc.apps.changeset.models import Changeset
 from pdc.apps.common import hacks as common_hacks
+from pdc.apps.common.handlers import exception_handler
 from pdc.apps.common import models as common_models
 from pdc.apps.package import models as package_models
 from pdc.apps.repository import models as repository_models
@@ -25,11 +31,17 @@ from pdc.apps.release import models as release_models
 from pdc.apps.release import lib
 from pdc.apps.compose import models
 from pdc.apps.compose.serializers import ComposeTreeSerializer
+from pdc.apps.compose.parsers import RpmManifestStream, StreamingManifestParser, iter_rpm_manifest
 from pdc.apps.release.models import Release
 from pdc.apps.component.models import ReleaseComponent
+from pdc.apps.utils import messenger
+from pdc.apps.utils.messaging import store_messages
 from pdc.apps.repository.models import ContentCategory
 
 
+logger = logging.getLogger(__name__)
+
+
 def _maybe_raise_inconsistency_error(composeinfo, manifest, name):
     """Raise ValidationError if compose id is not the same in both files.
     The name should describe the kind of manifest.
@@ -39,28 +51,6 @@ def _maybe_raise_inconsistency_error(composeinfo, manifest, name):
             {'detail': ['Inconsistent data: different compose id in composeinfo and {0} file.'.format(name)]})
 
 
-def get_or_insert_rpm(rpms_in_db, cursor, rpm_nevra, srpm_nevra, filename):
-    rpm_id = rpms_in_db.get(rpm_nevra, None)
-    if not rpm_id:
-        rpm_id = package_models.RPM.bulk_insert(cursor, rpm_nevra, filename, srpm_nevra)
-        rpms_in_db[rpm_nevra] = rpm_id
-    return rpm_id
-
-
-def insert_compose_rpms_if_nonexist(compose_rpms_in_db, cursor,
-                                    variant_arch_id, rpm_id,
-                                    content_category_id, sigkey_id, path_id):
-    key = "%s/%s" % (variant_arch_id, rpm_id)
-    if key not in compose_rpms_in_db:
-        models.ComposeRPM.bulk_insert(cursor,
-                                      variant_arch_id,
-                                      rpm_id,
-                                      content_category_id,
-                                      sigkey_id,
-                                      path_id)
-        compose_rpms_in_db.add(key)
-
-
 def _link_compose_to_integrated_product(request, compose, variant):
     """
     If the variant belongs to an integrated layered product, update the compose
@@ -110,40 +100,109 @@ def _store_relative_path_for_compose(compose_obj, variants_info, variant, varian
     vp = productmd.composeinfo.VariantPaths(variant)
     common_hacks.deserialize_wrapper(vp.deserialize, variants_info.get(variant.name, {}).get('paths', {}))
     for path_type in vp._fields:
-        path_type_obj, created = models.PathType.objects.get_or_create(name=path_type)
-        if created:
+        try:
+            path_type_id = models.PathType.get_cached_id(path_type)
+        except models.PathType.DoesNotExist:
+            path_type_obj = models.PathType.objects.create(name=path_type)
             add_to_changelog.append(path_type_obj)
+            path_type_id = path_type_obj.id
         for arch in variant.arches:
             field_value = getattr(vp, path_type)
             if field_value and field_value.get(arch, None):
-                arch_obj = common_models.Arch.objects.get(name=arch)
-                crp_obj, created = models.ComposeRelPath.objects.get_or_create(arch=arch_obj, variant=variant_obj,
-                                                                               compose=compose_obj, type=path_type_obj,
+                arch_id = common_models.Arch.get_cached_id(arch)
+                crp_obj, created = models.ComposeRelPath.objects.get_or_create(arch_id=arch_id, variant=variant_obj,
+                                                                               compose=compose_obj, type_id=path_type_id,
                                                                                path=field_value[arch])
                 if created:
                     add_to_changelog.append(crp_obj)
 
 
+# Number of manifest entries processed at once when importing RPMs.
+IMPORT_BATCH_SIZE = 5000
+
+
+def _load_rpm_manifest(rpm_manifest):
+    """
+    Deserialize RPM manifest given either as a dict or as a streamed manifest
+    from `StreamingManifestParser`. Returns a tuple of `Rpms` object with the
+    compose metadata and an iterable of (variant, arch, srpm_nevra,
+    rpm_nevra, rpm_data) tuples.
+    """
+    if isinstance(rpm_manifest, RpmManifestStream):
+        rm = rpm_manifest.get_metadata()
+        if not rm.rpms:
+            return rm, rpm_manifest
+    else:
+        rm = Rpms()
+        common_hacks.deserialize_wrapper(rm.deserialize, rpm_manifest)
+    return rm, iter_rpm_manifest(rm)
+
+
+def _link_compose_rpms(cursor, compose_id, rpms, compose_rpms):
+    """
+    Insert missing RPMs and link them to compose. The `rpms` argument maps
+    NEVRA to a (srpm_nevra, filename) tuple, `compose_rpms` are tuples of
+    (variant_arch_id, rpm_nevra, content_category_id, sigkey_id, path_id).
+    The summary of signing keys and the index of RPMs in the compose are
+    updated as well.
+    """
+    rpm_ids = package_models.RPM.bulk_get_or_insert(cursor, rpms)
+    models.ComposeRPM.bulk_insert_many(
+        cursor,
+        [(row[0], rpm_ids[row[1]]) + row[2:] for row in compose_rpms]
+    )
+    # Rows of already linked RPMs are skipped by the insert, only keys of the
+    # stored rows are in the compose.
+    variant_arch_ids = set(row[0] for row in compose_rpms)
+    models.ComposeSigKey.add(
+        compose_id,
+        models.ComposeRPM.objects.filter(variant_arch_id__in=variant_arch_ids).order_by()
+        .values_list('sigkey_id', flat=True).distinct()
+    )
+    models.ComposeRPMIndex.bulk_insert_many(
+        cursor,
+        list(set((kobo.rpmlib.parse_nvra(row[1])['name'], compose_id, rpm_ids[row[1]]) for row in compose_rpms))
+    )
+
+
+class ImportProgress(object):
+    """
+    Receiver of progress information from compose import. This base class
+    ignores everything, it is used when the import runs inside HTTP request.
+    """
+    def start(self, variants):
+        """Called when import of `variants` variants is about to start."""
+        pass
+
+    def variant_done(self):
+        """Called whenever a single variant is processed."""
+        pass
+
+    def update(self, **counters):
+        """Called with names and values of counters to report."""
+        pass
+
+
 @transaction.atomic(savepoint=False)
-def compose__import_rpms(request, release_id, composeinfo, rpm_manifest):
+def compose__import_rpms(request, release_id, composeinfo, rpm_manifest, progress=None):
+    progress = progress or ImportProgress()
     release_obj = release_models.Release.objects.get(release_id=release_id)
 
     ci = productmd.composeinfo.ComposeInfo()
     common_hacks.deserialize_wrapper(ci.deserialize, composeinfo)
-    rm = Rpms()
-    common_hacks.deserialize_wrapper(rm.deserialize, rpm_manifest)
+    rm, manifest_rpms = _load_rpm_manifest(rpm_manifest)
 
     _maybe_raise_inconsistency_error(ci, rm, 'rpms')
 
     compose_date = "%s-%s-%s" % (ci.compose.date[:4], ci.compose.date[4:6], ci.compose.date[6:])
-    compose_type = models.ComposeType.objects.get(name=ci.compose.type)
+    compose_type_id = models.ComposeType.get_cached_id(ci.compose.type)
     acceptance_status = models.ComposeAcceptanceTestingState.objects.get(name='untested')
     compose_obj, created = lib._logged_get_or_create(
         request, models.Compose,
         release=release_obj,
         compose_id=ci.compose.id,
         compose_date=compose_date,
-        compose_type=compose_type,
+        compose_type_id=compose_type_id,
         compose_respin=ci.compose.respin,
         compose_label=ci.compose.label or None,
         acceptance_testing=acceptance_status,
@@ -152,26 +211,22 @@ def compose__import_rpms(request, release_id, composeinfo, rpm_manifest):
         # add message
         _add_compose_create_msg(request, compose_obj)
 
-    rpms_in_db = {}
-    qs = package_models.RPM.objects.all()
-    for rpm in qs.iterator():
-        key = "%s-%s:%s-%s.%s" % (rpm.name, rpm.epoch, rpm.version, rpm.release, rpm.arch)
-        rpms_in_db[key] = rpm.id
-
     cursor = connection.cursor()
     add_to_changelog = []
     imported_rpms = 0
     variants_info = composeinfo['payload']['variants']
 
-    for variant in ci.get_variants(recursive=True):
+    variant_arch_ids = {}
+    variants = ci.get_variants(recursive=True)
+    progress.start(len(variants))
+    for variant in variants:
         _link_compose_to_integrated_product(request, compose_obj, variant)
-        variant_type = release_models.VariantType.objects.get(name=variant.type)
         variant_obj, created = models.Variant.objects.get_or_create(
             compose=compose_obj,
             variant_id=variant.id,
             variant_uid=variant.uid,
             variant_name=variant.name,
-            variant_type=variant_type
+            variant_type_id=release_models.VariantType.get_cached_id(variant.type)
         )
         if created:
             add_to_changelog.append(variant_obj)
@@ -179,31 +234,35 @@ def compose__import_rpms(request, release_id, composeinfo, rpm_manifest):
         _store_relative_path_for_compose(compose_obj, variants_info, variant, variant_obj, add_to_changelog)
 
         for arch in variant.arches:
-            arch_obj = common_models.Arch.objects.get(name=arch)
-            var_arch_obj, _ = models.VariantArch.objects.get_or_create(arch=arch_obj,
+            var_arch_obj, _ = models.VariantArch.objects.get_or_create(arch_id=common_models.Arch.get_cached_id(arch),
                                                                        variant=variant_obj)
-
-            compose_rpms_in_db = set()
-            qs = models.ComposeRPM.objects.filter(variant_arch=var_arch_obj).values_list('variant_arch_id',
-                                                                                         'rpm_id')
-            for (variant_arch_id, rpm_id) in qs.iterator():
-                key = "%s/%s" % (variant_arch_id, rpm_id)
-                compose_rpms_in_db.add(key)
-
-            sources = set()
-            for srpm_nevra, rpms in rm.rpms.get(variant.uid, {}).get(arch, {}).iteritems():
-                sources.add(srpm_nevra)
-                for rpm_nevra, rpm_data in rpms.iteritems():
-                    imported_rpms += 1
-                    path, filename = os.path.split(rpm_data['path'])
-                    rpm_id = get_or_insert_rpm(rpms_in_db, cursor, rpm_nevra, srpm_nevra, filename)
-                    sigkey_id = common_models.SigKey.get_cached_id(rpm_data["sigkey"], create=True)
-                    path_id = models.Path.get_cached_id(path, create=True)
-                    content_category = rpm_data["category"]
-                    content_category_id = repository_models.ContentCategory.get_cached_id(content_category)
-                    insert_compose_rpms_if_nonexist(compose_rpms_in_db, cursor,
-                                                    var_arch_obj.id, rpm_id,
-                                                    content_category_id, sigkey_id, path_id)
+            variant_arch_ids[(variant.uid, arch)] = var_arch_obj.id
+        progress.variant_done()
+
+    # RPMs are processed in batches so that memory usage does not depend on
+    # size of the manifest and each batch needs only a few queries.
+    rpms = {}
+    compose_rpms = []
+    for variant_uid, arch, srpm_nevra, rpm_nevra, rpm_data in manifest_rpms:
+        variant_arch_id = variant_arch_ids.get((variant_uid, arch))
+        if variant_arch_id is None:
+            # Not in composeinfo.
+            continue
+        imported_rpms += 1
+        path, filename = os.path.split(rpm_data['path'])
+        rpms.setdefault(rpm_nevra, (srpm_nevra, filename))
+        sigkey_id = common_models.SigKey.get_cached_id(rpm_data["sigkey"], create=True)
+        path_id = models.Path.get_cached_id(path, create=True)
+        content_category = rpm_data["category"]
+        content_category_id = repository_models.ContentCategory.get_cached_id(content_category)
+        compose_rpms.append((variant_arch_id, rpm_nevra, content_category_id, sigkey_id, path_id))
+        if len(compose_rpms) >= IMPORT_BATCH_SIZE:
+            _link_compose_rpms(cursor, compose_obj.pk, rpms, compose_rpms)
+            progress.update(rpms_linked=imported_rpms)
+            rpms = {}
+            compose_rpms = []
+    _link_compose_rpms(cursor, compose_obj.pk, rpms, compose_rpms)
+    progress.update(rpms_linked=imported_rpms)
 
     for obj in add_to_changelog:
         lib._maybe_log(request, True, obj)
@@ -221,7 +280,8 @@ def compose__import_rpms(request, release_id, composeinfo, rpm_manifest):
 
 
 @transaction.atomic(savepoint=False)
-def compose__import_images(request, release_id, composeinfo, image_manifest):
+def compose__import_images(request, release_id, composeinfo, image_manifest, progress=None):
+    progress = progress or ImportProgress()
     release_obj = release_models.Release.objects.get(release_id=release_id)
 
     ci = productmd.composeinfo.ComposeInfo()
@@ -233,13 +293,13 @@ def compose__import_images(request, release_id, composeinfo, image_manifest):
     _maybe_raise_inconsistency_error(ci, im, 'images')
 
     compose_date = "%s-%s-%s" % (ci.compose.date[:4], ci.compose.date[4:6], ci.compose.date[6:])
-    compose_type = models.ComposeType.objects.get(name=ci.compose.type)
+    compose_type_id = models.ComposeType.get_cached_id(ci.compose.type)
     compose_obj, created = lib._logged_get_or_create(
         request, models.Compose,
         release=release_obj,
         compose_id=ci.compose.id,
         compose_date=compose_date,
-        compose_type=compose_type,
+        compose_type_id=compose_type_id,
         compose_respin=ci.compose.respin,
         compose_label=ci.compose.label or None,
     )
@@ -251,15 +311,16 @@ def compose__import_images(request, release_id, composeinfo, image_manifest):
     imported_images = 0
 
     variants_info = composeinfo['payload']['variants']
-    for variant in ci.get_variants(recursive=True):
+    variants = ci.get_variants(recursive=True)
+    progress.start(len(variants))
+    for variant in variants:
         _link_compose_to_integrated_product(request, compose_obj, variant)
-        variant_type = release_models.VariantType.objects.get(name=variant.type)
         variant_obj, created = models.Variant.objects.get_or_create(
             compose=compose_obj,
             variant_id=variant.id,
             variant_uid=variant.uid,
             variant_name=variant.name,
-            variant_type=variant_type
+            variant_type_id=release_models.VariantType.get_cached_id(variant.type)
         )
         if created:
             add_to_changelog.append(variant_obj)
@@ -267,8 +328,8 @@ def compose__import_images(request, release_id, composeinfo, image_manifest):
         _store_relative_path_for_compose(compose_obj, variants_info, variant, variant_obj, add_to_changelog)
 
         for arch in variant.arches:
-            arch_obj = common_models.Arch.objects.get(name=arch)
-            var_arch_obj, created = models.VariantArch.objects.get_or_create(arch=arch_obj, variant=variant_obj)
+            var_arch_obj, created = models.VariantArch.objects.get_or_create(
+                arch_id=common_models.Arch.get_cached_id(arch), variant=variant_obj)
 
             for i in im.images.get(variant.uid, {}).get(arch, []):
                 path, file_name = os.path.split(i.path)
@@ -298,6 +359,8 @@ def compose__import_images(request, release_id, composeinfo, image_manifest):
                     image=image,
                     path_id=path_id)
                 imported_images += 1
+        progress.variant_done()
+    progress.update(images_linked=imported_images)
 
     for obj in add_to_changelog:
         lib._maybe_log(request, True, obj)
@@ -354,14 +417,117 @@ def _set_compose_tree_location(request, compose_id, composeinfo, location, url,
 
 
 @transaction.atomic(savepoint=False)
-def compose__full_import(request, release_id, composeinfo, rpm_manifest, image_manifest, location, url, scheme):
-    compose_id, imported_rpms = compose__import_rpms(request, release_id, composeinfo, rpm_manifest)
+def compose__full_import(request, release_id, composeinfo, rpm_manifest, image_manifest, location, url, scheme,
+                         progress=None):
+    progress = progress or ImportProgress()
+    compose_id, imported_rpms = compose__import_rpms(request, release_id, composeinfo, rpm_manifest,
+                                                     progress=progress)
     # if compose__import_images return successfully, it should return same compose id
-    _, imported_images = compose__import_images(request, release_id, composeinfo, image_manifest)
+    _, imported_images = compose__import_images(request, release_id, composeinfo, image_manifest,
+                                                progress=progress)
     set_locations = _set_compose_tree_location(request, compose_id, composeinfo, location, url, scheme)
+    progress.update(set_locations=set_locations)
     return compose_id, imported_rpms, imported_images, set_locations
 
 
+class _ImportJobRequest(object):
+    """
+    Stand-in for the HTTP request when an import job runs in a worker. It
+    provides the attributes the import functions and serializers use:
+    changeset, data, query_params, user and the list of queued messages.
+    """
+    def __init__(self, job, data):
+        self.user = job.author
+        self.data = data
+        self.query_params = QueryDict('')
+        self.changeset = Changeset(author=job.author, comment=job.comment)
+        self.changeset.requested_on = job.created_on
+        self._messagings = []
+        self._request = self
+
+
+class _ImportJobProgress(ImportProgress):
+    """
+    Store progress of an import job. The counters are written through a
+    separate database connection, as the import itself runs in a transaction
+    and its changes are not visible to anybody else before it finishes.
+    """
+    def __init__(self, job):
+        self.job = job
+        self.using = _get_progress_db_alias()
+
+    def _store(self, **counters):
+        for name, value in counters.iteritems():
+            setattr(self.job, name, value)
+        if self.using:
+            models.ComposeImportJob.objects.using(self.using).filter(pk=self.job.pk).update(**counters)
+
+    def start(self, variants):
+        self._store(variants_total=self.job.variants_total + variants)
+
+    def variant_done(self):
+        self._store(variants_done=self.job.variants_done + 1)
+
+    def update(self, **counters):
+        self._store(**counters)
+
+
+def _get_progress_db_alias():
+    """
+    Return alias of the database connection configured for storing progress
+    of import jobs by `COMPOSE_IMPORT_PROGRESS_DB` setting, or None if
+    progress can only be stored once the job is finished. That is also the
+    case with SQLite, which does not allow a second connection to write while
+    the import transaction is open.
+    """
+    alias = getattr(settings, 'COMPOSE_IMPORT_PROGRESS_DB', None)
+    if not alias or connections[alias].vendor == 'sqlite':
+        return None
+    return alias
+
+
+def compose__run_import_job(job):
+    """
+    Run an import job created by the asynchronous mode of import end-points.
+    The job must already be claimed by the caller. The changes are recorded in
+    a changeset authored by the user who submitted the job and messages are
+    sent (or stored in outbox) once the import is committed, exactly as if the import ran inside
+    the original request. On failure the job stores the same error response
+    the synchronous end-point would return.
+    """
+    progress = _ImportJobProgress(job)
+    try:
+        # The RPMs are streamed to a temporary file the same way as in request.
+        data = StreamingManifestParser().parse(BytesIO(job.data.encode('utf-8')))
+        request = _ImportJobRequest(job, data)
+        with transaction.atomic():
+            if job.kind == models.ComposeImportJob.RPMS:
+                job.compose_id, _ = compose__import_rpms(request, data['release_id'], data['composeinfo'],
+                                                         data['rpm_manifest'], progress=progress)
+            elif job.kind == models.ComposeImportJob.IMAGES:
+                job.compose_id, _ = compose__import_images(request, data['release_id'], data['composeinfo'],
+                                                           data['image_manifest'], progress=progress)
+            else:
+                job.compose_id, _, _, _ = compose__full_import(request, data['release_id'], data['composeinfo'],
+                                                               data['rpm_manifest'], data['image_manifest'],
+                                                               data['location'], data['url'], data['scheme'],
+                                                               progress=progress)
+            request.changeset.commit()
+            store_messages(request)
+    except Exception as e:
+        response = exception_handler(e, {})
+        job.error = json.dumps(response.data if response is not None else {'detail': str(e)})
+        job.state = models.ComposeImportJob.FAILED
+        common_models.clear_lookup_caches()
+    else:
+        job.state = models.ComposeImportJob.DONE
+        for topic, msg in request._messagings:
+            messenger.send_message(topic=topic, msg=msg)
+    if not job.finish():
+        logger.warning('Compose import job %s was reclaimed while running, its result is discarded.' % job.pk)
+    return job
+
+
 def _find_composes_srpm_name_with_rpm_nvr(nvr):
     """
     Filter composes and SRPM's name with rpm nvr
@@ -0,0 +1,132 @@
+#
+# Copyright (c) 2015 Red Hat
+# Licensed under The MIT License (MIT)
+# http://opensource.org/licenses/MIT
+#
+import logging
+import multiprocessing
+import threading
+import time
+
+from django import db
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pdc.apps.compose import lib
+from pdc.apps.compose.models import ComposeImportJob
+
+
+logger = logging.getLogger(__name__)
+
+
+def claim_next_job():
+    """
+    Find the oldest waiting job and claim it. Returns None if there is no job
+    waiting.
+    """
+    while True:
+        waiting = list(ComposeImportJob.objects.filter(state=ComposeImportJob.WAITING)
+                       .values_list('pk', flat=True)[:10])
+        if not waiting:
+            return None
+        for pk in waiting:
+            job = ComposeImportJob(pk=pk, state=ComposeImportJob.WAITING)
+            if job.claim():
+                return ComposeImportJob.objects.get(pk=pk)
+
+
+class Heartbeat(threading.Thread):
+    """
+    Periodically record that a job is still running. The thread has its own
+    database connection, so the updates are visible to other workers while
+    the import transaction is open.
+    """
+    def __init__(self, job, interval):
+        super(Heartbeat, self).__init__()
+        self.daemon = True
+        self.job = job
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    self.job.beat()
+                except Exception:
+                    logger.exception('Failed to store heartbeat of compose import job %s.' % self.job.pk)
+        finally:
+            db.connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run_job(job):
+    # SQLite does not allow the heartbeat to be written while the import
+    # transaction is open.
+    heartbeat = None
+    if db.connection.vendor != 'sqlite':
+        heartbeat = Heartbeat(job, getattr(settings, 'COMPOSE_IMPORT_HEARTBEAT_SECONDS', 30))
+        heartbeat.start()
+    try:
+        lib.compose__run_import_job(job)
+    finally:
+        if heartbeat:
+            heartbeat.stop()
+
+
+def run_worker(poll_interval, once):
+    # On SQLite there are no heartbeats, so running jobs look stale after the
+    # timeout. Only one worker process can run there and it does not reclaim
+    # jobs while running one.
+    stale_timeout = getattr(settings, 'COMPOSE_IMPORT_STALE_SECONDS', 600)
+    while True:
+        db.close_old_connections()
+        try:
+            reclaimed = ComposeImportJob.reclaim_stale(stale_timeout)
+            if reclaimed:
+                logger.warning('Reclaimed %d compose import jobs of dead workers.' % reclaimed)
+            job = claim_next_job()
+            if job is not None:
+                logger.info('Running compose import job %s (%s).' % (job.pk, job.kind))
+                run_job(job)
+                logger.info('Compose import job %s finished: %s.' % (job.pk, job.state))
+                continue
+        except db.DatabaseError:
+            # The connection may be broken, a new one is opened next time.
+            logger.exception('Database error in compose import worker.')
+            db.connection.close()
+        if once:
+            return
+        time.sleep(poll_interval)
+
+
+class Command(BaseCommand):
+    help = 'Run compose imports submitted in asynchronous mode.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Number of worker processes to start.')
+        parser.add_argument('--poll-interval', type=float, default=5,
+                            help='Number of seconds to wait when there is no job.')
+        parser.add_argument('--once', action='store_true', default=False,
+                            help='Exit when there are no more waiting jobs.')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        # Without heartbeats, workers would reclaim jobs running in each other.
+        if processes > 1 and db.connection.vendor == 'sqlite':
+            raise CommandError('Only one worker process can run with SQLite database.')
+        if processes == 1:
+            run_worker(options['poll_interval'], options['once'])
+            return
+        # Database connections must not be shared with the child processes.
+        db.connections.close_all()
+        workers = [multiprocessing.Process(target=run_worker, args=(options['poll_interval'], options['once']))
+                   for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,30 @@
+#
+# Copyright (c) 2015 Red Hat
+# Licensed under The MIT License (MIT)
+# http://opensource.org/licenses/MIT
+#
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from pdc.apps.compose.models import Compose, ComposeSigKey
+
+
+class Command(BaseCommand):
+    help = 'Recompute summary of signing keys used in composes from linked RPMs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('compose_id', nargs='*',
+                            help='Composes to process, all composes are processed if none is given.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        compose_ids = None
+        if options['compose_id']:
+            composes = dict(Compose.objects.filter(compose_id__in=options['compose_id'])
+                            .values_list('compose_id', 'pk'))
+            missing = set(options['compose_id']) - set(composes)
+            if missing:
+                raise CommandError('Unknown composes: %s' % ', '.join(sorted(missing)))
+            compose_ids = composes.values()
+        count = ComposeSigKey.rebuild(compose_ids)
+        self.stdout.write('Stored %d signing keys.' % count)
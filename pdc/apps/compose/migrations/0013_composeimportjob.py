@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('compose', '0012_auto_20160615_0611'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComposeImportJob',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('kind', models.CharField(max_length=20, choices=[('rpms', 'rpms'), ('images', 'images'), ('full', 'full')])),
+                ('state', models.CharField(default='waiting', max_length=20, db_index=True, choices=[('waiting', 'waiting'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')])),
+                ('comment', models.TextField(null=True, blank=True)),
+                ('data', models.TextField()),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('started_on', models.DateTimeField(null=True, blank=True)),
+                ('finished_on', models.DateTimeField(null=True, blank=True)),
+                ('compose_id', models.CharField(max_length=200, null=True, blank=True)),
+                ('variants_total', models.PositiveIntegerField(default=0)),
+                ('variants_done', models.PositiveIntegerField(default=0)),
+                ('rpms_linked', models.PositiveIntegerField(default=0)),
+                ('images_linked', models.PositiveIntegerField(default=0)),
+                ('set_locations', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(null=True, blank=True)),
+                ('author', models.ForeignKey(blank=True, to=settings.AUTH_USER_MODEL, null=True)),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def populate_sigkey_summary(apps, schema_editor):
+    ComposeRPM = apps.get_model('compose', 'ComposeRPM')
+    ComposeSigKey = apps.get_model('compose', 'ComposeSigKey')
+    pairs = ComposeRPM.objects.order_by().values_list('variant_arch__variant__compose_id', 'sigkey_id').distinct()
+    ComposeSigKey.objects.bulk_create([ComposeSigKey(compose_id=compose_id, sigkey_id=sigkey_id)
+                                       for compose_id, sigkey_id in pairs],
+                                      batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_auto_20150512_0703'),
+        ('compose', '0013_composeimportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComposeSigKey',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('compose', models.ForeignKey(related_name='sigkey_summary', to='compose.Compose')),
+                ('sigkey', models.ForeignKey(blank=True, to='common.SigKey', null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='composesigkey',
+            unique_together=set([('compose', 'sigkey')]),
+        ),
+        migrations.RunPython(populate_sigkey_summary, migrations.RunPython.noop),
+    ]
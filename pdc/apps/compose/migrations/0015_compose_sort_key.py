@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+# Copy of the code in models as it was when this migration was written.
+COMPOSE_TYPES = ['test', 'nightly', 'production']
+
+
+def encode_sortable_int(value):
+    digits = str(value)
+    return '%02d%s' % (len(digits), digits)
+
+
+def compose_sort_key(release_short, release_version, compose_date, compose_type, compose_respin):
+    key = ''.join('%03d' % ord(c) for c in release_short) + '000'
+    try:
+        key += ''.join('1' + encode_sortable_int(int(x)) for x in release_version.split('.')) + '0'
+    except ValueError:
+        key += '0'
+    key += str(compose_date).replace('-', '')
+    try:
+        key += str(COMPOSE_TYPES.index(compose_type))
+    except ValueError:
+        key += str(len(COMPOSE_TYPES))
+    return key + encode_sortable_int(compose_respin)
+
+
+def populate_sort_keys(apps, schema_editor):
+    Compose = apps.get_model('compose', 'Compose')
+    for compose in Compose.objects.select_related('release', 'compose_type'):
+        compose.sort_key = compose_sort_key(compose.release.short, compose.release.version, compose.compose_date,
+                                            compose.compose_type.name, compose.compose_respin)
+        compose.save(update_fields=['sort_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compose', '0014_composesigkey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compose',
+            name='sort_key',
+            field=models.CharField(default='', max_length=1000, editable=False, db_index=True),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_sort_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def populate_rpm_index(apps, schema_editor):
+    ComposeRPM = apps.get_model('compose', 'ComposeRPM')
+    ComposeRPMIndex = apps.get_model('compose', 'ComposeRPMIndex')
+    rows = (ComposeRPM.objects.order_by()
+            .values_list('rpm__name', 'variant_arch__variant__compose_id', 'rpm_id')
+            .distinct())
+    ComposeRPMIndex.objects.bulk_create([ComposeRPMIndex(rpm_name=rpm_name, compose_id=compose_id, rpm_id=rpm_id)
+                                         for rpm_name, compose_id, rpm_id in rows],
+                                        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('package', '0015_rpm_name_trigram_index'),
+        ('compose', '0015_compose_sort_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComposeRPMIndex',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('rpm_name', models.CharField(max_length=200)),
+                ('compose', models.ForeignKey(to='compose.Compose')),
+                ('rpm', models.ForeignKey(to='package.RPM')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='composerpmindex',
+            unique_together=set([('compose', 'rpm')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='composerpmindex',
+            index_together=set([('rpm_name', 'compose')]),
+        ),
+        migrations.RunPython(populate_rpm_index, migrations.RunPython.noop),
+    ]
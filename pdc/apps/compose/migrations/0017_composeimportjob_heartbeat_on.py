@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.db.models import F
+
+
+def set_heartbeat_of_running_jobs(apps, schema_editor):
+    ComposeImportJob = apps.get_model('compose', 'ComposeImportJob')
+    ComposeImportJob.objects.filter(state='running').update(heartbeat_on=F('started_on'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compose', '0016_composerpmindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='composeimportjob',
+            name='heartbeat_on',
+            field=models.DateTimeField(db_index=True, null=True, blank=True),
+        ),
+        migrations.RunPython(set_heartbeat_of_running_jobs, migrations.RunPython.noop),
+    ]
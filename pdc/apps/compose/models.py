@@ -3,12 +3,23 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
+import bisect
+import datetime
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models, connection, transaction
+from django.db.models import Count, Max, signals
 from django.db.utils import IntegrityError
+from django.dispatch import receiver
+from django.utils import timezone
 
+from pdc.apps.changeset.models import LatestChange
 from pdc.apps.common import models as common_models
-from pdc.apps.common.hacks import add_returning
+from pdc.apps.common.hacks import add_returning, bulk_insert_ignore, encode_sortable_int
+from pdc.apps.release.models import Release
 
 from productmd import composeinfo
 
@@ -19,6 +30,13 @@ class ComposeType(models.Model):
     def __unicode__(self):
         return u"%s" % self.name
 
+    CACHE = common_models.LookupCache('name')
+
+    @classmethod
+    def get_cached_id(cls, value):
+        """cached `name` to `id`"""
+        return common_models.get_cached_id(cls, value)
+
 
 class ComposeAcceptanceTestingState(models.Model):
     name                = models.CharField(max_length=200, unique=True)
@@ -32,6 +50,26 @@ class ComposeAcceptanceTestingState(models.Model):
         return u"%s" % self.name
 
 
+def compose_sort_key(release_short, release_version, compose_date, compose_type, compose_respin):
+    """
+    Build a string whose ordering matches ordering of composes: first by
+    release short name and version (as in `Release.version_sort_key`), then by
+    date, type and respin as in *productmd*. The key consists only of digits
+    so that it sorts the same way under any database collation.
+    """
+    key = ''.join('%03d' % ord(c) for c in release_short) + '000'
+    try:
+        key += ''.join('1' + encode_sortable_int(int(x)) for x in release_version.split('.')) + '0'
+    except ValueError:
+        key += '0'
+    key += str(compose_date).replace('-', '')
+    try:
+        key += str(composeinfo.COMPOSE_TYPES.index(compose_type))
+    except ValueError:
+        key += str(len(composeinfo.COMPOSE_TYPES))
+    return key + encode_sortable_int(compose_respin)
+
+
 class Compose(models.Model):
     release             = models.ForeignKey("release.Release")
     compose_id          = models.CharField(max_length=200, unique=True)
@@ -44,6 +82,8 @@ class Compose(models.Model):
     acceptance_testing  = models.ForeignKey(ComposeAcceptanceTestingState,
                                             default=ComposeAcceptanceTestingState.get_untested)
     linked_releases     = models.ManyToManyField('release.Release', related_name='linked_composes', blank=True)
+    # Computed from the fields above on each save, see `compose_sort_key`.
+    sort_key            = models.CharField(max_length=1000, db_index=True, editable=False)
 
     class Meta:
         unique_together = (
@@ -65,36 +105,26 @@ class Compose(models.Model):
     def __cmp__(self, another):
         """
         If both composes belong to the same release, they are compared by
-        productmd. Otherwise they inherit the order from releases.
+        productmd. Otherwise they inherit the order from releases. The order
+        is precomputed in `sort_key`, use it for sorting in database.
         """
-        if self.release == another.release:
-            return cmp(self._get_compose_info(), another._get_compose_info())
-        return cmp(self.release.version_sort_key(), another.release.version_sort_key())
+        return cmp(self.sort_key, another.sort_key)
 
-    def _get_compose_info(self):
-        if not hasattr(self, '_compose_info'):
-            self._compose_info = composeinfo.Compose(None)
-            self._compose_info.id = self.compose_id
-            self._compose_info.date = self.compose_date
-            self._compose_info.respin = self.compose_respin
-            self._compose_info.type = self.compose_type.name
-        return self._compose_info
+    def get_sort_key(self):
+        return compose_sort_key(self.release.short, self.release.version, self.compose_date,
+                                self.compose_type.name, self.compose_respin)
 
     @property
     def sigkeys(self):
         """
-        Get a list of sigkey ids used in the compose.
+        Get a list of sigkey ids used in the compose. Unsigned RPMs are
+        represented by None at the end of the list.
         """
-        sigkeys = common_models.SigKey.objects.filter(composerpm__variant_arch__variant__compose=self).distinct()
-        result = sorted([i.key_id for i in sigkeys])
-        if self.exist_unsigned:
-            # detect unsigned RPMs
-            result.append(None)
-        return result
+        return ComposeSigKey.sorted_key_ids(self.sigkey_summary.values_list('sigkey__key_id', flat=True))
 
     @property
     def exist_unsigned(self):
-        return ComposeRPM.objects.filter(variant_arch__variant__compose=self, sigkey=None).exists()
+        return self.sigkey_summary.filter(sigkey=None).exists()
 
     def get_rpm_mapping(self, package, disable_overrides=False, release=None):
         """
@@ -131,24 +161,14 @@ class Compose(models.Model):
         compose was built will be used. The overrides will be taken from this
         release as well as variants and arches.
         """
-        release = release or self.release
-        mapping = ComposeRPMMapping()
-        mapping.load_from_compose(self, package, release)
-        overrides = OverrideRPM.objects.filter(release=release).filter(srpm_name=package)
-        useless_overrides = []
-        if not disable_overrides:
-            useless_overrides = mapping.apply_overrides(overrides)
-
-        return mapping, useless_overrides
+        return RPMMappingEngine(self, release).get_rpm_mapping(package, disable_overrides)
 
     def get_rpms(self, rpm_name):
         """
         Find all RPMs with given name associated with this compose.
         """
         from pdc.apps.package.models import RPM
-        return (RPM.objects.filter(name=rpm_name)
-                .filter(composerpm__variant_arch__variant__compose=self)
-                .distinct())
+        return RPM.objects.filter(composerpmindex__compose=self, composerpmindex__rpm_name=rpm_name)
 
     def get_arch_testing_status(self):
         """
@@ -171,7 +191,58 @@ def find_by(list, key, val):
 # This is duplicate by design
 # these variants are a snapshot of real compose content
 # -> no direct relation to release variants
-class Variant(models.Model):
+@receiver(signals.pre_save, sender=Compose)
+def _set_compose_sort_key(sender, instance, raw, **kwargs):
+    try:
+        instance.sort_key = instance.get_sort_key()
+    except Release.DoesNotExist:
+        # Fixtures may contain the release later, the key is set when it is saved.
+        if not raw:
+            raise
+
+
+@receiver(signals.post_save, sender=Release)
+def _update_compose_sort_keys(sender, instance, **kwargs):
+    # Short and version of release are part of the key.
+    for compose in instance.compose_set.select_related('compose_type'):
+        compose.release = instance
+        sort_key = compose.get_sort_key()
+        if sort_key != compose.sort_key:
+            Compose.objects.filter(pk=compose.pk).update(sort_key=sort_key)
+
+
+class LoadedValuesMixin(object):
+    """
+    Remember values of `tracked_fields` as they were loaded from database,
+    so that receivers of save signals can tell what changed without another
+    query. Fixtures are not loaded from database, `load_tracked_values` gets
+    the stored values for them.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(LoadedValuesMixin, cls).from_db(db, field_names, values)
+        # Deferred fields are not loaded, reading them would run a query.
+        instance._loaded_values = dict((name, instance.__dict__[name])
+                                       for name in cls.tracked_fields if name in instance.__dict__)
+        return instance
+
+    def load_tracked_values(self):
+        self._loaded_values = {}
+        if self.pk is not None:
+            self._loaded_values = type(self).objects.filter(pk=self.pk).values(*self.tracked_fields).first() or {}
+
+    def get_changed_values(self):
+        """Return dict of tracked fields changed since loaded and their old values."""
+        loaded = getattr(self, '_loaded_values', {})
+        return dict((name, value) for name, value in loaded.iteritems() if value != getattr(self, name))
+
+    def reset_tracked_values(self):
+        self._loaded_values = dict((name, getattr(self, name)) for name in self.tracked_fields)
+
+
+class Variant(LoadedValuesMixin, models.Model):
     compose             = models.ForeignKey(Compose)
     variant_id          = models.CharField(max_length=100, blank=False)
     variant_uid         = models.CharField(max_length=200, blank=False)
@@ -179,6 +250,8 @@ class Variant(models.Model):
     variant_type        = models.ForeignKey("release.VariantType", related_name="compose_variant")
     deleted             = models.BooleanField(default=False)
 
+    tracked_fields = ('compose_id', )
+
     class Meta:
         unique_together = (
             ("compose", "variant_uid"),
@@ -203,13 +276,15 @@ class Variant(models.Model):
         }
 
 
-class VariantArch(models.Model):
+class VariantArch(LoadedValuesMixin, models.Model):
     variant             = models.ForeignKey(Variant)
     arch                = models.ForeignKey("common.Arch", related_name="+")
     rtt_testing_status  = models.ForeignKey(ComposeAcceptanceTestingState,
                                             default=ComposeAcceptanceTestingState.get_untested)
     deleted             = models.BooleanField(default=False)
 
+    tracked_fields = ('variant_id', )
+
     class Meta:
         unique_together = (
             ("variant", "arch"),
@@ -243,11 +318,12 @@ class Path(models.Model):
             "path": self.path
         }
 
-    CACHE = {}
+    # There can be many paths, keep only the recently used ones.
+    CACHE = common_models.LookupCache('path', max_size=getattr(settings, 'PATH_CACHE_SIZE', 10000))
 
     @classmethod
     def get_cached_id(cls, value, create=False):
-        return common_models.get_cached_id(cls, 'path', value, create)
+        return common_models.get_cached_id(cls, value, create)
 
 
 class ComposeRPMManager(models.Manager):
@@ -255,7 +331,7 @@ class ComposeRPMManager(models.Manager):
         return super(ComposeRPMManager, self).get_queryset().select_related("rpm", "sigkey", "content_category")
 
 
-class ComposeRPM(models.Model):
+class ComposeRPM(LoadedValuesMixin, models.Model):
     variant_arch        = models.ForeignKey(VariantArch, db_index=True)
     rpm                 = models.ForeignKey("package.RPM", db_index=True)
     sigkey              = models.ForeignKey("common.SigKey", null=True, blank=True)
@@ -263,6 +339,7 @@ class ComposeRPM(models.Model):
     path                = models.ForeignKey(Path)
 
     objects = ComposeRPMManager()
+    tracked_fields = ('variant_arch_id', 'rpm_id', 'sigkey_id')
 
     class Meta:
         unique_together = (
@@ -272,6 +349,20 @@ class ComposeRPM(models.Model):
     def __unicode__(self):
         return u"%s/%s/%s" % (self.variant_arch.variant.compose.compose_id, self.variant_arch, self.rpm)
 
+    @staticmethod
+    def delete_many(compose_rpms):
+        """
+        Delete given ComposeRPMs and update the index of RPMs and the summary
+        of signing keys of their composes. ComposeRPMs have no delete signal receivers, so this must be
+        used instead of deleting them directly.
+        """
+        sigkeys = list(compose_rpms.order_by()
+                       .values_list('variant_arch__variant__compose_id', 'sigkey_id').distinct())
+        compose_rpms.delete()
+        _remove_stale_from_rpm_index(compose_id for compose_id, _ in sigkeys)
+        for compose_id, sigkey_id in sigkeys:
+            ComposeSigKey.remove_unused(compose_id, [sigkey_id])
+
     @staticmethod
     def bulk_insert(cursor, variant_arch_id, rpm_id, content_category_id, sigkey_id, path_id):
         sql = add_returning("""INSERT INTO %s (variant_arch_id, rpm_id, sigkey_id, content_category_id, path_id)
@@ -293,6 +384,242 @@ class ComposeRPM(models.Model):
         transaction.savepoint_commit(sid)
         return insert_id
 
+    @staticmethod
+    def bulk_insert_many(cursor, rows):
+        """
+        Insert multiple ComposeRPMs at once. Each row is a tuple of
+        (variant_arch_id, rpm_id, content_category_id, sigkey_id, path_id).
+        Rows for already existing (variant_arch, rpm) pairs are skipped.
+        """
+        bulk_insert_ignore(cursor, ComposeRPM._meta.db_table,
+                           ['variant_arch_id', 'rpm_id', 'content_category_id', 'sigkey_id', 'path_id'],
+                           rows)
+
+
+class ComposeSigKey(models.Model):
+    """
+    Summary of signing keys used by RPMs in a compose, so that they do not
+    have to be computed from all ComposeRPMs. Unsigned RPMs are represented
+    by a row without sigkey.
+    """
+    compose             = models.ForeignKey(Compose, related_name='sigkey_summary')
+    sigkey              = models.ForeignKey("common.SigKey", null=True, blank=True)
+
+    class Meta:
+        unique_together = (
+            ("compose", "sigkey"),
+        )
+
+    def __unicode__(self):
+        return u"%s/%s" % (self.compose.compose_id, self.sigkey.key_id if self.sigkey else None)
+
+    @staticmethod
+    def sorted_key_ids(key_ids):
+        """Sort key ids, None (for unsigned RPMs) goes last."""
+        key_ids = set(key_ids)
+        result = sorted(key_id for key_id in key_ids if key_id is not None)
+        if None in key_ids:
+            result.append(None)
+        return result
+
+    @staticmethod
+    def add(compose_id, sigkey_ids):
+        """
+        Record that RPMs signed by given keys (None for unsigned) are in the
+        compose. Keys already known for the compose are skipped.
+        """
+        existing = set(ComposeSigKey.objects.filter(compose_id=compose_id).values_list('sigkey_id', flat=True))
+        ComposeSigKey.objects.bulk_create([ComposeSigKey(compose_id=compose_id, sigkey_id=sigkey_id)
+                                           for sigkey_id in set(sigkey_ids) - existing])
+
+    @staticmethod
+    def remove_unused(compose_id, sigkey_ids, excluded_variant_arch_id=None):
+        """
+        Forget given keys of the compose unless some of its ComposeRPMs are
+        still signed by them. ComposeRPMs of the excluded variant arch, which
+        is about to be deleted, are not considered.
+        """
+        for sigkey_id in set(sigkey_ids):
+            compose_rpms = ComposeRPM.objects.filter(variant_arch__variant__compose_id=compose_id,
+                                                     sigkey_id=sigkey_id)
+            if excluded_variant_arch_id is not None:
+                compose_rpms = compose_rpms.exclude(variant_arch_id=excluded_variant_arch_id)
+            if not compose_rpms.exists():
+                ComposeSigKey.objects.filter(compose_id=compose_id, sigkey_id=sigkey_id).delete()
+
+    @staticmethod
+    def rebuild(compose_ids=None):
+        """
+        Compute the summary from ComposeRPMs again for composes with given
+        database ids, or for all composes if no ids are given. Return number
+        of stored rows.
+        """
+        summary = ComposeSigKey.objects.all()
+        compose_rpms = ComposeRPM.objects.order_by()
+        if compose_ids is not None:
+            summary = summary.filter(compose_id__in=compose_ids)
+            compose_rpms = compose_rpms.filter(variant_arch__variant__compose_id__in=compose_ids)
+        pairs = compose_rpms.values_list('variant_arch__variant__compose_id', 'sigkey_id').distinct()
+        rows = [ComposeSigKey(compose_id=compose_id, sigkey_id=sigkey_id) for compose_id, sigkey_id in pairs]
+        summary.delete()
+        ComposeSigKey.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+
+@receiver(signals.post_save, sender=ComposeRPM)
+def _update_sigkey_summary(sender, instance, **kwargs):
+    # Bulk writes during import update the summary directly.
+    compose_id = _get_compose_id(instance.variant_arch_id)
+    if compose_id is not None:
+        ComposeSigKey.add(compose_id, [instance.sigkey_id])
+    changed = instance.get_changed_values()
+    if 'variant_arch_id' in changed or 'sigkey_id' in changed:
+        old_compose_id = _get_compose_id(changed.get('variant_arch_id', instance.variant_arch_id))
+        if old_compose_id is not None:
+            ComposeSigKey.remove_unused(old_compose_id, [changed.get('sigkey_id', instance.sigkey_id)])
+
+
+class ComposeRPMIndex(models.Model):
+    """
+    Denormalized index of RPMs in composes by RPM name. It allows finding
+    composes with given package without joining through variants, their
+    arches and all ComposeRPMs. There is one row for each RPM in a compose,
+    no matter in how many variants and arches it is.
+    """
+    rpm_name            = models.CharField(max_length=200)
+    compose             = models.ForeignKey(Compose)
+    rpm                 = models.ForeignKey("package.RPM")
+
+    class Meta:
+        unique_together = (
+            ("compose", "rpm"),
+        )
+        index_together = (
+            ("rpm_name", "compose"),
+        )
+
+    def __unicode__(self):
+        return u"%s/%s" % (self.compose.compose_id, self.rpm)
+
+    @staticmethod
+    def bulk_insert_many(cursor, rows):
+        """
+        Add multiple rows of (rpm_name, compose_id, rpm_id) to the index.
+        Already indexed RPMs are skipped.
+        """
+        bulk_insert_ignore(cursor, ComposeRPMIndex._meta.db_table, ['rpm_name', 'compose_id', 'rpm_id'], rows)
+
+
+def _index_compose_rpms(compose_rpms):
+    rows = compose_rpms.values_list('rpm__name', 'variant_arch__variant__compose_id', 'rpm_id')
+    ComposeRPMIndex.bulk_insert_many(connection.cursor(), list(rows))
+
+
+def _refresh_rpm_index(compose_ids, rpm_ids=None):
+    """
+    Make the index rows of given composes match their ComposeRPMs. It can be
+    limited to only some RPMs.
+    """
+    for compose_id in set(compose_ids):
+        compose_rpms = ComposeRPM.objects.filter(variant_arch__variant__compose_id=compose_id)
+        index = ComposeRPMIndex.objects.filter(compose_id=compose_id)
+        if rpm_ids is not None:
+            compose_rpms = compose_rpms.filter(rpm_id__in=rpm_ids)
+            index = index.filter(rpm_id__in=rpm_ids)
+        # The RPM stays in the index if it is in other variant or arch of the compose.
+        index.exclude(rpm_id__in=compose_rpms.values('rpm_id')).delete()
+        _index_compose_rpms(compose_rpms)
+
+
+def _remove_stale_from_rpm_index(compose_ids):
+    """Remove RPMs no longer in given composes from the index, one query per compose."""
+    for compose_id in set(compose_ids):
+        compose_rpms = ComposeRPM.objects.filter(variant_arch__variant__compose_id=compose_id)
+        (ComposeRPMIndex.objects.filter(compose_id=compose_id)
+         .exclude(rpm_id__in=compose_rpms.values('rpm_id'))
+         .delete())
+
+
+def _get_compose_id(variant_arch_id):
+    return VariantArch.objects.filter(pk=variant_arch_id).values_list('variant__compose_id', flat=True).first()
+
+
+@receiver(signals.pre_save, sender=ComposeRPM)
+@receiver(signals.pre_save, sender=Variant)
+@receiver(signals.pre_save, sender=VariantArch)
+def _load_fixture_tracked_values(sender, instance, raw, **kwargs):
+    # Fixtures may overwrite existing rows.
+    if raw:
+        instance.load_tracked_values()
+
+
+@receiver(signals.post_save, sender=ComposeRPM)
+def _add_to_rpm_index(sender, instance, **kwargs):
+    _index_compose_rpms(ComposeRPM.objects.filter(pk=instance.pk))
+    # An existing ComposeRPM can be moved to another RPM or variant arch.
+    changed = instance.get_changed_values()
+    if 'variant_arch_id' in changed or 'rpm_id' in changed:
+        compose_id = _get_compose_id(changed.get('variant_arch_id', instance.variant_arch_id))
+        if compose_id is not None:
+            _refresh_rpm_index([compose_id], [changed.get('rpm_id', instance.rpm_id)])
+
+
+# Fixtures may contain ComposeRPMs before the rows they link to, those could
+# not be indexed when they were loaded.
+@receiver(signals.post_save, sender="package.RPM")
+def _update_rpm_in_rpm_index(sender, instance, raw, created, **kwargs):
+    if raw:
+        _index_compose_rpms(ComposeRPM.objects.filter(rpm=instance))
+    if raw or not created:
+        ComposeRPMIndex.objects.filter(rpm=instance).exclude(rpm_name=instance.name) \
+            .update(rpm_name=instance.name)
+
+
+@receiver(signals.post_save, sender=Variant)
+def _add_variant_fixture_to_rpm_index(sender, instance, raw, **kwargs):
+    changed = instance.get_changed_values()
+    if 'compose_id' in changed:
+        _refresh_rpm_index([changed['compose_id'], instance.compose_id])
+    elif raw:
+        _index_compose_rpms(ComposeRPM.objects.filter(variant_arch__variant=instance))
+
+
+@receiver(signals.post_save, sender=VariantArch)
+def _add_variant_arch_fixture_to_rpm_index(sender, instance, raw, **kwargs):
+    changed = instance.get_changed_values()
+    if 'variant_id' in changed:
+        compose_ids = Variant.objects.filter(pk__in=[changed['variant_id'], instance.variant_id]) \
+            .values_list('compose_id', flat=True)
+        _refresh_rpm_index(list(compose_ids))
+    elif raw:
+        _index_compose_rpms(ComposeRPM.objects.filter(variant_arch=instance))
+
+
+@receiver(signals.pre_delete, sender=VariantArch)
+def _remove_variant_arch_from_rpm_index(sender, instance, **kwargs):
+    # ComposeRPMs have no delete receivers, so that cascades can delete them
+    # without loading each one. Other deletes go through
+    # ComposeRPM.delete_many. The RPM stays in the index if it is in other
+    # variant or arch of the compose. The index and summary of a deleted
+    # compose are removed by cascade.
+    compose_id = Variant.objects.filter(pk=instance.variant_id).values_list('compose_id', flat=True).first()
+    compose_rpms = ComposeRPM.objects.filter(variant_arch=instance).order_by()
+    others = ComposeRPM.objects.filter(variant_arch__variant__compose_id=compose_id).exclude(variant_arch=instance)
+    (ComposeRPMIndex.objects
+     .filter(compose_id=compose_id, rpm_id__in=compose_rpms.values('rpm_id'))
+     .exclude(rpm_id__in=others.values('rpm_id'))
+     .delete())
+    ComposeSigKey.remove_unused(compose_id, compose_rpms.values_list('sigkey_id', flat=True).distinct(),
+                                excluded_variant_arch_id=instance.pk)
+
+
+# Must be connected after all other receivers using the loaded values.
+@receiver(signals.post_save, sender=ComposeRPM)
+@receiver(signals.post_save, sender=Variant)
+@receiver(signals.post_save, sender=VariantArch)
+def _reset_tracked_values(sender, instance, **kwargs):
+    instance.reset_tracked_values()
+
 
 class ComposeRPMMapping(object):
     def __init__(self, data=None):
@@ -307,23 +634,7 @@ class ComposeRPMMapping(object):
                  .append(rpm_arch)
 
     def load_from_compose(self, compose, package, release):
-        self.compose = compose
-        self.package = package
-
-        release_variants = {}
-        for variant in release.variant_set.all():
-            release_variants[variant.variant_uid] = set(variant.arches)
-
-        for crpm in ComposeRPM.objects.filter(rpm__srpm_name=package,
-                                              variant_arch__variant__compose=compose).select_related():
-            variant = crpm.variant_arch.variant.variant_uid
-            arch    = crpm.variant_arch.arch.name
-            if arch not in release_variants.get(variant, set()):
-                continue
-            self.add_rpm(variant,
-                         arch,
-                         crpm.rpm.name,
-                         {'rpm_arch': crpm.rpm.arch, 'included': True, 'override': 'orig'})
+        RPMMappingEngine(compose, release).load_mapping(self, package)
 
     def get_rpm_dict(self, variant, arch):
         return self.data.setdefault(variant, {}).setdefault(arch, {})
@@ -371,10 +682,13 @@ class ComposeRPMMapping(object):
                 else:
                     self._process_unused(override, useless_overrides, tbd)
 
-        if do_delete:
+        if do_delete and tbd:
             for override in tbd:
                 print ' *** NOTICE: deleted override %s' % override
-                override.delete()
+            OverrideRPM.objects.filter(pk__in=[override.pk for override in tbd]).delete()
+            for override in tbd:
+                # Same as after Model.delete().
+                override.pk = None
 
         return useless_overrides
 
@@ -451,6 +765,179 @@ class ComposeRPMMapping(object):
         return changes
 
 
+class ComposeRPMTable(object):
+    """
+    All RPMs of a compose as parallel columns of (variant, arch, rpm_name,
+    rpm_arch) sorted by name of source package. The rows for a package are
+    found by bisecting the list of package names.
+    """
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: row[2])
+        self.packages = []
+        self.offsets = []
+        strings = {}
+        columns = ([], [], [], [])
+        for index, (variant, arch, srpm_name, rpm_name, rpm_arch) in enumerate(rows):
+            if not self.packages or self.packages[-1] != srpm_name:
+                self.packages.append(srpm_name)
+                self.offsets.append(index)
+            # Share equal strings, most of them repeat many times.
+            for column, value in zip(columns, (variant, arch, rpm_name, rpm_arch)):
+                column.append(strings.setdefault(value, value))
+        self.offsets.append(len(rows))
+        self.variants, self.arches, self.rpm_names, self.rpm_arches = (tuple(c) for c in columns)
+
+    @classmethod
+    def load(cls, compose):
+        return cls(ComposeRPM.objects.filter(variant_arch__variant__compose=compose)
+                   .order_by()
+                   .values_list('variant_arch__variant__variant_uid', 'variant_arch__arch__name',
+                                'rpm__srpm_name', 'rpm__name', 'rpm__arch')
+                   .iterator())
+
+    def rows(self, package):
+        """Yield (variant, arch, rpm_name, rpm_arch) for RPMs built from `package`."""
+        index = bisect.bisect_left(self.packages, package)
+        if index == len(self.packages) or self.packages[index] != package:
+            return
+        for i in xrange(self.offsets[index], self.offsets[index + 1]):
+            yield self.variants[i], self.arches[i], self.rpm_names[i], self.rpm_arches[i]
+
+
+class ComposeRPMTableCache(object):
+    """
+    Process-wide cache of `ComposeRPMTable` for recently used composes. Each
+    use checks the version of the table, which changes when RPMs are added
+    to or removed from the compose (given by number and highest id of its
+    ComposeRPMs) or when any RPM is changed via the API (given by the latest
+    changeset of RPMs). Changes made in this process clear the cache
+    directly.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._tables = OrderedDict()
+
+    @staticmethod
+    def get_version(compose):
+        rpms = (ComposeRPM.objects.filter(variant_arch__variant__compose=compose)
+                .aggregate(count=Count('id'), last=Max('id')))
+        rpm_changeset = (LatestChange.objects.filter(target_class='rpm')
+                         .values_list('changeset_id', flat=True).first())
+        return rpms['count'], rpms['last'], rpm_changeset
+
+    def get(self, compose):
+        version = self.get_version(compose)
+        with self._lock:
+            entry = self._tables.pop(compose.pk, None)
+            if entry and entry[0] == version:
+                self._tables[compose.pk] = entry
+                return entry[1]
+        table = ComposeRPMTable.load(compose)
+        with self._lock:
+            self._tables[compose.pk] = (version, table)
+            while len(self._tables) > self.max_size:
+                self._tables.popitem(last=False)
+        return table
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+
+COMPOSE_RPM_TABLE_CACHE = ComposeRPMTableCache(getattr(settings, 'RPM_MAPPING_CACHE_SIZE', 10))
+
+
+# ComposeRPMs have no delete receivers so that they can be deleted without
+# loading them, removed RPMs are detected by the version check. That also
+# covers changes made by other processes.
+@receiver(signals.post_save, sender=ComposeRPM)
+@receiver(signals.post_delete, sender=Compose)
+def _clear_compose_rpm_table_cache(sender, **kwargs):
+    COMPOSE_RPM_TABLE_CACHE.clear()
+
+
+class RPMMappingEngine(object):
+    """
+    Compute RPM mappings of many packages from one compose. The RPMs of the
+    compose are loaded once (and cached for following requests). Overrides
+    of the release are loaded by a single query on first use when
+    `preload_overrides` is set, otherwise they are queried for each package.
+
+    If `release` is not specified, the release for which the compose was
+    built is used. Only variants and arches of that release are included.
+    """
+    def __init__(self, compose, release=None, preload_overrides=False):
+        self.compose = compose
+        self.release = release or compose.release
+        self.preload_overrides = preload_overrides
+        self._table = None
+        self._release_variants = None
+        self._overrides = None
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = COMPOSE_RPM_TABLE_CACHE.get(self.compose)
+        return self._table
+
+    @property
+    def release_variants(self):
+        if self._release_variants is None:
+            self._release_variants = dict((variant.variant_uid, set(variant.arches))
+                                          for variant in self.release.variant_set.all())
+        return self._release_variants
+
+    def _load_overrides(self):
+        if self._overrides is None:
+            self._overrides = {}
+            for override in OverrideRPM.objects.filter(release=self.release).order_by('id'):
+                self._overrides.setdefault(override.srpm_name, []).append(override)
+        return self._overrides
+
+    def _get_overrides(self, package):
+        if not self.preload_overrides:
+            return OverrideRPM.objects.filter(release=self.release, srpm_name=package)
+        return self._load_overrides().get(package, [])
+
+    @property
+    def packages(self):
+        """Sorted names of packages in the compose or with an override."""
+        packages = set(self.table.packages)
+        if self.preload_overrides:
+            packages.update(self._load_overrides())
+        else:
+            packages.update(OverrideRPM.objects.filter(release=self.release)
+                            .values_list('srpm_name', flat=True).distinct())
+        return sorted(packages)
+
+    def load_mapping(self, mapping, package):
+        mapping.compose = self.compose
+        mapping.package = package
+        release_variants = self.release_variants
+        for variant, arch, rpm_name, rpm_arch in self.table.rows(package):
+            if arch not in release_variants.get(variant, ()):
+                continue
+            mapping.add_rpm(variant, arch, rpm_name,
+                            {'rpm_arch': rpm_arch, 'included': True, 'override': 'orig'})
+
+    def get_rpm_mapping(self, package, disable_overrides=False):
+        """
+        Return a tuple of `ComposeRPMMapping` and a list of useless overrides,
+        see `Compose.get_rpm_mapping` for details.
+        """
+        mapping = ComposeRPMMapping()
+        self.load_mapping(mapping, package)
+        useless_overrides = []
+        if not disable_overrides:
+            overrides = self._get_overrides(package)
+            useless_overrides = mapping.apply_overrides(overrides)
+            if self.preload_overrides:
+                # Deleted overrides no longer apply.
+                self._overrides[package] = [o for o in overrides if o.pk is not None]
+        return mapping, useless_overrides
+
+
 class OverrideRPM(models.Model):
     """To add/disable RPMs for a release"""
     release             = models.ForeignKey("release.Release")
@@ -495,34 +982,123 @@ class OverrideRPM(models.Model):
         Given a dict describing a change in overrides, perform the changes.
         Returns a triple (pk, old_value, new_value) of changed override.
         """
-        orpm, created = klass.objects.get_or_create(release=release,
-                                                    variant=data['variant'],
-                                                    arch=data['arch'],
-                                                    rpm_name=data['rpm_name'],
-                                                    rpm_arch=data['rpm_arch'],
-                                                    srpm_name=data['srpm_name'])
-        pk = orpm.pk
-        old_val = 'null' if created else orpm.export()
-        if action == 'create':
-            orpm.do_not_delete = data.get('do_not_delete', False)
-            orpm.comment = data.get('comment', '')
-            orpm.include = data['include']
-            orpm.save()
-            new_val = orpm.export()
-        elif action == 'delete':
-            new_dnd = data.get('do_not_delete', False)
-            if not new_dnd:
-                orpm.delete()
-                new_val = 'null'
-            else:
-                orpm.do_not_delete = True
+        return klass.update_objects(release, [dict(data, action=action)])[0]
+
+    @classmethod
+    def update_objects(klass, release, changes):
+        """
+        Perform a list of changes (dicts with `action` key and the same data as
+        for `update_object`) in order. The changes are computed in memory and
+        stored with a few bulk queries. Returns a list of (pk, old_value,
+        new_value) triples, the same as calling `update_object` for each
+        change would.
+        """
+        batch = _OverrideRPMBatch(release, set(data['srpm_name'] for data in changes))
+        for data in changes:
+            orpm, created = batch.get_or_create(data)
+            old_val = 'null' if created else orpm.export()
+            if data['action'] == 'create':
+                orpm.do_not_delete = data.get('do_not_delete', False)
                 orpm.comment = data.get('comment', '')
-                orpm.include = not orpm.include
-                orpm.save()
+                orpm.include = data['include']
+                batch.save(orpm)
                 new_val = orpm.export()
-        else:
-            raise ValueError("action should only be 'create' or 'delete'")
-        return pk, old_val, new_val
+            elif data['action'] == 'delete':
+                new_dnd = data.get('do_not_delete', False)
+                if not new_dnd:
+                    batch.delete(orpm)
+                    new_val = 'null'
+                else:
+                    orpm.do_not_delete = True
+                    orpm.comment = data.get('comment', '')
+                    orpm.include = not orpm.include
+                    batch.save(orpm)
+                    new_val = orpm.export()
+            else:
+                raise ValueError("action should only be 'create' or 'delete'")
+            batch.log(orpm, old_val, new_val)
+        return batch.flush()
+
+
+class _OverrideRPMBatch(object):
+    """
+    Overrides of a release modified by `OverrideRPM.update_objects`. All
+    overrides of given source packages are loaded by one query and changes
+    are written by `flush`. Ids of new overrides are known only after flush,
+    so it is also done when a deleted override is created again.
+    """
+    BATCH_SIZE = 1000
+
+    def __init__(self, release, srpm_names):
+        self.release = release
+        self.srpm_names = srpm_names
+        self.rows = {}
+        for orpm in OverrideRPM.objects.filter(release=release, srpm_name__in=srpm_names):
+            orpm.release = release
+            self.rows[self._key(orpm)] = orpm
+        self.results = []
+        self._reset()
+
+    def _reset(self):
+        self.created = []
+        self.deleted = []
+        self.deleted_keys = set()
+        self.changed = {}
+        self.changes = []
+
+    @staticmethod
+    def _key(data):
+        if isinstance(data, dict):
+            return (data['srpm_name'], data['variant'], data['arch'], data['rpm_name'], data['rpm_arch'])
+        return (data.srpm_name, data.variant, data.arch, data.rpm_name, data.rpm_arch)
+
+    def get_or_create(self, data):
+        key = self._key(data)
+        if key in self.rows:
+            return self.rows[key], False
+        if key in self.deleted_keys:
+            self.flush()
+        orpm = OverrideRPM(release=self.release, srpm_name=data['srpm_name'], variant=data['variant'],
+                           arch=data['arch'], rpm_name=data['rpm_name'], rpm_arch=data['rpm_arch'])
+        self.rows[key] = orpm
+        self.created.append(orpm)
+        return orpm, True
+
+    def save(self, orpm):
+        if orpm.pk is not None:
+            self.changed[orpm.pk] = orpm
+
+    def delete(self, orpm):
+        key = self._key(orpm)
+        del self.rows[key]
+        self.deleted_keys.add(key)
+        self.changed.pop(orpm.pk, None)
+        self.deleted.append(orpm)
+
+    def log(self, orpm, old_val, new_val):
+        self.changes.append((orpm, old_val, new_val))
+
+    def flush(self):
+        """Write pending changes to database and return all results so far."""
+        if self.created:
+            OverrideRPM.objects.bulk_create(self.created, batch_size=self.BATCH_SIZE)
+            created = dict((self._key(orpm), orpm) for orpm in self.created)
+            for orpm in OverrideRPM.objects.filter(release=self.release,
+                                                   srpm_name__in=set(o.srpm_name for o in self.created)):
+                if self._key(orpm) in created:
+                    created[self._key(orpm)].pk = orpm.pk
+        if self.deleted:
+            OverrideRPM.objects.filter(pk__in=[orpm.pk for orpm in self.deleted]).delete()
+        # Overrides with the same values are updated by one query.
+        by_values = {}
+        for orpm in self.changed.itervalues():
+            by_values.setdefault((orpm.include, orpm.do_not_delete, orpm.comment), []).append(orpm.pk)
+        for (include, do_not_delete, comment), pks in by_values.iteritems():
+            OverrideRPM.objects.filter(pk__in=pks).update(include=include, do_not_delete=do_not_delete,
+                                                          comment=comment)
+        self.results.extend((orpm.pk, old_val, new_val) for orpm, old_val, new_val in self.changes)
+        self._reset()
+        return self.results
 
 
 class ComposeImage(models.Model):
@@ -569,10 +1145,24 @@ class Location(models.Model):
     name = models.CharField(max_length=50)
     short = models.CharField(max_length=50, unique=True)
 
+    CACHE = common_models.LookupCache('short')
+
+    @classmethod
+    def get_cached_id(cls, value):
+        """cached `short` to `id`"""
+        return common_models.get_cached_id(cls, value)
+
 
 class Scheme(models.Model):
     name = models.CharField(max_length=50, unique=True)
 
+    CACHE = common_models.LookupCache('name')
+
+    @classmethod
+    def get_cached_id(cls, value):
+        """cached `name` to `id`"""
+        return common_models.get_cached_id(cls, value)
+
 
 class ComposeTree(models.Model):
     compose             = models.ForeignKey("Compose")
@@ -609,6 +1199,13 @@ class PathType(models.Model):
     def __unicode__(self):
         return self.name
 
+    CACHE = common_models.LookupCache('name')
+
+    @classmethod
+    def get_cached_id(cls, value):
+        """cached `name` to `id`"""
+        return common_models.get_cached_id(cls, value)
+
     def export(self):
         return {
             "name": self.name,
@@ -633,3 +1230,99 @@ class ComposeRelPath(models.Model):
             "type": self.type.name,
             "path": self.path
         }
+
+
+class ComposeImportJob(models.Model):
+    """
+    Compose import requested in asynchronous mode. The request data is stored
+    when the job is created and the import itself is run later by the
+    `compose_import_worker` management command.
+    """
+    WAITING = 'waiting'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATE_CHOICES = (
+        (WAITING, 'waiting'),
+        (RUNNING, 'running'),
+        (DONE, 'done'),
+        (FAILED, 'failed'),
+    )
+
+    RPMS = 'rpms'
+    IMAGES = 'images'
+    FULL = 'full'
+    KIND_CHOICES = (
+        (RPMS, 'rpms'),
+        (IMAGES, 'images'),
+        (FULL, 'full'),
+    )
+
+    kind                = models.CharField(max_length=20, choices=KIND_CHOICES)
+    state               = models.CharField(max_length=20, choices=STATE_CHOICES, default=WAITING, db_index=True)
+    author              = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True)
+    comment             = models.TextField(null=True, blank=True)
+    # JSON encoded request body as received by the import end-point.
+    data                = models.TextField()
+    created_on          = models.DateTimeField(auto_now_add=True)
+    started_on          = models.DateTimeField(null=True, blank=True)
+    # Updated periodically by the worker running the job.
+    heartbeat_on        = models.DateTimeField(null=True, blank=True, db_index=True)
+    finished_on         = models.DateTimeField(null=True, blank=True)
+    compose_id          = models.CharField(max_length=200, null=True, blank=True)
+    variants_total      = models.PositiveIntegerField(default=0)
+    variants_done       = models.PositiveIntegerField(default=0)
+    rpms_linked         = models.PositiveIntegerField(default=0)
+    images_linked       = models.PositiveIntegerField(default=0)
+    set_locations       = models.PositiveIntegerField(default=0)
+    error               = models.TextField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('id', )
+
+    def __unicode__(self):
+        return u"compose-import-job-%s" % self.id
+
+    def claim(self):
+        """
+        Atomically switch a waiting job to running state. Returns False if
+        some other worker was faster.
+        """
+        started_on = timezone.now()
+        claimed = (ComposeImportJob.objects.filter(pk=self.pk, state=self.WAITING)
+                   .update(state=self.RUNNING, started_on=started_on, heartbeat_on=started_on))
+        if claimed:
+            self.state = self.RUNNING
+            self.started_on = started_on
+            self.heartbeat_on = started_on
+        return bool(claimed)
+
+    def beat(self):
+        """Record that the worker running this job is still alive."""
+        ComposeImportJob.objects.filter(pk=self.pk, state=self.RUNNING).update(heartbeat_on=timezone.now())
+
+    def finish(self):
+        """
+        Store state, error and counters of a finished job. Nothing is stored
+        and False is returned if the job is no longer running, e.g. because it
+        was reclaimed in the meantime.
+        """
+        self.finished_on = timezone.now()
+        return bool(ComposeImportJob.objects.filter(pk=self.pk, state=self.RUNNING)
+                    .update(state=self.state, error=self.error, compose_id=self.compose_id,
+                            finished_on=self.finished_on, variants_total=self.variants_total,
+                            variants_done=self.variants_done, rpms_linked=self.rpms_linked,
+                            images_linked=self.images_linked, set_locations=self.set_locations))
+
+    @staticmethod
+    def reclaim_stale(timeout):
+        """
+        Put running jobs without a heartbeat in last `timeout` seconds back
+        to the queue. Their worker died and the transaction of the import was
+        rolled back, so they can be run again. Returns number of such jobs.
+        """
+        limit = timezone.now() - datetime.timedelta(seconds=timeout)
+        return (ComposeImportJob.objects.filter(state=ComposeImportJob.RUNNING, heartbeat_on__lt=limit)
+                .update(state=ComposeImportJob.WAITING, started_on=None, heartbeat_on=None,
+                        variants_total=0, variants_done=0, rpms_linked=0, images_linked=0,
+                        set_locations=0))
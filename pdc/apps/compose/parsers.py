@@ -0,0 +1,239 @@
+#
+# Copyright (c) 2015 Red Hat
+# Licensed under The MIT License (MIT)
+# http://opensource.org/licenses/MIT
+#
+import json
+import tempfile
+from decimal import Decimal
+from itertools import chain, groupby
+from operator import itemgetter
+
+import ijson
+from productmd.rpms import Rpms
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from pdc.apps.common import hacks as common_hacks
+
+
+def _build_value(events, event, value):
+    """
+    Build a Python object from parser events. The `event` and `value`
+    arguments are the first event of the object, the rest is taken from
+    `events`.
+    """
+    if event == 'start_map':
+        result = {}
+        for event, value in events:
+            if event == 'end_map':
+                return result
+            key = value
+            event, value = next(events)
+            result[key] = _build_value(events, event, value)
+    elif event == 'start_array':
+        result = []
+        for event, value in events:
+            if event == 'end_array':
+                return result
+            result.append(_build_value(events, event, value))
+    elif isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _iter_map(events):
+    """
+    Iterate over keys of a JSON object whose `start_map` event was already
+    consumed. Caller must consume the value after each key.
+    """
+    for event, value in events:
+        if event == 'end_map':
+            return
+        yield value
+
+
+def _expect_map(events, key):
+    """
+    Consume start of a JSON object from events or raise the same error as
+    `deserialize_wrapper` would.
+    """
+    event, _ = next(events)
+    if event != 'start_map':
+        raise serializers.ValidationError(
+            {'detail': 'Error parsing productmd metadata.',
+             'reason': 'Expected an object as value of %s' % key}
+        )
+
+
+class RpmManifestStream(object):
+    """
+    RPM manifest received by `StreamingManifestParser`. Only the header and
+    compose metadata are kept in memory. The RPMs are stored in a temporary
+    file and can be iterated as (variant, arch, srpm_nevra, rpm_nevra,
+    rpm_data) tuples, the same as from a deserialized `Rpms` object.
+    """
+    def __init__(self):
+        self.data = {}
+        self.spool = tempfile.TemporaryFile()
+        self.count = 0
+
+    def add(self, variant, arch, srpm_nevra, rpm_nevra, rpm_data):
+        self.spool.write(json.dumps([variant, arch, srpm_nevra, rpm_nevra, rpm_data]))
+        self.spool.write('\n')
+        self.count += 1
+
+    def get_metadata(self):
+        """
+        Deserialize the manifest without RPMs and return the `Rpms` object.
+        Errors are reported the same way as for a full manifest. Manifests
+        in the old format (before 1.0) can not be streamed and contain all
+        RPMs at this point.
+        """
+        data = dict(self.data)
+        data['payload'] = dict(data.get('payload', {}))
+        if 'manifest' not in data['payload']:
+            data['payload']['rpms'] = {}
+        rm = Rpms()
+        common_hacks.deserialize_wrapper(rm.deserialize, data)
+        return rm
+
+    def __iter__(self):
+        self.spool.seek(0)
+        for line in self.spool:
+            yield tuple(json.loads(line))
+
+    def dump(self, fp):
+        """
+        Write the whole manifest to file `fp` as JSON. The RPMs are copied
+        from the temporary file, so they are not loaded to memory all at once.
+        """
+        payload = self.data.get('payload', {})
+        if 'manifest' in payload:
+            json.dump(self.as_dict(), fp)
+            return
+        fp.write('{')
+        for key, value in self.data.iteritems():
+            if key != 'payload':
+                fp.write('%s: %s, ' % (json.dumps(key), json.dumps(value)))
+        fp.write('"payload": {')
+        for key, value in payload.iteritems():
+            if key != 'rpms':
+                fp.write('%s: %s, ' % (json.dumps(key), json.dumps(value)))
+        fp.write('"rpms": ')
+        _dump_nested(fp, iter(self))
+        fp.write('}}')
+
+    def as_dict(self):
+        """Return the whole manifest as a dict. This loads all RPMs to memory."""
+        data = dict(self.data)
+        data['payload'] = dict(data.get('payload', {}))
+        if 'manifest' not in data['payload']:
+            rpms = data['payload']['rpms'] = {}
+            for variant, arch, srpm_nevra, rpm_nevra, rpm_data in self:
+                rpms.setdefault(variant, {}).setdefault(arch, {}).setdefault(srpm_nevra, {})[rpm_nevra] = rpm_data
+        return data
+
+
+def _dump_nested(fp, rows):
+    """
+    Write rows of keys ending with a value as nested JSON objects. Rows with
+    the same key must be next to each other.
+    """
+    fp.write('{')
+    for index, (key, group) in enumerate(groupby(rows, itemgetter(0))):
+        if index:
+            fp.write(', ')
+        fp.write(json.dumps(key) + ': ')
+        group = (row[1:] for row in group)
+        first = next(group)
+        if len(first) == 1:
+            json.dump(first[0], fp)
+        else:
+            _dump_nested(fp, chain([first], group))
+    fp.write('}')
+
+
+def dump_request_data(data, fp):
+    """
+    Write request data parsed by `StreamingManifestParser` to file `fp` as
+    JSON. Streamed RPM manifests are written without loading all RPMs.
+    """
+    fp.write('{')
+    for index, (key, value) in enumerate(data.items()):
+        if index:
+            fp.write(', ')
+        fp.write(json.dumps(key) + ': ')
+        if isinstance(value, RpmManifestStream):
+            value.dump(fp)
+        else:
+            json.dump(value, fp)
+    fp.write('}')
+
+
+def iter_rpm_manifest(rm):
+    """
+    Iterate over RPMs in a deserialized `Rpms` object as (variant, arch,
+    srpm_nevra, rpm_nevra, rpm_data) tuples.
+    """
+    for variant, arches in rm.rpms.iteritems():
+        for arch, srpms in arches.iteritems():
+            for srpm_nevra, rpms in srpms.iteritems():
+                for rpm_nevra, rpm_data in rpms.iteritems():
+                    yield variant, arch, srpm_nevra, rpm_nevra, rpm_data
+
+
+class StreamingManifestParser(BaseParser):
+    """
+    JSON parser for compose import end-points. The request body is read
+    incrementally and the `rpm_manifest` field is returned as
+    `RpmManifestStream`, so the RPMs never have to be in memory all at once.
+    All other fields are parsed as usual.
+    """
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        events = ijson.basic_parse(stream)
+        try:
+            event, value = next(events)
+            if event != 'start_map':
+                return _build_value(events, event, value)
+            result = {}
+            for key in _iter_map(events):
+                event, value = next(events)
+                if key == 'rpm_manifest' and event == 'start_map':
+                    result[key] = self._parse_rpm_manifest(events)
+                else:
+                    result[key] = _build_value(events, event, value)
+            return result
+        except (ijson.JSONError, StopIteration, ValueError) as exc:
+            raise ParseError('JSON parse error - %s' % exc)
+
+    def _parse_rpm_manifest(self, events):
+        manifest = RpmManifestStream()
+        for key in _iter_map(events):
+            event, value = next(events)
+            if key == 'payload' and event == 'start_map':
+                manifest.data['payload'] = self._parse_rpm_payload(events, manifest)
+            else:
+                manifest.data[key] = _build_value(events, event, value)
+        return manifest
+
+    def _parse_rpm_payload(self, events, manifest):
+        payload = {}
+        for key in _iter_map(events):
+            event, value = next(events)
+            if key != 'rpms' or event != 'start_map':
+                payload[key] = _build_value(events, event, value)
+                continue
+            for variant in _iter_map(events):
+                _expect_map(events, variant)
+                for arch in _iter_map(events):
+                    _expect_map(events, arch)
+                    for srpm_nevra in _iter_map(events):
+                        _expect_map(events, srpm_nevra)
+                        for rpm_nevra in _iter_map(events):
+                            event, value = next(events)
+                            manifest.add(variant, arch, srpm_nevra, rpm_nevra, _build_value(events, event, value))
+        return payload
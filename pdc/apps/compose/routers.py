@@ -32,6 +32,7 @@ router.register('rpc/find-older-compose-by-compose-rpm/(?P<compose_id>[^/]+)/(?P
 router.register('rpc/find-composes-by-product-version-rpm/(?P<product_version>[^/]+)/(?P<rpm_name>[^/]+)',
                 views.FindComposeByProductVersionRPMViewSet,
                 base_name='findcomposesbypvr')
+router.register(r'compose-import-jobs', views.ComposeImportJobViewSet)
 router.register('rpc/compose-full-import',
                 views.ComposeFullImportViewSet,
                 base_name='composefullimport')
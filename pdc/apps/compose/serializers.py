@@ -3,6 +3,8 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
+import json
+
 from rest_framework import serializers, fields
 from rest_framework.reverse import reverse
 
@@ -11,7 +13,7 @@ from pdc.apps.common.serializers import StrictSerializerMixin, DynamicFieldsSeri
 from pdc.apps.common.fields import ChoiceSlugField
 from .models import (Compose, OverrideRPM, ComposeAcceptanceTestingState,
                      ComposeTree, Variant, Location, Scheme, ComposeImage,
-                     VariantArch)
+                     VariantArch, ComposeImportJob, ComposeSigKey)
 from pdc.apps.release.models import Release
 from pdc.apps.utils.utils import urldecode
 from pdc.apps.repository.models import ContentCategory
@@ -29,6 +31,14 @@ class StrictManyRelatedField(serializers.ManyRelatedField):
         return result
 
 
+class LinkedReleasesManyField(StrictManyRelatedField):
+    def get_attribute(self, instance):
+        linked_releases_cache = self.context.get('compose_id_to_linked_releases_cache')
+        if linked_releases_cache is not None:
+            return linked_releases_cache.get(instance.pk, [])
+        return super(LinkedReleasesManyField, self).get_attribute(instance)
+
+
 class LinkedReleasesField(serializers.SlugRelatedField):
     """
     Wrapper aroung SlugRelatedField that makes sure the input data has correct
@@ -37,7 +47,7 @@ class LinkedReleasesField(serializers.SlugRelatedField):
     @classmethod
     def many_init(cls, *args, **kwargs):
         child_relation = cls(**kwargs)
-        return StrictManyRelatedField(*args, child_relation=child_relation)
+        return LinkedReleasesManyField(*args, child_relation=child_relation)
 
     def to_internal_value(self, value):
         if not isinstance(value, basestring):
@@ -77,16 +87,16 @@ class ComposeSerializer(StrictSerializerMixin,
 
     def get_rtt_tested_architectures(self, obj):
         """{"variant": {"arch": "testing status"}}"""
+        compose_id_to_rtt_cache = self.context.get('compose_id_to_rtt_cache')
+        if compose_id_to_rtt_cache is not None:
+            return compose_id_to_rtt_cache.get(obj.id, {})
         return obj.get_arch_testing_status()
 
     def get_sigkeys(self, obj):
         """["string"]"""
         compose_id_to_key_id_cache = self.context.get("compose_id_to_key_id_cache")
-        if compose_id_to_key_id_cache:
-            result = sorted(list(compose_id_to_key_id_cache.get(obj.id, [])))
-            if obj.exist_unsigned:
-                result.append(None)
-            return result
+        if compose_id_to_key_id_cache is not None:
+            return ComposeSigKey.sorted_key_ids(compose_id_to_key_id_cache.get(obj.id, []))
 
         return obj.sigkeys
 
@@ -182,3 +192,21 @@ class ComposeImageRTTTestSerializer(StrictSerializerMixin,
     class Meta:
         model = ComposeImage
         fields = ('compose', 'variant', 'arch', 'file_name', 'test_result')
+
+
+class ComposeImportJobSerializer(StrictSerializerMixin,
+                                 DynamicFieldsSerializerMixin,
+                                 serializers.ModelSerializer):
+    author                  = serializers.SlugRelatedField(slug_field='username', read_only=True)
+    error                   = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ComposeImportJob
+        fields = ('id', 'kind', 'state', 'author', 'comment', 'created_on', 'started_on', 'finished_on',
+                  'compose_id', 'variants_total', 'variants_done', 'rpms_linked', 'images_linked',
+                  'set_locations', 'error')
+        read_only_fields = fields
+
+    def get_error(self, obj):
+        """error response of failed import (same as in synchronous mode) or null"""
+        return json.loads(obj.error) if obj.error else None
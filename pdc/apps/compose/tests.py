@@ -4,24 +4,30 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
+import datetime
 import json
 import mock
+import unittest
 from StringIO import StringIO
 
+from django.core.management import call_command, CommandError
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase
 from django.test.client import Client
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 
 from pdc.apps.bindings import models as binding_models
-from pdc.apps.common.test_utils import create_user, TestCaseWithChangeSetMixin
+from pdc.apps.common.test_utils import create_user, count_get_queries, TestCaseWithChangeSetMixin
 from pdc.apps.common.constants import PDC_WARNING_HEADER_NAME
 from pdc.apps.release.models import Release, ProductVersion
 from pdc.apps.component.models import (ReleaseComponent,
                                        BugzillaComponent)
 import pdc.apps.release.models as release_models
 import pdc.apps.common.models as common_models
+from pdc.apps.package.models import RPM
 from . import models
 
 
@@ -47,10 +53,36 @@ class ComposeModelTestCase(TestCase):
     def test_get_rpms_nonexisting(self):
         self.assertEqual(list(self.compose.get_rpms('foo')), [])
 
+    def test_rpm_index_follows_compose_rpms(self):
+        self.assertEqual(list(self.compose.get_rpms('bash').values_list('pk', flat=True)), [1])
+        models.ComposeRPM.delete_many(
+            models.ComposeRPM.objects.filter(variant_arch__variant__compose=self.compose, rpm__name='bash'))
+        self.assertEqual(list(self.compose.get_rpms('bash')), [])
+
+    def test_rpm_index_follows_deleted_variant_arch(self):
+        self.assertEqual(list(self.compose.get_rpms('bash-doc').values_list('pk', flat=True)), [2])
+        models.VariantArch.objects.get(pk=1).delete()
+        # The RPM is still in the other variant.
+        self.assertEqual(list(self.compose.get_rpms('bash-doc').values_list('pk', flat=True)), [2])
+        self.assertEqual(list(self.compose.get_rpms('bash')), [])
+
     def test_get_arch_testing_status(self):
         self.assertDictEqual(self.compose.get_arch_testing_status(),
                              {'Server': {'x86_64': 'untested'}, 'Server2': {'x86_64': 'untested'}})
 
+    def test_sort_key_follows_release_version(self):
+        newer = models.Compose.objects.create(release=self.compose.release,
+                                              compose_id='compose-2',
+                                              compose_date='2014-09-03',
+                                              compose_type=self.compose.compose_type,
+                                              compose_respin=10)
+        self.assertGreater(newer, self.compose)
+        self.assertEqual(self.compose.release.get_latest_compose(), newer)
+        old_key = self.compose.sort_key
+        self.compose.release.version = '10.0'
+        self.compose.release.save()
+        self.assertGreater(models.Compose.objects.get(pk=1).sort_key, old_key)
+
 
 class FindComposeByReleaseRPMTestCase(APITestCase):
     fixtures = [
@@ -74,6 +106,44 @@ class FindComposeByReleaseRPMTestCase(APITestCase):
                           {'compose': 'compose-2', 'packages': ['bash-0:1.2.3-4.b1.x86_64.rpm']},
                           {'compose': 'compose-3', 'packages': ['bash-0:5.6.7-8.x86_64.rpm']}])
 
+    def test_get_for_release_paginated(self):
+        url = reverse('findcomposebyrr-list', kwargs={'rpm_name': 'bash', 'release_id': 'release-1.0'})
+        response = self.client.get(url, {'page_size': 2, 'page': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['results'],
+                         [{'compose': 'compose-3', 'packages': ['bash-0:5.6.7-8.x86_64.rpm']}])
+
+    def test_get_for_release_after_rpm_is_renamed(self):
+        rpm = RPM.objects.get(pk=2)
+        rpm.name = 'bash-new'
+        rpm.srpm_nevra = 'bash-new-0:5.6.7-8.src'
+        rpm.save()
+        url = reverse('findcomposebyrr-list', kwargs={'rpm_name': 'bash', 'release_id': 'release-1.0'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data,
+                         [{'compose': 'compose-1', 'packages': ['bash-0:1.2.3-4.b1.x86_64.rpm']},
+                          {'compose': 'compose-2', 'packages': ['bash-0:1.2.3-4.b1.x86_64.rpm']},
+                          {'compose': 'compose-3', 'packages': []}])
+        url = reverse('findcomposebyrr-list', kwargs={'rpm_name': 'bash-new', 'release_id': 'release-1.0'})
+        response = self.client.get(url)
+        self.assertEqual(response.data[2],
+                         {'compose': 'compose-3', 'packages': ['bash-new-0:5.6.7-8.x86_64.rpm']})
+
+    def test_get_for_release_after_compose_rpm_is_moved(self):
+        compose_rpm = models.ComposeRPM.objects.get(pk=2)
+        compose_rpm.variant_arch_id = 4
+        compose_rpm.save()
+        url = reverse('findcomposebyrr-list', kwargs={'rpm_name': 'bash', 'release_id': 'release-1.0'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data,
+                         [{'compose': 'compose-1', 'packages': ['bash-0:1.2.3-4.b1.x86_64.rpm']},
+                          {'compose': 'compose-2', 'packages': []},
+                          {'compose': 'compose-3', 'packages': ['bash-0:1.2.3-4.b1.x86_64.rpm',
+                                                                'bash-0:5.6.7-8.x86_64.rpm']}])
+
     def test_get_for_release_with_latest(self):
         url = reverse('findcomposebyrr-list', kwargs={'rpm_name': 'bash', 'release_id': 'release-1.0'})
         response = self.client.get(url, {'latest': 'True'})
@@ -277,6 +347,55 @@ class ComposeAPITestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertItemsEqual(response.data['sigkeys'], ['ABCDEF', None])
 
+    def test_list_compose_with_unsigned_package(self):
+        crpm = models.ComposeRPM.objects.all()[0]
+        crpm.sigkey = None
+        crpm.save()
+        response = self.client.get(reverse('compose-list'), {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['sigkeys'], ['ABCDEF', None])
+
+    def test_sigkey_summary_drops_unused_key(self):
+        for crpm in models.ComposeRPM.objects.filter(variant_arch__variant__compose__compose_id='compose-1'):
+            crpm.sigkey = None
+            crpm.save()
+        response = self.client.get(reverse('compose-detail', args=["compose-1"]))
+        self.assertEqual(response.data['sigkeys'], [None])
+
+    def test_sigkey_summary_follows_deleted_rpms(self):
+        models.ComposeRPM.delete_many(
+            models.ComposeRPM.objects.filter(variant_arch__variant__compose__compose_id='compose-1'))
+        response = self.client.get(reverse('compose-detail', args=["compose-1"]))
+        self.assertEqual(response.data['sigkeys'], [])
+
+    def test_rebuild_sigkey_summary(self):
+        models.ComposeSigKey.objects.all().delete()
+        call_command('rebuild_compose_sigkeys', 'compose-1', stdout=StringIO())
+        response = self.client.get(reverse('compose-detail', args=["compose-1"]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['sigkeys'], ['ABCDEF'])
+
+    def _count_list_queries(self):
+        num_queries, response = count_get_queries(self.client, reverse('compose-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return num_queries, response.data['results']
+
+    def test_list_query_count_does_not_grow(self):
+        num_queries, _ = self._count_list_queries()
+        compose = models.Compose.objects.get(compose_id='compose-1')
+        compose2 = models.Compose.objects.create(release=compose.release, compose_id='compose-2',
+                                                 compose_date='2014-09-04', compose_type=compose.compose_type,
+                                                 compose_respin=1, acceptance_testing=compose.acceptance_testing)
+        variant = models.Variant.objects.create(compose=compose2, variant_id='Client', variant_uid='Client',
+                                                variant_name='Client', variant_type_id=1)
+        models.VariantArch.objects.create(variant=variant, arch=common_models.Arch.objects.get(name='x86_64'))
+        compose2.linked_releases.add(Release.objects.create(release_type_id=1, short='release',
+                                                            name='Test Release', version='2.0'))
+        num_queries2, results = self._count_list_queries()
+        self.assertEqual(num_queries2, num_queries)
+        self.assertEqual(results[1]['linked_releases'], ['release-2.0'])
+        self.assertEqual(results[1]['rtt_tested_architectures'], {'Client': {'x86_64': 'untested'}})
+
     def test_get_nonexisting(self):
         response = self.client.get(reverse('compose-detail', args=["does-not-exist"]))
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -997,8 +1116,7 @@ class ComposeRPMViewAPITestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.client.post(reverse('releaseimportcomposeinfo-list'),
                          self.compose_info, format='json')
         # Caching ids makes it faster, but the cache needs to be cleared for each test.
-        models.Path.CACHE = {}
-        common_models.SigKey.CACHE = {}
+        common_models.clear_lookup_caches()
 
     def test_import_inconsistent_data(self):
         self.manifest10['payload']['compose']['id'] = 'TP-1.0-20150315.0'
@@ -1053,6 +1171,10 @@ class ComposeRPMViewAPITestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertDictEqual(dict(response.data),
                              self.manifest12)
+        sigkeys = models.ComposeSigKey.sorted_key_ids(
+            models.ComposeRPM.objects.values_list('sigkey__key_id', flat=True))
+        response = self.client.get(reverse('compose-detail', args=['TP-1.0-20150310.0']))
+        self.assertEqual(response.data['sigkeys'], sigkeys)
 
         response = self.client.post(reverse('composerpm-list'),
                                     {'rpm_manifest': self.manifest12,
@@ -1072,6 +1194,36 @@ class ComposeRPMViewAPITestCase(TestCaseWithChangeSetMixin, APITestCase):
                                     format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    @mock.patch('pdc.apps.compose.lib.IMPORT_BATCH_SIZE', 2)
+    def test_import_manifest_in_batches(self):
+        response = self.client.post(reverse('composerpm-list'),
+                                    {'rpm_manifest': self.manifest12,
+                                     'release_id': 'tp-1.0',
+                                     'composeinfo': self.compose_info},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data.get('imported rpms'), 6)
+        self.assertEqual(models.ComposeRPM.objects.count(), 6)
+        response = self.client.get(reverse('composerpm-detail', args=['TP-1.0-20150310.0']))
+        self.assertDictEqual(dict(response.data), self.manifest12)
+
+    def test_import_malformed_json(self):
+        response = self.client.post(reverse('composerpm-list'),
+                                    '{"release_id": "tp-1.0", "rpm_manifest": {"payload": ',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('JSON parse error', response.data['detail'])
+
+    def test_import_manifest_with_bad_structure(self):
+        self.manifest12['payload']['rpms']['Server'] = []
+        response = self.client.post(reverse('composerpm-list'),
+                                    {'rpm_manifest': self.manifest12,
+                                     'release_id': 'tp-1.0',
+                                     'composeinfo': self.compose_info},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data.get('detail'), 'Error parsing productmd metadata.')
+
 
 class ComposeImageAPITestCase(TestCaseWithChangeSetMixin, APITestCase):
     def setUp(self):
@@ -1084,7 +1236,7 @@ class ComposeImageAPITestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.client.post(reverse('releaseimportcomposeinfo-list'),
                          self.compose_info, format='json')
         # Caching ids makes it faster, but the cache needs to be cleared for each test.
-        models.Path.CACHE = {}
+        common_models.clear_lookup_caches()
 
     def test_import_images_1_0(self):
         self.assertEqual(models.ComposeRelPath.objects.count(), 0)
@@ -1177,8 +1329,7 @@ class ComposeFullImportViewAPITestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.client.post(reverse('releaseimportcomposeinfo-list'),
                          self.compose_info, format='json')
         # Caching ids makes it faster, but the cache needs to be cleared for each test.
-        models.Path.CACHE = {}
-        common_models.SigKey.CACHE = {}
+        common_models.clear_lookup_caches()
 
     def test_import_and_retrieve_manifest_1_0(self):
         response = self.client.post(reverse('composefullimport-list'),
@@ -1366,6 +1517,124 @@ class ComposeFullImportViewAPITestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['count'], 0)
 
+    def _run_import_jobs(self):
+        from pdc.apps.compose.management.commands.compose_import_worker import run_worker
+        run_worker(poll_interval=0, once=True)
+
+    def test_async_import(self):
+        response = self.client.post(reverse('composefullimport-list') + '?async=true',
+                                    {'rpm_manifest': self.rpm_manifest,
+                                     'image_manifest': self.image_manifest,
+                                     'release_id': 'tp-1.0',
+                                     'composeinfo': self.compose_info,
+                                     'location': 'NAY',
+                                     'scheme': 'http',
+                                     'url': 'abc.com'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['job']
+        self.assertNumChanges([11])
+        self.assertEqual(models.ComposeRPM.objects.count(), 0)
+        data = json.loads(models.ComposeImportJob.objects.get(pk=job_id).data)
+        self.assertEqual(data['rpm_manifest'], self.rpm_manifest)
+        self.assertEqual(data['image_manifest'], self.image_manifest)
+        response = self.client.get(reverse('composeimportjob-detail', args=[job_id]))
+        self.assertEqual(response.data['state'], 'waiting')
+
+        self._run_import_jobs()
+
+        self.assertNumChanges([11, 72])
+        self.assertEqual(models.ComposeRPM.objects.count(), 6)
+        self.assertEqual(models.ComposeImage.objects.count(), 4)
+        response = self.client.get(reverse('composeimportjob-detail', args=[job_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['state'], 'done')
+        self.assertEqual(response.data['compose_id'], 'TP-1.0-20150310.0')
+        self.assertEqual(response.data['rpms_linked'], 6)
+        self.assertEqual(response.data['images_linked'], 4)
+        self.assertEqual(response.data['set_locations'], 5)
+        self.assertEqual(response.data['variants_done'], response.data['variants_total'])
+        self.assertIsNone(response.data['error'])
+
+    def test_async_import_of_dead_worker_is_reclaimed(self):
+        response = self.client.post(reverse('composefullimport-list') + '?async=true',
+                                    {'rpm_manifest': self.rpm_manifest,
+                                     'image_manifest': self.image_manifest,
+                                     'release_id': 'tp-1.0',
+                                     'composeinfo': self.compose_info,
+                                     'location': 'NAY',
+                                     'scheme': 'http',
+                                     'url': 'abc.com'},
+                                    format='json')
+        job_id = response.data['job']
+        job = models.ComposeImportJob.objects.get(pk=job_id)
+        self.assertTrue(job.claim())
+        self.assertEqual(models.ComposeImportJob.reclaim_stale(60), 0)
+        models.ComposeImportJob.objects.filter(pk=job_id).update(
+            heartbeat_on=timezone.now() - datetime.timedelta(hours=1), variants_done=1)
+
+        self._run_import_jobs()
+
+        response = self.client.get(reverse('composeimportjob-detail', args=[job_id]))
+        self.assertEqual(response.data['state'], 'done')
+        self.assertEqual(response.data['variants_done'], response.data['variants_total'])
+        self.assertEqual(models.ComposeRPM.objects.count(), 6)
+
+    def test_reclaimed_async_import_is_not_finished(self):
+        response = self.client.post(reverse('composefullimport-list') + '?async=true',
+                                    {'rpm_manifest': self.rpm_manifest,
+                                     'image_manifest': self.image_manifest,
+                                     'release_id': 'tp-1.0',
+                                     'composeinfo': self.compose_info,
+                                     'location': 'NAY',
+                                     'scheme': 'http',
+                                     'url': 'abc.com'},
+                                    format='json')
+        job = models.ComposeImportJob.objects.get(pk=response.data['job'])
+        self.assertTrue(job.claim())
+        models.ComposeImportJob.objects.filter(pk=job.pk).update(
+            heartbeat_on=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(models.ComposeImportJob.reclaim_stale(60), 1)
+        job.state = models.ComposeImportJob.DONE
+        self.assertFalse(job.finish())
+        self.assertEqual(models.ComposeImportJob.objects.get(pk=job.pk).state, models.ComposeImportJob.WAITING)
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'Only SQLite has no heartbeats.')
+    def test_import_worker_processes_need_heartbeat(self):
+        with self.assertRaises(CommandError):
+            call_command('compose_import_worker', processes=2, once=True)
+
+    def test_async_import_failure(self):
+        self.rpm_manifest['payload']['compose']['id'] = 'TP-1.0-20150315.0'
+        response = self.client.post(reverse('composefullimport-list') + '?async=true',
+                                    {'rpm_manifest': self.rpm_manifest,
+                                     'image_manifest': self.image_manifest,
+                                     'release_id': 'tp-1.0',
+                                     'composeinfo': self.compose_info,
+                                     'location': 'NAY',
+                                     'scheme': 'http',
+                                     'url': 'abc.com'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        self._run_import_jobs()
+
+        self.assertNumChanges([11])
+        response = self.client.get(reverse('composeimportjob-list'), {'state': 'failed'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertIn('Inconsistent data', response.data['results'][0]['error']['detail'][0])
+        response = self.client.get(reverse('composerpm-detail', args=['TP-1.0-20150310.0']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_async_import_checks_required_fields(self):
+        response = self.client.post(reverse('composefullimport-list') + '?async=true',
+                                    {'rpm_manifest': self.rpm_manifest,
+                                     'release_id': 'tp-1.0',
+                                     'composeinfo': self.compose_info},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(models.ComposeImportJob.objects.count(), 0)
+
 
 class RPMMappingAPITestCase(APITestCase):
     fixtures = [
@@ -1397,6 +1666,27 @@ class RPMMappingAPITestCase(APITestCase):
         }
         self.assertEqual(response.data, expected_data)
 
+    def test_get_rpm_mappings_in_bulk(self):
+        url = reverse('composerpmmapping-list', args=[self.compose.compose_id])
+        expected_data = {'bash': {'Server': {'x86_64': {'bash': ['x86_64']}}}}
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected_data)
+        response = self.client.get(url + '?package=bash&package=foo', format='json')
+        self.assertEqual(response.data, expected_data)
+
+    def test_bulk_update_rpm_mappings(self):
+        self.client.force_authenticate(create_user("user", perms=[]))
+        url = reverse('composerpmmapping-list', args=[self.compose.compose_id])
+        new_mapping = {'bash': {'Server': {'x86_64': {'bash': ['x86_64', 'i386']}}}}
+        response = self.client.put(url + '?perform=1', new_mapping, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'bash': [{'action': 'create', 'srpm_name': 'bash', 'rpm_name': 'bash',
+                                                   'rpm_arch': 'i386', 'variant': 'Server', 'arch': 'x86_64',
+                                                   'include': True, 'release_id': 'release-1.0'}]})
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response.data, {'Server': {'x86_64': {'bash': ['i386', 'x86_64']}}})
+
     def test_get_rpm_mapping_for_nonexisting_compose(self):
         url = reverse('composerpmmapping-detail', args=['foo-bar', 'bash'])
         response = self.client.get(url, {}, format='json')
@@ -1715,6 +2005,45 @@ class RPMMappingTestCase(TestCase):
                                       'include': False, 'release_id': 'release-1.0', 'rpm_name': 'bash',
                                       'srpm_name': 'bash', 'rpm_arch': 'x86_64'})
 
+    def test_cached_rpms_are_reloaded_after_change(self):
+        table = models.COMPOSE_RPM_TABLE_CACHE.get(self.compose)
+        self.assertIs(models.COMPOSE_RPM_TABLE_CACHE.get(self.compose), table)
+        # No signals are sent, the same as when another process adds the RPM.
+        models.ComposeRPM.objects.bulk_create([
+            models.ComposeRPM(variant_arch_id=2, rpm_id=1, sigkey_id=1, content_category_id=1, path_id=1)
+        ])
+        self.assertIsNot(models.COMPOSE_RPM_TABLE_CACHE.get(self.compose), table)
+
+    def test_cached_rpms_are_reloaded_after_delete(self):
+        table = models.COMPOSE_RPM_TABLE_CACHE.get(self.compose)
+        models.ComposeRPM.delete_many(models.ComposeRPM.objects.filter(rpm__name='bash-doc'))
+        self.assertIsNot(models.COMPOSE_RPM_TABLE_CACHE.get(self.compose), table)
+
+    def test_update_overrides_in_batch(self):
+        release = self.compose.release
+        base = {'variant': 'Server', 'arch': 'x86_64', 'srpm_name': 'bash'}
+        changes = [
+            dict(base, action='create', rpm_name='bash', rpm_arch='src', include=True),
+            dict(base, action='delete', rpm_name='bash-doc', rpm_arch='x86_64'),
+            dict(base, action='create', rpm_name='bash-doc', rpm_arch='x86_64', include=True),
+            dict(base, action='delete', rpm_name='bash', rpm_arch='src', do_not_delete=True, comment='keep'),
+        ]
+        old_doc = models.OverrideRPM.objects.get(pk=1).export()
+        with self.assertNumQueries(7):
+            results = models.OverrideRPM.update_objects(release, changes)
+        src = models.OverrideRPM.objects.get(rpm_name='bash', rpm_arch='src')
+        doc = models.OverrideRPM.objects.get(rpm_name='bash-doc')
+        self.assertNotEqual(doc.pk, 1)
+        self.assertEqual(
+            results,
+            [(src.pk, 'null', dict(src.export(), include=True, do_not_delete=False, comment='')),
+             (1, old_doc, 'null'),
+             (doc.pk, 'null', doc.export()),
+             (src.pk, dict(src.export(), include=True, do_not_delete=False, comment=''), src.export())]
+        )
+        self.assertEqual((src.include, src.do_not_delete, src.comment), (False, True, 'keep'))
+        self.assertTrue(doc.include)
+
 
 class OverrideManagementTestCase(TestCase):
     fixtures = [
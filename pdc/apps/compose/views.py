@@ -6,6 +6,7 @@
 from itertools import groupby
 import json
 import os.path
+from StringIO import StringIO
 
 from productmd.rpms import Rpms
 from productmd.images import Images, Image
@@ -19,14 +20,16 @@ from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
 from django.shortcuts import render
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework import viewsets, mixins, status, serializers
+from rest_framework.settings import api_settings
 from django.db.models import Q
 from django.http import Http404
 
 from contrib.bulk_operations import bulk_operations
 
 from pdc.apps.package.serializers import RPMSerializer
-from pdc.apps.common.models import Arch, SigKey
+from pdc.apps.common.models import Arch
 from pdc.apps.common.hacks import bool_from_native, convert_str_to_bool, as_dict
 from pdc.apps.common.viewsets import (ChangeSetCreateModelMixin,
                                       StrictQueryParamMixin,
@@ -41,13 +44,16 @@ from pdc.apps.utils.utils import generate_warning_header_dict
 from pdc.apps.auth.permissions import APIPermission
 from .models import (Compose, VariantArch, Variant, ComposeRPM, OverrideRPM,
                      ComposeImage, ComposeRPMMapping, ComposeAcceptanceTestingState,
-                     ComposeTree)
+                     ComposeTree, ComposeImportJob, ComposeSigKey, ComposeRPMIndex,
+                     RPMMappingEngine)
 from .forms import (ComposeSearchForm, ComposeRPMSearchForm, ComposeImageSearchForm,
                     ComposeRPMDisableForm, OverrideRPMForm, VariantArchForm, OverrideRPMActionForm)
 from .serializers import (ComposeSerializer, OverrideRPMSerializer, ComposeTreeSerializer,
-                          ComposeImageRTTTestSerializer, ComposeTreeRTTTestSerializer)
+                          ComposeImageRTTTestSerializer, ComposeTreeRTTTestSerializer,
+                          ComposeImportJobSerializer)
 from .filters import (ComposeFilter, OverrideRPMFilter, ComposeTreeFilter, ComposeImageRTTTestFilter,
-                      ComposeTreeRTTTestFilter)
+                      ComposeTreeRTTTestFilter, ComposeImportJobFilter)
+from .parsers import StreamingManifestParser, dump_request_data
 from . import lib
 
 
@@ -414,11 +420,10 @@ def dict_equal_on(d1, d2, keys):
 def _apply_changes(request, release, changes):
     """
     Apply each change to update an override. The `changes` argument should be a
-    list of values suitable for `OverrideRPM.update_object` method. Each
+    list of values suitable for `OverrideRPM.update_objects` method. Each
     perfomed change is logged.
     """
-    for change in changes:
-        pk, old_val, new_val = OverrideRPM.update_object(change['action'], release, change)
+    for pk, old_val, new_val in OverrideRPM.update_objects(release, changes):
         request.changeset.add('OverrideRPM', pk, old_val, new_val)
 
 
@@ -446,7 +451,7 @@ class ComposeViewSet(StrictQueryParamMixin,
     $LINK:composerpm-list$
     $LINK:composeimage-list$
     """
-    queryset = Compose.objects.all().order_by('id')
+    queryset = Compose.objects.select_related('release', 'compose_type', 'acceptance_testing').order_by('id')
     serializer_class = ComposeSerializer
     filter_class = ComposeFilter
     filter_fields = ('srpm_name', 'rpm_name', 'rpm_arch', 'rpm_version', 'rpm_release')
@@ -463,14 +468,13 @@ class ComposeViewSet(StrictQueryParamMixin,
     def filter_queryset(self, qs):
         """
         If the viewset instance has attribute `order_queryset` set to True,
-        this method returns a list of composes ordered according to *productmd*
-        library. Otherwise it will return an unsorted queryset. (It is not
-        possible to sort unconditionally as get_object() will at some point
-        call this method and fail unless it receives a QuerySet instance.)
+        this method returns composes ordered according to *productmd*
+        library (using the precomputed sort key). Otherwise the queryset is
+        ordered as requested by the `ordering` query parameter.
         """
         qs = super(ComposeViewSet, self).filter_queryset(self._filter_nvras(qs))
         if getattr(self, 'order_queryset', False):
-            return sorted(qs)
+            return qs.order_by('sort_key')
         return qs
 
     def _filter_nvras(self, qs):
@@ -493,36 +497,28 @@ class ComposeViewSet(StrictQueryParamMixin,
         """
         Cache some information and put them in context to prevent from getting them one by one
         for each model object in other places.
-        Currently, it caches compose id to it's corresponding Sigkeys' key id mapping.
-        """
-        variant_id_to_compose_id_dict = {}
-        variant_id_list = []
-        for compose_id, variant_id in Variant.objects.filter(
-                compose__in=result_queryset).values_list("compose__id", "id"):
-            variant_id_to_compose_id_dict[variant_id] = compose_id
-            variant_id_list.append(variant_id)
-
-        compose_id_to_va_id_set = {}
-        variant_arch_id_list = []
-        for variant_id, variant_arch_id in VariantArch.objects.filter(
-                variant__id__in=variant_id_list).values_list('variant__id', 'id'):
-            compose_id_to_va_id_set.setdefault(variant_id_to_compose_id_dict[variant_id], set([])).add(variant_arch_id)
-            variant_arch_id_list.append(variant_arch_id)
-
-        va_id_to_key_id_set = {}
-        for key_id, va_id in SigKey.objects.filter(
-                composerpm__variant_arch__id__in=variant_arch_id_list).values_list(
-                'key_id', 'composerpm__variant_arch__id').distinct():
-            va_id_to_key_id_set.setdefault(va_id, set([])).add(key_id)
-
+        Currently, it caches compose id to it's corresponding Sigkeys' key id mapping, testing
+        status of variant arches and linked releases.
+        """
         compose_id_to_key_id_cache = {}
-        for compose_id, va_id_set in compose_id_to_va_id_set.iteritems():
-            for va_id in va_id_set:
-                if va_id in va_id_to_key_id_set:
-                    key_id_set = compose_id_to_key_id_cache.setdefault(compose_id, set([]))
-                    key_id_set |= va_id_to_key_id_set[va_id]
+        for compose_id, key_id in ComposeSigKey.objects.filter(
+                compose__in=result_queryset).values_list('compose_id', 'sigkey__key_id'):
+            compose_id_to_key_id_cache.setdefault(compose_id, set()).add(key_id)
+
+        compose_id_to_rtt_cache = {}
+        for compose_id, variant_uid, arch, testing_status in VariantArch.objects.filter(
+                variant__compose__in=result_queryset).values_list(
+                    'variant__compose_id', 'variant__variant_uid', 'arch__name', 'rtt_testing_status__name'):
+            compose_id_to_rtt_cache.setdefault(compose_id, {}).setdefault(variant_uid, {})[arch] = testing_status
 
-        self.context = {'compose_id_to_key_id_cache': compose_id_to_key_id_cache}
+        compose_id_to_linked_releases_cache = {}
+        for link in Compose.linked_releases.through.objects.filter(
+                compose__in=result_queryset).select_related('release').order_by('release__release_id'):
+            compose_id_to_linked_releases_cache.setdefault(link.compose_id, []).append(link.release)
+
+        self.context = {'compose_id_to_key_id_cache': compose_id_to_key_id_cache,
+                        'compose_id_to_rtt_cache': compose_id_to_rtt_cache,
+                        'compose_id_to_linked_releases_cache': compose_id_to_linked_releases_cache}
 
     def _add_messaging_info(self, request, info):
         if hasattr(request._request, '_messagings'):
@@ -735,8 +731,34 @@ class CheckParametersMixin(object):
             error_dict[key] = ["This field is required"]
 
 
-class ComposeRPMView(StrictQueryParamMixin, CheckParametersMixin, viewsets.GenericViewSet):
+class AsyncImportMixin(object):
+    """
+    Allow import end-points to only store the request data and let the
+    `compose_import_worker` management command run the import later. The
+    asynchronous mode is enabled by `async=true` query parameter.
+    """
+    extra_query_params = ('async', )
+
+    def _wants_async(self, request):
+        return convert_str_to_bool(request.query_params.get('async', 'false'), name='async')
+
+    def _enqueue_import(self, request, kind):
+        user = request.user if request.user.is_authenticated() else None
+        data = StringIO()
+        dump_request_data(request.data, data)
+        job = ComposeImportJob.objects.create(kind=kind,
+                                              author=user,
+                                              comment=request.META.get("HTTP_PDC_CHANGE_COMMENT", None),
+                                              data=data.getvalue())
+        url = reverse('composeimportjob-detail', args=[job.pk], request=request)
+        return Response(data={'job': job.pk, 'url': url},
+                        status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': url})
+
+
+class ComposeRPMView(StrictQueryParamMixin, CheckParametersMixin, AsyncImportMixin, viewsets.GenericViewSet):
     permission_classes = (APIPermission,)
+    parser_classes = (StreamingManifestParser, ) + tuple(api_settings.DEFAULT_PARSER_CLASSES)
     lookup_field = 'compose_id'
     lookup_value_regex = '[^/]+'
     queryset = ComposeRPM.objects.none()    # Required for permissions
@@ -789,6 +811,21 @@ class ComposeRPMView(StrictQueryParamMixin, CheckParametersMixin, viewsets.Gener
 
         You could skip the file and send the data directly to `curl`. In such a
         case use `-d @-`.
+
+        __Asynchronous mode__:
+
+        With `?async=true` query parameter the data is only checked for
+        required fields and stored. The response has status `202 ACCEPTED` and
+        contains id of the import job and its URL:
+
+            {
+                "job": int,
+                "url": string
+            }
+
+        The import is run by a background worker. Its progress and result can
+        be watched at $LINK:composeimportjob-list$. The changeset and messages
+        are the same as with synchronous import.
         """
         data = request.data
         errors = {}
@@ -796,6 +833,8 @@ class ComposeRPMView(StrictQueryParamMixin, CheckParametersMixin, viewsets.Gener
         self._check_parameters(fields, data.keys(), errors)
         if errors:
             return Response(status=status.HTTP_400_BAD_REQUEST, data=errors)
+        if self._wants_async(request):
+            return self._enqueue_import(request, ComposeImportJob.RPMS)
         compose_id, imported_rpms = lib.compose__import_rpms(request, data['release_id'], data['composeinfo'], data['rpm_manifest'])
         return Response(data={'compose': compose_id, 'imported rpms': imported_rpms}, status=status.HTTP_201_CREATED)
 
@@ -842,8 +881,10 @@ class ComposeRPMView(StrictQueryParamMixin, CheckParametersMixin, viewsets.Gener
         return Response(manifest.serialize({}))
 
 
-class ComposeFullImportViewSet(StrictQueryParamMixin, CheckParametersMixin, viewsets.GenericViewSet):
+class ComposeFullImportViewSet(StrictQueryParamMixin, CheckParametersMixin, AsyncImportMixin,
+                               viewsets.GenericViewSet):
     permission_classes = (APIPermission,)
+    parser_classes = (StreamingManifestParser, ) + tuple(api_settings.DEFAULT_PARSER_CLASSES)
     queryset = Compose.objects.none()    # Required for permissions.
 
     def create(self, request):
@@ -901,6 +942,21 @@ class ComposeFullImportViewSet(StrictQueryParamMixin, CheckParametersMixin, view
 
         You could skip the file and send the data directly to `curl`. In such a
         case use `-d @-`.
+
+        __Asynchronous mode__:
+
+        With `?async=true` query parameter the data is only checked for
+        required fields and stored. The response has status `202 ACCEPTED` and
+        contains id of the import job and its URL:
+
+            {
+                "job": int,
+                "url": string
+            }
+
+        The import is run by a background worker. Its progress and result can
+        be watched at $LINK:composeimportjob-list$. The changeset and messages
+        are the same as with synchronous import.
         """
         data = request.data
         errors = {}
@@ -908,6 +964,8 @@ class ComposeFullImportViewSet(StrictQueryParamMixin, CheckParametersMixin, view
         self._check_parameters(fields, data.keys(), errors)
         if errors:
             return Response(status=status.HTTP_400_BAD_REQUEST, data=errors)
+        if self._wants_async(request):
+            return self._enqueue_import(request, ComposeImportJob.FULL)
         compose_id, imported_rpms, imported_images, set_locations = lib.compose__full_import(request,
                                                                                              data['release_id'],
                                                                                              data['composeinfo'],
@@ -931,7 +989,49 @@ class ComposeRPMMappingView(StrictQueryParamMixin,
     permission_classes = (APIPermission,)
     lookup_field = 'package'
     queryset = ComposeRPM.objects.none()    # Required for permissions
-    extra_query_params = ('disable_overrides', 'perform')
+    extra_query_params = ('disable_overrides', 'perform', 'package')
+
+    def _get_mapping_engine(self, compose):
+        engine = getattr(self, '_mapping_engine', None)
+        if engine is None or engine.compose != compose:
+            engine = RPMMappingEngine(compose)
+        return engine
+
+    def list(self, request, **kwargs):
+        """
+        __URL__: $LINK:composerpmmapping-list:compose_id$
+
+        __Response__:
+
+            {
+                package: {
+                    Variants:{
+                        archs:{
+                            rpm_names:[
+                                rpm_arch,
+                            ]
+                        }
+                    }
+                }
+            }
+
+        Returns RPM mappings of multiple packages at once. Use the `package`
+        query parameter (possibly repeated) to select packages, otherwise
+        mappings of all packages in the compose are returned. Packages with
+        empty mapping are omitted. There is an optional query parameter
+        `?disable_overrides=1` which returns the raw mappings not affected by
+        any overrides.
+        """
+        compose = get_object_or_404(Compose, compose_id=kwargs['compose_id'])
+        disable_overrides = bool(request.query_params.get('disable_overrides', False))
+        engine = RPMMappingEngine(compose, preload_overrides=True)
+        result = {}
+        for package in request.query_params.getlist('package') or engine.packages:
+            mapping, _ = engine.get_rpm_mapping(package, disable_overrides)
+            data = mapping.get_pure_dict()
+            if data:
+                result[package] = data
+        return Response(result)
 
     def retrieve(self, request, **kwargs):
         """
@@ -954,8 +1054,8 @@ class ComposeRPMMappingView(StrictQueryParamMixin,
         affected by any overrides.
         """
         compose = get_object_or_404(Compose, compose_id=kwargs['compose_id'])
-        mapping, _ = compose.get_rpm_mapping(kwargs['package'],
-                                             bool(request.query_params.get('disable_overrides', False)))
+        mapping, _ = self._get_mapping_engine(compose).get_rpm_mapping(
+            kwargs['package'], bool(request.query_params.get('disable_overrides', False)))
         return Response(mapping.get_pure_dict())
 
     def partial_update(self, request, **kwargs):
@@ -1061,7 +1161,7 @@ class ComposeRPMMappingView(StrictQueryParamMixin,
             return Response(
                 data={"detail": "The parameters' format for updating is wrong. Please read API documentation"},
                 status=status.HTTP_400_BAD_REQUEST)
-        mapping, _ = compose.get_rpm_mapping(kwargs['package'])
+        mapping, _ = self._get_mapping_engine(compose).get_rpm_mapping(kwargs['package'])
         new_mapping = ComposeRPMMapping(data=request.data)
         changes = mapping.compute_changes(new_mapping)
         if bool(request.query_params.get('perform', False)):
@@ -1074,10 +1174,13 @@ class ComposeRPMMappingView(StrictQueryParamMixin,
         method. The input must be a JSON object with `package`as
         keys. Values for these keys should be in the same format as `update`.
         """
+        # RPMs of the compose and overrides are loaded once for all packages.
+        compose = get_object_or_404(Compose, compose_id=kwargs['compose_id'])
+        self._mapping_engine = RPMMappingEngine(compose, preload_overrides=True)
         return bulk_operations.bulk_update_impl(self, *args, **kwargs)
 
 
-class ComposeImageView(StrictQueryParamMixin, CheckParametersMixin,
+class ComposeImageView(StrictQueryParamMixin, CheckParametersMixin, AsyncImportMixin,
                        viewsets.GenericViewSet):
     permission_classes = (APIPermission,)
     queryset = ComposeImage.objects.none()  # Required for permissions
@@ -1120,6 +1223,21 @@ class ComposeImageView(StrictQueryParamMixin, CheckParametersMixin,
                      \\"image_manifest\\": $(cat /path/to/image-manifest.json), \\
                      \\"release_id\\": \\"release-1.0\\" }" \\
                 $URL:composeimage-list$
+
+        __Asynchronous mode__:
+
+        With `?async=true` query parameter the data is only checked for
+        required fields and stored. The response has status `202 ACCEPTED` and
+        contains id of the import job and its URL:
+
+            {
+                "job": int,
+                "url": string
+            }
+
+        The import is run by a background worker. Its progress and result can
+        be watched at $LINK:composeimportjob-list$. The changeset and messages
+        are the same as with synchronous import.
         """
         data = request.data
         errors = {}
@@ -1127,6 +1245,8 @@ class ComposeImageView(StrictQueryParamMixin, CheckParametersMixin,
         self._check_parameters(fields, data.keys(), errors)
         if errors:
             return Response(status=400, data=errors)
+        if self._wants_async(request):
+            return self._enqueue_import(request, ComposeImportJob.IMAGES)
         compose_id, imported_images = lib.compose__import_images(request, data['release_id'], data['composeinfo'], data['image_manifest'])
         return Response(data={'compose': compose_id, 'imported images': imported_images}, status=status.HTTP_201_CREATED)
 
@@ -1528,27 +1648,57 @@ class FindComposeMixin(object):
 
     def _get_composes_for_product_version(self):
         result = []
-        all_composes = []
-        releases = Release.objects.filter(product_version__product_version_id=self.product_version)
-        for release in releases:
-            composes = Compose.objects.filter(release=release)
-            composes = self._filter_by_compose_type(composes)
-            all_composes.extend(composes)
-        result = self._get_result(all_composes, result)
+        composes = Compose.objects.filter(release__product_version__product_version_id=self.product_version)
+        composes = self._filter_by_compose_type(composes)
+        result = self._get_result(composes, result)
         return result
 
     def _get_result(self, composes, result):
         if self.latest:
-            compose = max(composes) if composes else None
-            if compose:
-                self._construct_result(compose, result)
+            composes = composes.order_by('-sort_key')[:1]
         else:
-            for compose in sorted(composes):
-                self._construct_result(compose, result)
+            composes = self._maybe_paginate(composes.order_by('sort_key'))
+        rpms = self._get_rpms_by_compose(composes)
+        for compose in composes:
+            self._construct_result(compose, rpms.get(compose.pk, []), result)
         return result
 
-    def _construct_result(self, compose, result):
-        rpms = compose.get_rpms(self.rpm_name)
+    def _maybe_paginate(self, composes):
+        """
+        Paginate the composes if client asked for it by any of pagination
+        query parameters. Otherwise all composes are returned.
+        """
+        paginator = self.paginator
+        params = [getattr(paginator, name, None)
+                  for name in ('page_query_param', 'page_size_query_param', 'cursor_query_param')]
+        if not any(param in self.request.query_params for param in params if param):
+            return composes
+        page = self.paginate_queryset(composes)
+        if page is None:
+            return composes
+        self.paginated = True
+        return page
+
+    def _get_response(self, result):
+        if getattr(self, 'paginated', False):
+            return self.get_paginated_response(result)
+        return Response(result)
+
+    def _get_rpms_by_compose(self, composes):
+        """
+        Find RPMs with requested name in all given composes with a single
+        query. Returns a dict mapping compose primary key to list of RPMs.
+        """
+        result = {}
+        rows = (ComposeRPMIndex.objects
+                .filter(rpm_name=self.rpm_name, compose__in=[compose.pk for compose in composes])
+                .select_related('rpm')
+                .order_by('rpm_id'))
+        for row in rows:
+            result.setdefault(row.compose_id, []).append(row.rpm)
+        return result
+
+    def _construct_result(self, compose, rpms, result):
         result.append({'compose': compose.compose_id,
                        'packages': self._packages_output(rpms)})
         return result
@@ -1579,28 +1729,28 @@ class FindComposeMixin(object):
                     .exclude(compose_date__gt=compose.compose_date)
                     # Only composes in the same product
                     .filter(release__short=compose.release.short)
-                    # Which have the requested rpm in some version
-                    .filter(variant__variantarch__composerpm__rpm__name=self.rpm_name)
                     # Keep only composes from the release that requested
                     # compose belongs to, or GA releases. This way, after R-1.1
                     # it goes to R-1.0, but not R-1.0-updates.
                     .filter(Q(release__release_type__short='ga') | Q(release=compose.release))
-                    .exclude(id=compose.id)
-                    .distinct())
+                    .exclude(id=compose.id))
         composes = self._filter_by_compose_type(composes)
-        latest = None
-        for compose in sorted(composes, reverse=True):
-            rpms = compose.get_rpms(self.rpm_name)
+        # All versions of the requested RPM in these composes, newest compose
+        # first.
+        rows = (ComposeRPMIndex.objects
+                .filter(rpm_name=self.rpm_name, compose__in=composes)
+                .select_related('compose', 'rpm')
+                .order_by('-compose__sort_key', 'rpm_id'))
+        for _, group in groupby(rows, lambda row: row.compose_id):
+            group = list(group)
+            rpms = [row.rpm for row in group]
             # Does compose have a version not in current compose?
             if set(r.sort_key for r in rpms) - current_rpms:
-                latest = compose
-                break
-        if not latest:
-            raise Http404('No older compose with earlier version of RPM')
-        return {
-            'compose': latest.compose_id,
-            'packages': self._packages_output(rpms)
-        }
+                return {
+                    'compose': group[0].compose.compose_id,
+                    'packages': self._packages_output(rpms)
+                }
+        raise Http404('No older compose with earlier version of RPM')
 
 
 class FindComposeByReleaseRPMViewSet(StrictQueryParamMixin, FindComposeMixin, viewsets.GenericViewSet):
@@ -1649,6 +1799,10 @@ class FindComposeByReleaseRPMViewSet(StrictQueryParamMixin, FindComposeMixin, vi
             ]
 
         The list is sorted by compose: oldest first.
+
+        The list is not paginated by default. If any of `page`, `page_size`
+        or `cursor` query parameters is used, the response is paginated the
+        same way as other list end-points.
         """
         self.included_compose_type = request.query_params.get('included_compose_type')
         self.excluded_compose_type = request.query_params.get('excluded_compose_type')
@@ -1656,7 +1810,7 @@ class FindComposeByReleaseRPMViewSet(StrictQueryParamMixin, FindComposeMixin, vi
         self._get_query_param_or_false(request, 'to_dict')
         self.release_id = kwargs.get('release_id')
         self.rpm_name = kwargs.get('rpm_name')
-        return Response(self._get_composes_for_release())
+        return self._get_response(self._get_composes_for_release())
 
 
 class FindOlderComposeByComposeRPMViewSet(StrictQueryParamMixin, FindComposeMixin, viewsets.GenericViewSet):
@@ -1758,6 +1912,10 @@ class FindComposeByProductVersionRPMViewSet(StrictQueryParamMixin, FindComposeMi
             ]
 
         The list is sorted by compose: oldest first.
+
+        The list is not paginated by default. If any of `page`, `page_size`
+        or `cursor` query parameters is used, the response is paginated the
+        same way as other list end-points.
         """
         self.included_compose_type = request.query_params.get('included_compose_type')
         self.excluded_compose_type = request.query_params.get('excluded_compose_type')
@@ -1765,7 +1923,7 @@ class FindComposeByProductVersionRPMViewSet(StrictQueryParamMixin, FindComposeMi
         self._get_query_param_or_false(request, 'to_dict')
         self.product_version = kwargs.get('product_version')
         self.rpm_name = kwargs.get('rpm_name')
-        return Response(self._get_composes_for_product_version())
+        return self._get_response(self._get_composes_for_product_version())
 
 
 class ComposeImageRTTTestViewSet(ChangeSetUpdateModelMixin,
@@ -2090,3 +2248,55 @@ class ComposeTreeRTTTestViewSet(ChangeSetUpdateModelMixin,
         %(SERIALIZER)s
         """
         return super(ComposeTreeRTTTestViewSet, self).update(request, *args, **kwargs)
+
+
+class ComposeImportJobViewSet(StrictQueryParamMixin,
+                              mixins.ListModelMixin,
+                              mixins.RetrieveModelMixin,
+                              viewsets.GenericViewSet):
+    """
+    API endpoint that allows watching compose imports submitted in
+    asynchronous mode (see $LINK:composerpm-list$,
+    $LINK:composeimage-list$ and $LINK:composefullimport-list$).
+
+    A job starts in `waiting` state. Once a worker picks it up, it goes to
+    `running` and finally to either `done` or `failed`. Failed jobs have the
+    `error` field set to the error response the synchronous import would
+    return.
+
+    Counters `variants_done`, `rpms_linked`, `images_linked` and
+    `set_locations` show progress of the import. Depending on the database
+    they may only be updated once the job is finished.
+    """
+    queryset = ComposeImportJob.objects.select_related('author').all()
+    serializer_class = ComposeImportJobSerializer
+    filter_class = ComposeImportJobFilter
+    permission_classes = (APIPermission,)
+
+    def list(self, *args, **kwargs):
+        """
+        __Method__: GET
+
+        __URL__: $LINK:composeimportjob-list$
+
+        __Query params__:
+
+        %(FILTERS)s
+
+        __Response__: a paged list of following objects
+
+        %(SERIALIZER)s
+        """
+        return super(ComposeImportJobViewSet, self).list(*args, **kwargs)
+
+    def retrieve(self, *args, **kwargs):
+        """
+        __Method__: GET
+
+        __URL__: $LINK:composeimportjob-detail:id$
+
+        __Response__:
+
+        %(SERIALIZER)s
+        """
+        return super(ComposeImportJobViewSet, self).retrieve(*args, **kwargs)
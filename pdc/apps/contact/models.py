@@ -52,6 +52,10 @@ class ContactRole(models.Model):
         return model_to_dict(self, fields=_fields)
 
 
+# Maximal number of contacts whose subclass is loaded by one query.
+LEAF_CLASS_BATCH_SIZE = 500
+
+
 # https://djangosnippets.org/snippets/1034/
 class SubclassingQuerySet(QuerySet):
     def __getitem__(self, k):
@@ -62,8 +66,8 @@ class SubclassingQuerySet(QuerySet):
             return result
 
     def __iter__(self):
-        for item in super(SubclassingQuerySet, self).__iter__():
-            yield item.as_leaf_class()
+        items = list(super(SubclassingQuerySet, self).__iter__())
+        return iter(Contact.resolve_leaf_classes(items))
 
 
 class ContactManager(models.Manager):
@@ -89,11 +93,39 @@ class Contact(models.Model):
         super(Contact, self).save(*args, **kwargs)
 
     def as_leaf_class(self):
-        content_type = self.content_type
-        model = content_type.model_class()
-        if model == Contact:
+        if hasattr(self, '_leaf'):
+            return self._leaf
+        # Content types are cached by their manager.
+        model = ContentType.objects.get_for_id(self.content_type_id).model_class()
+        if model == Contact or isinstance(self, model):
             return self
-        return model.objects.get(id=self.id)
+        self._leaf = model._base_manager.get(id=self.id)
+        return self._leaf
+
+    @staticmethod
+    def resolve_leaf_classes(contacts):
+        """
+        Return leaf class instances of given contacts in the same order. Each
+        subclass is loaded with a single query, the leaf instances are also
+        cached on the original objects. Items that are not contacts are
+        returned unchanged.
+        """
+        missing = {}
+        for contact in contacts:
+            if not isinstance(contact, Contact) or hasattr(contact, '_leaf'):
+                continue
+            model = ContentType.objects.get_for_id(contact.content_type_id).model_class()
+            if model != Contact and not isinstance(contact, model):
+                missing.setdefault(model, []).append(contact)
+        for model, model_contacts in missing.iteritems():
+            leaves = {}
+            for i in range(0, len(model_contacts), LEAF_CLASS_BATCH_SIZE):
+                batch = model_contacts[i:i + LEAF_CLASS_BATCH_SIZE]
+                leaves.update(model._base_manager.in_bulk([contact.id for contact in batch]))
+            for contact in model_contacts:
+                contact._leaf = leaves[contact.id]
+        return [contact.as_leaf_class() if isinstance(contact, Contact) else contact
+                for contact in contacts]
 
 
 class Person(Contact):
@@ -6,12 +6,13 @@
 import json
 
 from django.contrib.contenttypes.models import ContentType
+from django.db import models
 from rest_framework import serializers
 
 from pdc.apps.common.serializers import DynamicFieldsSerializerMixin, StrictSerializerMixin
 from pdc.apps.component.models import GlobalComponent, ReleaseComponent
 from pdc.apps.component.serializers import ReleaseComponentField
-from .models import (ContactRole, Person, Maillist,
+from .models import (ContactRole, Contact, Person, Maillist,
                      GlobalComponentContact, ReleaseComponentContact)
 
 
@@ -105,6 +106,16 @@ class ContactField(serializers.DictField):
         raise serializers.ValidationError('Could not determine type of contact.')
 
 
+class ComponentContactListSerializer(serializers.ListSerializer):
+    """
+    Load Person and Maillist details of all serialized contacts at once.
+    """
+    def to_representation(self, data):
+        data = list(data.all() if isinstance(data, models.Manager) else data)
+        Contact.resolve_leaf_classes([obj.contact for obj in data])
+        return super(ComponentContactListSerializer, self).to_representation(data)
+
+
 class GlobalComponentContactSerializer(StrictSerializerMixin, serializers.ModelSerializer):
     component = serializers.SlugRelatedField(slug_field='name', read_only=False,
                                              queryset=GlobalComponent.objects.all())
@@ -115,6 +126,7 @@ class GlobalComponentContactSerializer(StrictSerializerMixin, serializers.ModelS
     class Meta:
         model = GlobalComponentContact
         fields = ('id', 'component', 'role', 'contact')
+        list_serializer_class = ComponentContactListSerializer
 
 
 class ReleaseComponentContactSerializer(StrictSerializerMixin, serializers.ModelSerializer):
@@ -127,3 +139,4 @@ class ReleaseComponentContactSerializer(StrictSerializerMixin, serializers.Model
     class Meta:
         model = ReleaseComponentContact
         fields = ('id', 'component', 'role', 'contact')
+        list_serializer_class = ComponentContactListSerializer
@@ -11,9 +11,28 @@ from . import models
 from pdc.apps.component import signals as component_signals
 
 
-@receiver(component_signals.releasecomponent_clone)
-def clone_osbs_record(sender, request, orig_component_pk, component, **kwargs):
-    for c in models.ReleaseComponentContact.objects.filter(component_id=orig_component_pk):
-        copy = models.ReleaseComponentContact(component=component, contact=c.contact, role=c.role)
-        copy.save()
-        request.changeset.add('releasecomponentcontact', copy.pk, 'null', json.dumps(copy.export()))
+@receiver(component_signals.releasecomponent_clone_many)
+def clone_release_component_contacts(sender, request, original_release, release, components, **kwargs):
+    rc_map = dict(components)
+    contacts = [c for c in (models.ReleaseComponentContact.objects
+                            .filter(component__release=original_release)
+                            .select_related('contact', 'role')
+                            .order_by('pk'))
+                if c.component_id in rc_map]
+    models.Contact.resolve_leaf_classes([c.contact for c in contacts])
+    copies = [(c.component_id, models.ReleaseComponentContact(component=rc_map[c.component_id],
+                                                              contact=c.contact,
+                                                              role=c.role))
+              for c in contacts]
+    models.ReleaseComponentContact.objects.bulk_create([copy for _, copy in copies])
+    ids = dict(((role_id, component_id, contact_id), pk)
+               for pk, role_id, component_id, contact_id in (models.ReleaseComponentContact.objects
+                                                             .filter(component__release=release)
+                                                             .values_list('pk', 'role_id',
+                                                                          'component_id', 'contact_id')))
+    result = {}
+    for org_rc_pk, copy in copies:
+        copy.pk = ids[(copy.role_id, copy.component_id, copy.contact_id)]
+        result.setdefault(org_rc_pk, []).append(
+            ('releasecomponentcontact', copy.pk, 'null', json.dumps(copy.export())))
+    return result
@@ -9,7 +9,7 @@ from django.core.urlresolvers import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from pdc.apps.common.test_utils import TestCaseWithChangeSetMixin
+from pdc.apps.common.test_utils import count_get_queries, TestCaseWithChangeSetMixin
 from pdc.apps.component import models as component_models
 from .models import ContactRole, Person, Maillist, GlobalComponentContact, ReleaseComponentContact
 
@@ -611,6 +611,23 @@ class GlobalComponentContactRESTTestCase(TestCaseWithChangeSetMixin, APITestCase
         self.assertEqual(results[1]['role'], 'qe_ack')
         self.assertEqual(results[1]['contact']['mail_name'], 'maillist2')
 
+    def _count_list_queries(self):
+        num_queries, response = count_get_queries(self.client, self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return num_queries
+
+    def test_list_global_component_contacts_query_count_does_not_grow(self):
+        num_queries = self._count_list_queries()
+        GlobalComponentContact.objects.create(
+            component=component_models.GlobalComponent.objects.get(name='java'),
+            role=ContactRole.objects.get(name='pm'),
+            contact=Person.objects.get(username='person2'))
+        GlobalComponentContact.objects.create(
+            component=component_models.GlobalComponent.objects.get(name='MySQL-python'),
+            role=ContactRole.objects.get(name='qe_ack'),
+            contact=Maillist.objects.get(mail_name='maillist1'))
+        self.assertEqual(self._count_list_queries(), num_queries)
+
     def test_retrieve_global_component_contacts(self):
         response = self.client.get(reverse('globalcomponentcontacts-detail', args=[2]))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -39,12 +39,25 @@ def type_post_save_handler(sender, instance, **kwargs):
         models.OSBSRecord.objects.filter(component__type=instance).delete()
 
 
-@receiver(component_signals.releasecomponent_clone)
-def clone_osbs_record(sender, request, orig_component_pk, component, **kwargs):
-    if not component.type.has_osbs:
-        return
-    old_record = models.OSBSRecord.objects.get(component_id=orig_component_pk)
-    component.osbs.autorebuild = old_record.autorebuild
-    component.osbs.save()
-    request.changeset.add('osbsrecord', component.osbs.pk,
-                          'null', json.dumps(component.osbs.export()))
+@receiver(component_signals.releasecomponent_clone_many)
+def clone_osbs_records(sender, request, original_release, release, components, **kwargs):
+    """Create OSBS records for cloned components.
+
+    Cloned components are inserted in bulk without post_save signal, so the
+    records are created here with values copied from the original records.
+    """
+    autorebuild = dict(models.OSBSRecord.objects
+                       .filter(component__release=original_release)
+                       .values_list('component_id', 'autorebuild'))
+    records = [(org_rc_pk, models.OSBSRecord(component=component, autorebuild=autorebuild.get(org_rc_pk)))
+               for org_rc_pk, component in components
+               if component.type.has_osbs]
+    models.OSBSRecord.objects.bulk_create([record for _, record in records])
+    ids = dict(models.OSBSRecord.objects
+               .filter(component__release=release)
+               .values_list('component_id', 'pk'))
+    result = {}
+    for org_rc_pk, record in records:
+        record.pk = ids[record.component_id]
+        result[org_rc_pk] = [('osbsrecord', record.pk, 'null', json.dumps(record.export()))]
+    return result
@@ -22,37 +22,12 @@ def dependency_filter(type, queryset, value):
         raise FieldError('Unrecognized value for filter for {}'.format(type))
     groups = m.groupdict()
     queryset = queryset.filter(dependency__name=groups['name'], dependency__type=type).distinct()
-    for dep in models.Dependency.objects.filter(type=type, name=groups['name']):
-
-        is_equal = dep.is_equal(groups['version']) if groups['version'] else False
-        is_lower = dep.is_lower(groups['version']) if groups['version'] else False
-        is_higher = dep.is_higher(groups['version']) if groups['version'] else False
-
-        if groups['op'] == '=' and not dep.is_satisfied_by(groups['version']):
-            queryset = queryset.exclude(pk=dep.rpm_id)
-
-        # User requests everything depending on higher than X
-        elif groups['op'] == '>' and dep.comparison in ('<', '<=', '=') and (is_lower or is_equal):
-            queryset = queryset.exclude(pk=dep.rpm_id)
-
-        # User requests everything depending on lesser than X
-        elif groups['op'] == '<' and dep.comparison in ('>', '>=', '=') and (is_higher or is_equal):
-            queryset = queryset.exclude(pk=dep.rpm_id)
-
-        # User requests everything depending on at least X
-        elif groups['op'] == '>=':
-            if dep.comparison == '<' and (is_lower or is_equal):
-                queryset = queryset.exclude(pk=dep.rpm_id)
-            elif dep.comparison in ('<=', '=') and is_lower:
-                queryset = queryset.exclude(pk=dep.rpm_id)
-
-        # User requests everything depending on at most X
-        elif groups['op'] == '<=':
-            if dep.comparison == '>' and (is_higher or is_equal):
-                queryset = queryset.exclude(pk=dep.rpm_id)
-            elif dep.comparison in ('>=', '=') and is_higher:
-                queryset = queryset.exclude(pk=dep.rpm_id)
-
+    if groups['version']:
+        # Exclude RPMs with a constraint that does not allow requested version.
+        conflicting = (models.Dependency.objects
+                       .filter(type=type, name=groups['name'])
+                       .filter(models.Dependency.conflicting_with(groups['op'], groups['version'])))
+        queryset = queryset.exclude(pk__in=conflicting.values('rpm_id'))
     return queryset
 
 
@@ -0,0 +1,38 @@
+#
+# Copyright (c) 2015 Red Hat
+# Licensed under The MIT License (MIT)
+# http://opensource.org/licenses/MIT
+#
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pdc.apps.package.models import Dependency, dependency_version_key
+
+
+class Command(BaseCommand):
+    help = ('Compute version keys used by dependency filters for dependencies '
+            'stored before the keys were introduced.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', default=False,
+                            help='Recompute keys of all dependencies, not only the missing ones.')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Number of dependencies updated in one transaction.')
+
+    def handle(self, *args, **options):
+        deps = Dependency.objects.exclude(version=None).order_by('pk')
+        if not options['all']:
+            deps = deps.filter(version_key=None)
+        batch_size = max(1, options['batch_size'])
+        last_pk = 0
+        updated = 0
+        while True:
+            batch = list(deps.filter(pk__gt=last_pk).values_list('pk', 'version')[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                for pk, version in batch:
+                    Dependency.objects.filter(pk=pk).update(version_key=dependency_version_key(version))
+            last_pk = batch[-1][0]
+            updated += len(batch)
+        self.stdout.write('Updated %d dependencies.' % updated)
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('package', '0013_set_default_subvariant_to_empty_string'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dependency',
+            name='version_key',
+            field=models.CharField(max_length=1000, null=True, editable=False, blank=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='dependency',
+            index_together=set([('type', 'name', 'version_key')]),
+        ),
+    ]
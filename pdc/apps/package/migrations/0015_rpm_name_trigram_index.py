@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+
+from django.db import migrations, transaction
+from django.db.utils import DatabaseError
+
+
+logger = logging.getLogger(__name__)
+
+
+# Prefix searches are served by the varchar_pattern_ops index Django
+# creates for indexed character fields on PostgreSQL. Substring searches
+# need a trigram index, which is only available with pg_trgm extension.
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic():
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        logger.warning('Extension pg_trgm is not available, RPM name substring filter will not use an index.')
+        return
+    schema_editor.execute('CREATE INDEX package_rpm_name_trgm ON package_rpm USING gin (name gin_trgm_ops)')
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS package_rpm_name_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('package', '0014_dependency_version_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -18,9 +18,9 @@ from django.db.models.signals import post_migrate
 from kobo.rpmlib import parse_nvra
 from productmd import images
 
-from pdc.apps.common.models import get_cached_id
+from pdc.apps.common.models import LookupCache, get_cached_id
 from pdc.apps.common.validators import validate_md5, validate_sha1, validate_sha256
-from pdc.apps.common.hacks import add_returning, parse_epoch_version
+from pdc.apps.common.hacks import add_returning, bulk_insert_ignore, encode_sortable_int, parse_epoch_version
 from pdc.apps.common.constants import ARCH_SRC
 from pdc.apps.release.models import Release
 from pdc.apps.compose.models import ComposeAcceptanceTestingState
@@ -122,6 +122,68 @@ class RPM(models.Model):
         transaction.savepoint_commit(sid)
         return insert_id
 
+    # Number of NEVRAs resolved by one query. Each of name, version and
+    # release gets its own IN clause, so this has to stay well below the
+    # SQLite limit of 999 query parameters.
+    LOOKUP_BATCH_SIZE = 300
+
+    @staticmethod
+    def nevra_key(rpm_nevra):
+        """
+        Parse NEVRA into a (name, epoch, version, release, arch) tuple that
+        can be compared with rows from database.
+        """
+        nvra = parse_nvra(rpm_nevra)
+        return (nvra["name"], int(nvra["epoch"] or 0), nvra["version"], nvra["release"], nvra["arch"])
+
+    @staticmethod
+    def lookup_ids(keys):
+        """
+        Find ids of RPMs identified by (name, epoch, version, release, arch)
+        tuples. Returns a dict mapping the found keys to ids; keys of RPMs not
+        in the database are not included.
+        """
+        result = {}
+        keys = list(keys)
+        for start in range(0, len(keys), RPM.LOOKUP_BATCH_SIZE):
+            batch = set(keys[start:start + RPM.LOOKUP_BATCH_SIZE])
+            qs = RPM.objects.filter(name__in=set(k[0] for k in batch),
+                                    version__in=set(k[2] for k in batch),
+                                    release__in=set(k[3] for k in batch))
+            for row in qs.values_list('id', 'name', 'epoch', 'version', 'release', 'arch'):
+                if row[1:] in batch:
+                    result[row[1:]] = row[0]
+        return result
+
+    @staticmethod
+    def bulk_get_or_insert(cursor, rpms):
+        """
+        Make sure all given RPMs exist in the database. The `rpms` argument
+        is a dict mapping RPM NEVRA to a (srpm_nevra, filename) tuple. Returns
+        a dict mapping each NEVRA to id of the RPM.
+
+        Existing RPMs are found with a handful of keyed queries and the
+        missing ones are inserted with multi-row INSERT statements, so the
+        cost depends on the number of RPMs given, not on the size of the
+        table.
+        """
+        keys = dict((nevra, RPM.nevra_key(nevra)) for nevra in rpms)
+        ids = RPM.lookup_ids(set(keys.values()))
+        rows = []
+        for nevra, key in keys.iteritems():
+            if key in ids:
+                continue
+            srpm_nevra, filename = rpms[nevra]
+            srpm_name = parse_nvra(srpm_nevra)["name"] if srpm_nevra else key[0]
+            rows.append(key + (srpm_nevra, srpm_name, filename))
+        if rows:
+            bulk_insert_ignore(cursor, RPM._meta.db_table,
+                               ['name', 'epoch', 'version', 'release', 'arch',
+                                'srpm_nevra', 'srpm_name', 'filename'],
+                               rows)
+            ids.update(RPM.lookup_ids(row[:5] for row in rows))
+        return dict((nevra, ids[key]) for nevra, key in keys.iteritems())
+
     @property
     def sort_key(self):
         return (self.epoch, parse_epoch_version(self.version), parse_epoch_version(self.release))
@@ -130,17 +192,51 @@ class RPM(models.Model):
     def dependencies(self):
         """
         Get a dict with all deps of the RPM. All types of dependencies are
-        included.
+        included. Dependencies prefetched with `prefetch_related('dependency_set')`
+        are used if available.
         """
         result = {}
         choices = dict(Dependency.DEPENDENCY_TYPE_CHOICES)
         for type in choices.values():
             result[type] = []
-        for dep in Dependency.objects.filter(rpm=self):
+        for dep in self.dependency_set.all():
             result[choices[dep.type]].append(unicode(dep))
         return result
 
 
+def _encode_version_segments(value):
+    """
+    Encode segments of a version (or release) the way RPM compares them:
+    numbers are compared numerically and are newer than letters, more
+    segments mean newer version and tilde sorts before everything.
+    """
+    key = ''
+    for tilde, number, alpha in re.findall(r'(~)|(\d+)|([a-zA-Z]+)', value):
+        if tilde:
+            key += '0'
+        elif number:
+            key += '3' + encode_sortable_int(int(number))
+        else:
+            key += '2' + ''.join('%03d' % ord(c) for c in alpha) + '000'
+    return key + '1'
+
+
+def dependency_version_key(version):
+    """
+    Convert version from dependency constraint ([epoch:]version[-release])
+    to a string of digits. Comparing the strings (also in database) gives
+    the same result as comparing the versions.
+    """
+    if version is None:
+        return None
+    epoch = 0
+    m = re.match(r'^(\d+):(.*)$', version)
+    if m:
+        epoch, version = int(m.group(1)), m.group(2)
+    version, _, release = version.partition('-')
+    return encode_sortable_int(epoch) + _encode_version_segments(version) + _encode_version_segments(release)
+
+
 class Dependency(models.Model):
     PROVIDES = 1
     REQUIRES = 2
@@ -163,8 +259,15 @@ class Dependency(models.Model):
     name = models.CharField(max_length=200)
     version = models.CharField(max_length=200, blank=True, null=True)
     comparison = models.CharField(max_length=50, blank=True, null=True)
+    # Computed from version on save, see `dependency_version_key`.
+    version_key = models.CharField(max_length=1000, blank=True, null=True, editable=False)
     rpm = models.ForeignKey(RPM)
 
+    class Meta:
+        index_together = (
+            ("type", "name", "version_key"),
+        )
+
     def __unicode__(self):
         base_str = self.name
         if self.version:
@@ -182,11 +285,20 @@ class Dependency(models.Model):
             # programmer error can cause this to fail.
             raise ValidationError('Bad version constraint: both version and comparison must be specified.')
 
+    def save(self, *args, **kwargs):
+        self.version_key = dependency_version_key(self.version)
+        super(Dependency, self).save(*args, **kwargs)
+
+    @staticmethod
+    def save_many(dependencies):
+        """Insert new dependencies with as few queries as possible."""
+        for dep in dependencies:
+            dep.version_key = dependency_version_key(dep.version)
+        Dependency.objects.bulk_create(dependencies)
+
     @property
     def parsed_version(self):
-        if not hasattr(self, '_version'):
-            self._version = parse_epoch_version(self.version)
-        return self._version
+        return dependency_version_key(self.version)
 
     def is_satisfied_by(self, other):
         """
@@ -201,7 +313,7 @@ class Dependency(models.Model):
             '>': lambda x: x > self.parsed_version,
             '>=': lambda x: x >= self.parsed_version,
         }
-        return funcs[self.comparison](parse_epoch_version(other))
+        return funcs[self.comparison](dependency_version_key(other))
 
     def is_equal(self, other):
         """
@@ -209,7 +321,7 @@ class Dependency(models.Model):
 
         :paramtype other: string
         """
-        return self.parsed_version == parse_epoch_version(other)
+        return self.parsed_version == dependency_version_key(other)
 
     def is_higher(self, other):
         """
@@ -217,7 +329,7 @@ class Dependency(models.Model):
 
         :paramtype other: string
         """
-        return self.parsed_version > parse_epoch_version(other)
+        return self.parsed_version > dependency_version_key(other)
 
     def is_lower(self, other):
         """
@@ -225,7 +337,37 @@ class Dependency(models.Model):
 
         :paramtype other: string
         """
-        return self.parsed_version < parse_epoch_version(other)
+        return self.parsed_version < dependency_version_key(other)
+
+    @staticmethod
+    def conflicting_with(op, version):
+        """
+        Return a condition selecting dependencies whose constraint can not be
+        met by any version matching `op` and `version` (e.g. `>=` and `2.17`).
+        Dependencies without version never conflict.
+        """
+        key = dependency_version_key(version)
+        lower = models.Q(version_key__lt=key)
+        lower_or_equal = models.Q(version_key__lte=key)
+        higher = models.Q(version_key__gt=key)
+        higher_or_equal = models.Q(version_key__gte=key)
+        if op == '=':
+            return ((models.Q(comparison='=') & (lower | higher)) |
+                    (models.Q(comparison='<') & lower_or_equal) |
+                    (models.Q(comparison='<=') & lower) |
+                    (models.Q(comparison='>') & higher_or_equal) |
+                    (models.Q(comparison='>=') & higher))
+        if op == '>':
+            return models.Q(comparison__in=('<', '<=', '=')) & lower_or_equal
+        if op == '<':
+            return models.Q(comparison__in=('>', '>=', '=')) & higher_or_equal
+        if op == '>=':
+            return ((models.Q(comparison='<') & lower_or_equal) |
+                    (models.Q(comparison__in=('<=', '=')) & lower))
+        if op == '<=':
+            return ((models.Q(comparison='>') & higher_or_equal) |
+                    (models.Q(comparison__in=('>=', '=')) & higher))
+        raise ValueError('Unknown comparison %s' % op)
 
 
 class ImageFormat(models.Model):
@@ -234,12 +376,12 @@ class ImageFormat(models.Model):
     def __unicode__(self):
         return u"%s" % self.name
 
-    CACHE = {}
+    CACHE = LookupCache('name')
 
     @classmethod
     def get_cached_id(cls, value):
         """cached `name` to `id`"""
-        return get_cached_id(cls, "name", value)
+        return get_cached_id(cls, value)
 
 
 class ImageType(models.Model):
@@ -248,12 +390,12 @@ class ImageType(models.Model):
     def __unicode__(self):
         return u"%s" % self.name
 
-    CACHE = {}
+    CACHE = LookupCache('name')
 
     @classmethod
     def get_cached_id(cls, value):
         """cached `name` to `id`"""
-        return get_cached_id(cls, "name", value)
+        return get_cached_id(cls, value)
 
 
 class Image(models.Model):
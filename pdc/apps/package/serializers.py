@@ -72,12 +72,19 @@ class RPMSerializer(StrictSerializerMixin,
                   'srpm_nevra', 'filename', 'linked_releases', 'linked_composes',
                   'dependencies', 'built_for_release')
 
+    def _save_dependencies(self, instance, dependencies):
+        for dep in dependencies:
+            dep.rpm = instance
+        models.Dependency.save_many(dependencies)
+        # Drop dependencies prefetched before the change. The prefetch cache is
+        # keyed by the related query name.
+        cache_name = models.Dependency._meta.get_field('rpm').related_query_name()
+        getattr(instance, '_prefetched_objects_cache', {}).pop(cache_name, None)
+
     def create(self, validated_data):
         dependencies = validated_data.pop('dependencies', [])
         instance = super(RPMSerializer, self).create(validated_data)
-        for dep in dependencies:
-            dep.rpm = instance
-            dep.save()
+        self._save_dependencies(instance, dependencies)
         return instance
 
     def update(self, instance, validated_data):
@@ -85,9 +92,7 @@ class RPMSerializer(StrictSerializerMixin,
         instance = super(RPMSerializer, self).update(instance, validated_data)
         if dependencies is not None or not self.partial:
             models.Dependency.objects.filter(rpm=instance).delete()
-            for dep in dependencies or []:
-                dep.rpm = instance
-                dep.save()
+            self._save_dependencies(instance, dependencies or [])
         return instance
 
 
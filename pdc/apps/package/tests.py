@@ -3,13 +3,21 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
+import json
+import mock
+from StringIO import StringIO
+
 from django.test import TestCase
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from pdc.apps.bindings import models as binding_models
+from pdc.apps.common import filters as common_filters
 from pdc.apps.common.test_utils import TestCaseWithChangeSetMixin
 from pdc.apps.component import models as component_models
 from pdc.apps.release import models as release_models
@@ -52,6 +60,33 @@ class RPMSortKeyTestCase(TestCase):
             self.assertTrue(p1.sort_key < p2.sort_key, msg="%s < %s" % (v1, v2))
 
 
+class DependencyVersionKeyTestCase(TestCase):
+    def test_version_ordering(self):
+        data = [("1.0", "2.0"),
+                ("2.0", "10.0"),
+                ("3.0", "1:2.0"),
+                ("3.0-1.fc22", "3.0-2.fc22"),
+                ("1.0~rc1", "1.0"),
+                ("1.0", "1.0.1"),
+                ("3.2.5d", "3.2.5e")]
+
+        for v1, v2 in data:
+            self.assertLess(models.dependency_version_key(v1), models.dependency_version_key(v2),
+                            msg="%s < %s" % (v1, v2))
+        self.assertEqual(models.dependency_version_key("0:3.0"), models.dependency_version_key("3.0"))
+
+    def test_update_missing_keys(self):
+        rpm = models.RPM.objects.create(name='test-pkg', epoch=0, version='1.0',
+                                        release='1', arch='x86_64', srpm_name='test-pkg',
+                                        srpm_nevra='test-pkg-0:1.0-1.src', filename='dummy')
+        dep = rpm.dependency_set.create(name='pkg', version='2.17', comparison='>=',
+                                        type=models.Dependency.REQUIRES)
+        models.Dependency.objects.update(version_key=None)
+        call_command('update_dependency_version_keys', stdout=StringIO())
+        self.assertEqual(models.Dependency.objects.get(pk=dep.pk).version_key,
+                         models.dependency_version_key('2.17'))
+
+
 class RPMSaveValidationTestCase(TestCase):
     def test_empty_srpm_nevra_with_arch_is_src(self):
         rpm = models.RPM.objects.create(name='kernel', epoch=0, version='3.19.3', release='100',
@@ -80,6 +115,31 @@ class RPMSaveValidationTestCase(TestCase):
         self.assertEqual(0, models.RPM.objects.count())
 
 
+class RPMBulkInsertTestCase(TestCase):
+    fixtures = [
+        'pdc/apps/package/fixtures/test/rpm.json',
+    ]
+
+    def test_bulk_get_or_insert_reuses_existing_and_inserts_missing(self):
+        from django.db import connection
+        rpms = {
+            'bash-0:1.2.3-4.b1.x86_64': ('bash-0:1.2.3-4.b1.src', 'bash-1.2.3-4.b1.x86_64.rpm'),
+            'bash-0:1.2.3-5.x86_64': ('bash-0:1.2.3-5.src', 'bash-1.2.3-5.x86_64.rpm'),
+            'bash-0:1.2.3-5.src': ('bash-0:1.2.3-5.src', 'bash-1.2.3-5.src.rpm'),
+        }
+        count = models.RPM.objects.count()
+        ids = models.RPM.bulk_get_or_insert(connection.cursor(), rpms)
+        self.assertEqual(ids['bash-0:1.2.3-4.b1.x86_64'], 1)
+        self.assertEqual(models.RPM.objects.count(), count + 2)
+        rpm = models.RPM.objects.get(pk=ids['bash-0:1.2.3-5.x86_64'])
+        self.assertEqual(rpm.nevra, 'bash-0:1.2.3-5.x86_64')
+        self.assertEqual(rpm.srpm_name, 'bash')
+        self.assertEqual(rpm.filename, 'bash-1.2.3-5.x86_64.rpm')
+
+        self.assertEqual(models.RPM.bulk_get_or_insert(connection.cursor(), rpms), ids)
+        self.assertEqual(models.RPM.objects.count(), count + 2)
+
+
 class RPMDepsFilterAPITestCase(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -578,6 +638,18 @@ class RPMDepsAPITestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.assertEqual(with_version.version, '0.1.0')
         self.assertNumChanges([1])
 
+    def test_list_prefetches_deps(self):
+        for rpm in models.RPM.objects.all():
+            models.Dependency.objects.create(type=models.Dependency.REQUIRES,
+                                             name='required', rpm=rpm)
+        table = models.Dependency._meta.db_table
+        for page_size in (1, models.RPM.objects.count()):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('rpms-list'), {'page_size': page_size})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['results'][0]['dependencies']['requires'], ['required'])
+            self.assertEqual(len([q for q in queries if table in q['sql']]), 1)
+
     def test_create_rpm_with_duplicate_deps(self):
         data = {'name': 'fake_bash', 'version': '1.2.3', 'epoch': 0,
                 'release': '4.b1', 'arch': 'x86_64', 'srpm_name': 'bash',
@@ -641,6 +713,16 @@ class RPMDepsAPITestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.assertEqual(dep.type, models.Dependency.REQUIRES)
         self.assertNumChanges([1])
 
+    def test_update_returns_new_dependencies(self):
+        models.Dependency.objects.create(type=models.Dependency.SUGGESTS,
+                                         name='suggested', rpm_id=1)
+        data = {'dependencies': {'requires': ['required-package']}}
+        response = self.client.patch(reverse('rpms-detail', args=[1]), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['dependencies']['requires'], ['required-package'])
+        self.assertEqual(response.data['dependencies']['suggests'], [])
+        self.assertNumChanges([1])
+
     def test_patch_to_rpm_with_none(self):
         data = {'dependencies': {'requires': ['required-package']}}
         response = self.client.patch(reverse('rpms-detail', args=[1]), data, format='json')
@@ -770,6 +852,40 @@ class RPMAPIRESTTestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data.get('count'), 3)
 
+    def test_query_all_rpms_unpaginated_is_streamed(self):
+        url = reverse('rpms-list')
+        expected = self.client.get(url, format='json').data['results']
+        with mock.patch('pdc.apps.package.views.RPMViewSet.stream_chunk_size', 2):
+            response = self.client.get(url + '?page_size=-1', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(''.join(response.streaming_content)), json.loads(json.dumps(expected)))
+
+    def test_query_all_rpms_streamed_by_nullable_field(self):
+        url = reverse('rpms-list')
+        for ordering in ('srpm_nevra', '-srpm_nevra'):
+            expected = list(models.RPM.objects.order_by(ordering, 'pk').values_list('pk', flat=True))
+            with mock.patch('pdc.apps.package.views.RPMViewSet.stream_chunk_size', 1):
+                response = self.client.get(url, {'page_size': -1, 'ordering': ordering}, format='json')
+            self.assertTrue(response.streaming)
+            self.assertEqual([rpm['id'] for rpm in json.loads(''.join(response.streaming_content))], expected)
+
+    def _walk_cursor_pages(self, params):
+        url = reverse('rpms-list')
+        ids = []
+        response = self.client.get(url, dict(params, cursor='', page_size=1))
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(rpm['id'] for rpm in response.data['results'])
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_pagination_by_nullable_field(self):
+        for ordering in ('srpm_nevra', '-srpm_nevra'):
+            expected = list(models.RPM.objects.order_by(ordering, 'pk').values_list('pk', flat=True))
+            self.assertEqual(self._walk_cursor_pages({'ordering': ordering}), expected)
+
     def test_query_with_params(self):
         url = reverse('rpms-list')
         response = self.client.get(url + '?name=^bash$', format='json')
@@ -848,6 +964,24 @@ class RPMAPIRESTTestCase(TestCaseWithChangeSetMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data.get('count'), 2)
 
+    def test_query_name_with_regexp_is_case_sensitive(self):
+        url = reverse('rpms-list')
+        for name in ('^Bash$', '^Bash', 'BASH', 'Doc'):
+            response = self.client.get(url, {'name': name}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data.get('count'), 0)
+
+    @mock.patch.object(common_filters.MultiValueRegexFilter, 'case_sensitive_like_vendors', (connection.vendor, ))
+    def test_query_name_strategy_stats(self):
+        url = reverse('rpms-list')
+        common_filters.reset_regex_filter_stats()
+        for name, strategy in [('^bash$', 'exact'), ('^bash-', 'prefix'),
+                               ('doc', 'substring'), ('doc$', 'regex')]:
+            response = self.client.get(url, {'name': name}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data.get('count'), 1 if strategy != 'prefix' else 2)
+            self.assertGreater(common_filters.get_regex_filter_stats()[strategy]['queries'], 0)
+
         response = self.client.get(url + '?name=bash.%2B', format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data.get('count'), 2)
@@ -18,12 +18,12 @@ class RPMViewSet(pdc_viewsets.StrictQueryParamMixin,
                  pdc_viewsets.ChangeSetCreateModelMixin,
                  pdc_viewsets.ChangeSetUpdateModelMixin,
                  mixins.RetrieveModelMixin,
-                 mixins.ListModelMixin,
+                 pdc_viewsets.StreamingListModelMixin,
                  viewsets.GenericViewSet):
     """
     API endpoint that allows RPMs to be viewed.
     """
-    queryset = models.RPM.objects.all().order_by("id")
+    queryset = models.RPM.objects.all().order_by("id").prefetch_related('dependency_set')
     serializer_class = serializers.RPMSerializer
     filter_class = filters.RPMFilter
     permission_classes = (APIPermission,)
@@ -133,7 +133,7 @@ class RPMViewSet(pdc_viewsets.StrictQueryParamMixin,
 
 
 class ImageViewSet(pdc_viewsets.StrictQueryParamMixin,
-                   mixins.ListModelMixin,
+                   pdc_viewsets.StreamingListModelMixin,
                    viewsets.GenericViewSet):
     """
     List and query images.
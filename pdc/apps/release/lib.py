@@ -97,13 +97,12 @@ def release__import_from_composeinfo(request, composeinfo_json):
     common_hacks.deserialize_wrapper(ci.deserialize, composeinfo_json)
 
     if ci.release.is_layered:
-        release_type_obj = models.ReleaseType.objects.get(short=getattr(ci.base_product, "type", "ga"))
         base_product_obj, _ = _logged_get_or_create(
             request, models.BaseProduct,
             name=ci.base_product.name,
             short=ci.base_product.short.lower(),
             version=ci.base_product.version,
-            release_type=release_type_obj,
+            release_type_id=models.ReleaseType.get_cached_id(getattr(ci.base_product, "type", "ga")),
         )
     else:
         base_product_obj = None
@@ -121,14 +120,13 @@ def release__import_from_composeinfo(request, composeinfo_json):
         version=ci.release.major_version
     )
 
-    release_type_obj = models.ReleaseType.objects.get(short=getattr(ci.release, "type", "ga"))
     release_obj, _ = _logged_get_or_create(
         request, models.Release,
         name=ci.release.name,
         short=ci.release.short.lower(),
         version=ci.release.version,
         base_product=base_product_obj,
-        release_type=release_type_obj,
+        release_type_id=models.ReleaseType.get_cached_id(getattr(ci.release, "type", "ga")),
         product_version=product_version_obj,
     )
 
@@ -142,7 +140,7 @@ def release__import_from_composeinfo(request, composeinfo_json):
     add_to_changelog = []
 
     for variant in ci.variants.get_variants(recursive=True):
-        variant_type = models.VariantType.objects.get(name=variant.type)
+        variant_type_id = models.VariantType.get_cached_id(variant.type)
         release = variant.release
         integrated_variant = None
         if release.name:
@@ -156,7 +154,7 @@ def release__import_from_composeinfo(request, composeinfo_json):
                 variant_id=variant.id,
                 variant_uid=variant.uid,
                 variant_name=variant.name,
-                variant_type=models.VariantType.objects.get(name='variant')
+                variant_type_id=models.VariantType.get_cached_id('variant')
             )
             if created:
                 add_to_changelog.append(integrated_variant)
@@ -165,19 +163,19 @@ def release__import_from_composeinfo(request, composeinfo_json):
             variant_id=variant.id,
             variant_uid=variant.uid,
             variant_name=variant.name,
-            variant_type=variant_type,
+            variant_type_id=variant_type_id,
         )
         if created:
             add_to_changelog.append(variant_obj)
         for arch in variant.arches:
-            arch_obj = common_models.Arch.objects.get(name=arch)
+            arch_id = common_models.Arch.get_cached_id(arch)
             var_arch_obj, _ = models.VariantArch.objects.get_or_create(
-                arch=arch_obj,
+                arch_id=arch_id,
                 variant=variant_obj
             )
             if integrated_variant:
                 models.VariantArch.objects.get_or_create(
-                    arch=arch_obj,
+                    arch_id=arch_id,
                     variant=integrated_variant
                 )
 
@@ -17,6 +17,7 @@ from productmd.common import RELEASE_SHORT_RE, RELEASE_VERSION_RE
 from productmd.common import create_release_id
 
 from pdc.apps.common.hacks import as_list
+from pdc.apps.common.models import LookupCache, get_cached_id
 from . import signals
 
 
@@ -28,6 +29,13 @@ class ReleaseType(models.Model):
     def __unicode__(self):
         return u"%s" % self.short
 
+    CACHE = LookupCache('short')
+
+    @classmethod
+    def get_cached_id(cls, value):
+        """cached `short` to `id`"""
+        return get_cached_id(cls, value)
+
 
 class BaseProduct(models.Model):
     # base_product_id is populated by populate_base_product_id() pre_save hook
@@ -219,10 +227,10 @@ class Release(models.Model):
         Find latest compose for this release. If there are no composes, this
         function returns `None`.
         """
-        composes = sorted(self.get_all_composes())
-        if not composes:
-            return None
-        return composes[-1]
+        return (self.compose_set.model.objects
+                .filter(models.Q(release=self) | models.Q(linked_releases=self))
+                .order_by('-sort_key')
+                .first())
 
     @property
     def trees(self):
@@ -272,6 +280,13 @@ class VariantType(models.Model):
     def __unicode__(self):
         return u"%s" % (self.name, )
 
+    CACHE = LookupCache('name')
+
+    @classmethod
+    def get_cached_id(cls, value):
+        """cached `name` to `id`"""
+        return get_cached_id(cls, value)
+
 
 class Variant(models.Model):
     release             = models.ForeignKey(Release)
@@ -8,7 +8,7 @@
 
 from django.db import models
 
-from pdc.apps.common.models import get_cached_id
+from pdc.apps.common.models import LookupCache, get_cached_id
 
 
 class Service(models.Model):
@@ -19,12 +19,12 @@ class Service(models.Model):
     def __unicode__(self):
         return u"%s" % self.name
 
-    CACHE = {}
+    CACHE = LookupCache('name')
 
     @classmethod
     def get_cached_id(cls, value):
         """cached `name` to `id`"""
-        return get_cached_id(cls, "name", value)
+        return get_cached_id(cls, value)
 
 
 class ContentFormat(models.Model):
@@ -44,12 +44,12 @@ class ContentCategory(models.Model):
     def __unicode__(self):
         return u"%s" % self.name
 
-    CACHE = {}
+    CACHE = LookupCache('name')
 
     @classmethod
     def get_cached_id(cls, value):
         """cached `name` to `id`"""
-        return get_cached_id(cls, "name", value)
+        return get_cached_id(cls, value)
 
 
 class RepoFamily(models.Model):
@@ -3,6 +3,13 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
+import atexit
+import logging
+import threading
+import time
+
+from django import db
+from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.conf import settings
 import re
@@ -10,12 +17,120 @@ import re
 from . import models
 
 
+logger = logging.getLogger(__name__)
+
+
+class UsageBuffer(object):
+    """
+    Collect tracking information in memory and write it to the database in
+    batches. Only the latest access for each user and each (resource, method)
+    pair is kept, so the number of queries for a flush does not depend on the
+    number of requests.
+
+    The buffer is flushed when it holds `USAGE_FLUSH_SIZE` records and every
+    `USAGE_FLUSH_SECONDS` by a background thread. With zero seconds each
+    record is written immediately.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Flushes must not overlap, older data could overwrite newer.
+        self._flush_lock = threading.Lock()
+        self._users = {}
+        self._resources = {}
+        self._flusher = None
+
+    @property
+    def flush_seconds(self):
+        return getattr(settings, 'USAGE_FLUSH_SECONDS', 30)
+
+    @property
+    def flush_size(self):
+        return getattr(settings, 'USAGE_FLUSH_SIZE', 1000)
+
+    def record(self, user_id, resource, method, now):
+        """
+        Remember access to `resource` by user with `user_id` (which can be
+        None for anonymous access, or resource can be None if only the
+        user's access time should be updated).
+        """
+        with self._lock:
+            if user_id is not None and self._users.get(user_id, now) <= now:
+                self._users[user_id] = now
+            if resource is not None:
+                key = (resource, method)
+                if key not in self._resources or self._resources[key][1] <= now:
+                    self._resources[key] = (user_id, now)
+            size = len(self._users) + len(self._resources)
+        if self.flush_seconds <= 0 or size >= self.flush_size:
+            self.flush()
+        else:
+            self._start_flusher()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                users, self._users = self._users, {}
+                resources, self._resources = self._resources, {}
+            self._write(users, resources)
+
+    def _write(self, users, resources):
+        if not users and not resources:
+            return
+        # Users that connected at the same time are updated by one query.
+        by_time = {}
+        for user_id, last_connected in users.iteritems():
+            by_time.setdefault(last_connected, []).append(user_id)
+        for last_connected, user_ids in by_time.iteritems():
+            get_user_model().objects.filter(pk__in=user_ids).update(last_connected=last_connected)
+        for (resource, method), (user_id, now) in resources.iteritems():
+            updated = models.ResourceUsage.objects.filter(
+                resource=resource, method=method
+            ).update(user=user_id, time=now)
+            if not updated:
+                models.ResourceUsage.objects.update_or_create(
+                    resource=resource, method=method,
+                    defaults={'user_id': user_id, 'time': now}
+                )
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name='usage-flusher')
+                self._flusher.daemon = True
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to store usage information.')
+            finally:
+                # The thread has its own connection, do not keep it open while sleeping.
+                db.connection.close()
+
+
+USAGE_BUFFER = UsageBuffer()
+
+
+@atexit.register
+def _flush_usage_buffer():
+    try:
+        USAGE_BUFFER.flush()
+    except Exception:
+        logger.exception('Failed to store usage information.')
+
+
 class UsageMiddleware(object):
     """
     This middleware class updates tracking information in the database on each
     request to the API. The information stored is last access time for each
     user and last access details about each resource (user, time, resource
-    name, method). Super users are excluded from resource tracking.
+    name, method). Super users are excluded from resource tracking. The
+    information is buffered by `UsageBuffer`.
     """
     def process_view(self, request, view_func, *args, **kwargs):
         # If user authenticates with a token, the user identity can not be
@@ -32,20 +147,14 @@ class UsageMiddleware(object):
         if not data:
             return response
 
-        user = None
+        user_id = None
+        resource = data['resource']
         if request.user and request.user.is_authenticated():
-            user = request.user
-            user.last_connected = data['now']
-            user.save()
-
+            user_id = request.user.pk
             if request.user.is_superuser:
                 # We don't want to log accesses by superusers
-                return response
+                resource = None
 
-        models.ResourceUsage.objects.update_or_create(
-            resource=data['resource'],
-            method=request.method,
-            defaults={'user': user, 'time': data['now']}
-        )
+        USAGE_BUFFER.record(user_id, resource, request.method, data['now'])
 
         return response
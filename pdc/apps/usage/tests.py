@@ -8,11 +8,13 @@ import mock
 from rest_framework.test import APITestCase
 from django.core.urlresolvers import reverse
 from django.contrib.auth import get_user_model
+from django.test.utils import override_settings
 from django.utils import timezone
 
 from rest_framework.authtoken.models import Token
 from pdc.apps.common.test_utils import create_user
 from . import models
+from .middleware import USAGE_BUFFER
 
 
 class UsageTestCase(APITestCase):
@@ -51,3 +53,20 @@ class UsageTestCase(APITestCase):
         record = models.ResourceUsage.objects.get(resource='APIRoot', method='GET')
         self.assertEqual(record.user, user)
         self.assertEqual(record.time, self.now)
+
+    @override_settings(USAGE_FLUSH_SECONDS=3600)
+    @mock.patch('django.utils.timezone.now')
+    def test_usage_is_buffered_until_flush(self, time_mock):
+        time_mock.return_value = self.now
+        # Flushing thread is not started, the test flushes explicitly.
+        with mock.patch.object(USAGE_BUFFER, '_start_flusher'):
+            self.client.get(reverse('api-root'), HTTP_AUTHORIZATION=self.user_token)
+            self.client.get(reverse('api-root'), HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(0, models.ResourceUsage.objects.count())
+        self.assertIsNone(get_user_model().objects.get(username='user').last_connected)
+
+        USAGE_BUFFER.flush()
+        user = get_user_model().objects.get(username='user')
+        self.assertEqual(user.last_connected, self.now)
+        record = models.ResourceUsage.objects.get(resource='APIRoot', method='GET')
+        self.assertEqual(record.user, user)
@@ -6,7 +6,7 @@
 from django.conf import settings
 
 from .messaging import (DummyMessenger, KombuMessenger, FedmsgMessenger,
-                        ProtonMessenger, StompMessenger)
+                        ProtonMessenger, StompMessenger, LocalMessenger)
 
 
 MESSENGERS = {
@@ -14,6 +14,7 @@ MESSENGERS = {
     'fedmsg': FedmsgMessenger,
     'proton': ProtonMessenger,
     'stomp': StompMessenger,
+    'local': LocalMessenger,
 }
 
 # init messenger
@@ -0,0 +1,44 @@
+#
+# Copyright (c) 2015 Red Hat
+# Licensed under The MIT License (MIT)
+# http://opensource.org/licenses/MIT
+#
+import logging
+import time
+
+from django import db
+from django.core.management.base import BaseCommand
+
+from pdc.apps.utils import messenger
+from pdc.apps.utils.messaging import dispatch_outbox
+
+
+logger = logging.getLogger(__name__)
+
+
+def run_dispatcher(batch_size, poll_interval, once):
+    while True:
+        db.close_old_connections()
+        published = dispatch_outbox(messenger, batch_size)
+        if published:
+            logger.info('Published %d messages.' % published)
+        if once:
+            return
+        if not published:
+            time.sleep(poll_interval)
+
+
+class Command(BaseCommand):
+    help = ('Publish messages stored in outbox to the message bus. Only one '
+            'dispatcher should run so that messages keep their order.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Number of messages loaded from database at once.')
+        parser.add_argument('--poll-interval', type=float, default=1,
+                            help='Number of seconds to wait when there is no message to publish.')
+        parser.add_argument('--once', action='store_true', default=False,
+                            help='Exit when all messages that are due were processed.')
+
+    def handle(self, *args, **options):
+        run_dispatcher(max(1, options['batch_size']), options['poll_interval'], options['once'])
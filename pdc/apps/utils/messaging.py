@@ -4,14 +4,20 @@
 # http://opensource.org/licenses/MIT
 #
 import json
+import threading
+from datetime import timedelta
 
 from django.conf import settings
-from django.utils import six
+from django.db import transaction
+from django.utils import six, timezone
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Longest delay (in seconds) before a failed message is published again.
+OUTBOX_MAX_RETRY_DELAY = 300
+
 
 class DummyMessenger(object):
     def __init__(self):
@@ -21,6 +27,25 @@ class DummyMessenger(object):
         pass
 
 
+class LocalMessenger(object):
+    """
+    Keep published messages in memory and optionally append them as JSON
+    lines to `MESSAGE_BUS['FILE']`. It is meant for development and tests
+    where there is no broker.
+    """
+    def __init__(self):
+        self.messages = []
+        self.path = settings.MESSAGE_BUS.get('FILE')
+        self._lock = threading.Lock()
+
+    def send_message(self, topic, msg):
+        with self._lock:
+            self.messages.append((topic, msg))
+            if self.path:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps({'topic': topic, 'msg': msg}) + '\n')
+
+
 class KombuMessenger(object):
     def __init__(self):
         from kombu import Connection, Exchange
@@ -81,14 +106,82 @@ class StompMessenger(object):
             return False
         return True
 
-    def send_message(self, topic, msg):
+    def publish(self, topic, msg):
+        """Send the message or raise an exception if it is not possible."""
         address = '/topic/' + settings.MESSAGE_BUS['TOPIC'] + str(topic)
-        if self.connected or self.do_connect():
+        if not self.connected:
+            self.connected = self.do_connect()
+        if not self.connected:
+            raise IOError("Failed to Connect to Messaging Server.")
+        try:
+            self.connection.send(body=msg, destination=address,
+                                 headers={'persistent': 'true'},
+                                 auto='true')
+        except Exception:
+            self.connected = False
+            raise
+
+    def send_message(self, topic, msg):
+        try:
+            self.publish(topic, msg)
+        except Exception, e:
+            logger.warn("Send Message exception(%s): %s." % (type(e), e))
+
+
+def outbox_enabled():
+    return settings.MESSAGE_BUS.get('OUTBOX', False)
+
+
+def store_messages(request):
+    """
+    Move messages queued by the request to the outbox. This must be called in
+    the transaction that saves the changes, the messages are then published
+    only if it is committed. Does nothing if outbox is not enabled.
+    """
+    if not outbox_enabled() or not getattr(request, '_messagings', None):
+        return
+    from .models import OutboxMessage
+    OutboxMessage.store(request._messagings)
+    request._messagings = []
+
+
+def dispatch_outbox(messenger, batch_size=100):
+    """
+    Publish all messages from outbox that are due. Messages with the same
+    topic are published in the order they were stored: when one fails, the
+    following ones with the same topic wait until it is retried. Return the
+    number of published messages.
+    """
+    from .models import OutboxMessage
+    publish = getattr(messenger, 'publish', messenger.send_message)
+    blocked_topics = set()
+    published = 0
+    last_pk = 0
+    while True:
+        batch = list(OutboxMessage.objects.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            return published
+        last_pk = batch[-1].pk
+        now = timezone.now()
+        sent = []
+        for message in batch:
+            if message.topic in blocked_topics:
+                continue
+            if message.available_on > now:
+                blocked_topics.add(message.topic)
+                continue
             try:
-                self.connection.send(body=msg, destination=address,
-                                     headers={'persistent': 'true'},
-                                     auto='true')
-            except Exception, e:
-                logger.warn("Send Message exception(%s): %s." % (type(e), e))
-        else:
-            logger.warn("Send Message exception: Failed to Connect to Messaging Server.")
+                publish(message.topic, message.body)
+            except Exception as e:
+                logger.warn("Publishing message %s failed (%s): %s." % (message.pk, type(e), e))
+                blocked_topics.add(message.topic)
+                message.attempts += 1
+                message.last_error = '%s: %s' % (type(e).__name__, e)
+                delay = min(2 ** message.attempts, OUTBOX_MAX_RETRY_DELAY)
+                message.available_on = now + timedelta(seconds=delay)
+                message.save(update_fields=['attempts', 'last_error', 'available_on'])
+            else:
+                sent.append(message.pk)
+        with transaction.atomic():
+            OutboxMessage.objects.filter(pk__in=sent).delete()
+        published += len(sent)
@@ -0,0 +1,33 @@
+#
+# Copyright (c) 2015 Red Hat
+# Licensed under The MIT License (MIT)
+# http://opensource.org/licenses/MIT
+#
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxMessage(models.Model):
+    """
+    Message waiting to be published to the message bus. Messages are stored
+    in the same transaction as the changes they describe and published by
+    the `dispatch_messages` management command. Published messages are
+    deleted.
+    """
+    topic               = models.CharField(max_length=200)
+    body                = models.TextField()
+    created_on          = models.DateTimeField(default=timezone.now)
+    # Failed messages are retried after this time.
+    available_on        = models.DateTimeField(default=timezone.now)
+    attempts            = models.PositiveIntegerField(default=0)
+    last_error          = models.TextField(blank=True)
+
+    def __unicode__(self):
+        return u'%s: %s' % (self.topic, self.body)
+
+    @staticmethod
+    def store(messages):
+        """Store a list of (topic, body) pairs in the order they were created."""
+        now = timezone.now()
+        OutboxMessage.objects.bulk_create([OutboxMessage(topic=topic, body=body, created_on=now, available_on=now)
+                                           for topic, body in messages])
@@ -3,17 +3,20 @@
 # Licensed under The MIT License (MIT)
 # http://opensource.org/licenses/MIT
 #
-from datetime import datetime
+from datetime import datetime, timedelta
 import random
 import time
 
 from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 
 from .templatetags.epochformat import epochformat
+from .messaging import LocalMessenger, dispatch_outbox
+from .models import OutboxMessage
 
 
 class EpochFormatTest(TestCase):
@@ -82,3 +85,40 @@ class TestCacheRESTTestCase(APITestCase):
         self.assertEqual(response.data['count'], 1)
 
         settings.CACHE_MIDDLEWARE_SECONDS = tmp
+
+
+class FailingMessenger(LocalMessenger):
+    def __init__(self, failing_topics):
+        super(FailingMessenger, self).__init__()
+        self.failing_topics = failing_topics
+
+    def publish(self, topic, msg):
+        if topic in self.failing_topics:
+            raise IOError('Broker is down')
+        self.send_message(topic, msg)
+
+
+class OutboxTestCase(TestCase):
+    def test_dispatch_publishes_messages_in_order_and_deletes_them(self):
+        OutboxMessage.store([('.a', '1'), ('.b', '2'), ('.a', '3')])
+        messenger = LocalMessenger()
+        self.assertEqual(dispatch_outbox(messenger, batch_size=2), 3)
+        self.assertEqual(messenger.messages, [('.a', '1'), ('.b', '2'), ('.a', '3')])
+        self.assertEqual(OutboxMessage.objects.count(), 0)
+
+    def test_failed_message_blocks_its_topic_until_retried(self):
+        OutboxMessage.store([('.a', '1'), ('.b', '2'), ('.a', '3')])
+        messenger = FailingMessenger(failing_topics=['.a'])
+        self.assertEqual(dispatch_outbox(messenger), 1)
+        self.assertEqual(messenger.messages, [('.b', '2')])
+        failed = OutboxMessage.objects.order_by('pk')
+        self.assertEqual([(m.body, m.attempts) for m in failed], [('1', 1), ('3', 0)])
+        self.assertIn('Broker is down', failed[0].last_error)
+
+        # Not retried before the delay passes.
+        messenger.failing_topics = []
+        self.assertEqual(dispatch_outbox(messenger), 0)
+
+        OutboxMessage.objects.update(available_on=timezone.now() - timedelta(hours=1))
+        self.assertEqual(dispatch_outbox(messenger), 2)
+        self.assertEqual(messenger.messages, [('.b', '2'), ('.a', '1'), ('.a', '3')])
@@ -43,11 +43,54 @@ ITEMS_PER_PAGE = 50
 ALLOW_ALL_USER_READ = True
 # enable all resource permissions
 DISABLE_RESOURCE_PERMISSION_CHECK = False
+# how long (in seconds) are resources and permissions of users cached in
+# each process, changes made by other processes are visible after this time
+PERMISSION_CACHE_SECONDS = 60
 
 
 # send email to admin if one changeset's change is equal or greater than CHANGESET_SIZE_ANNOUNCE
 CHANGESET_SIZE_ANNOUNCE = 1000
 
+# maximum number of changes inserted by one query when a changeset is committed
+CHANGESET_COMMIT_BATCH_SIZE = 1000
+
+# maximum number of changes shown in changeset API, the rest is available in
+# the changes sub-resource of the changeset
+CHANGESET_MAX_CHANGES = 1000
+
+# changes of changesets older than this number of days are moved to a
+# compressed archive by the `archive_changesets` management command
+CHANGESET_ARCHIVE_DAYS = 365
+
+# store updates in changesets as a difference against the old value, the API
+# still returns complete values
+CHANGESET_COMPACT_STORAGE = False
+
+# usage tracking is kept in memory of each process and written to database
+# every USAGE_FLUSH_SECONDS or when it has USAGE_FLUSH_SIZE records
+USAGE_FLUSH_SECONDS = 30
+USAGE_FLUSH_SIZE = 1000
+
+# maximum number of compose paths kept in memory by each process, the least
+# recently used ones are evicted
+PATH_CACHE_SIZE = 10000
+
+# workers running asynchronous compose imports store a heartbeat every
+# COMPOSE_IMPORT_HEARTBEAT_SECONDS, a running job without heartbeat for
+# COMPOSE_IMPORT_STALE_SECONDS is put back to the queue
+COMPOSE_IMPORT_HEARTBEAT_SECONDS = 30
+COMPOSE_IMPORT_STALE_SECONDS = 600
+
+# alias of a database connection used for storing progress of asynchronous
+# compose imports while the import transaction is open; it should be a copy
+# of the 'default' entry in DATABASES with 'TEST': {'MIRROR': 'default'},
+# without it the progress is only stored when the import finishes
+# COMPOSE_IMPORT_PROGRESS_DB = 'compose_import_progress'
+
+# maximum number of composes whose RPMs are kept in memory of each process
+# for computing RPM mappings
+RPM_MAPPING_CACHE_SIZE = 10
+
 # Application definition
 
 INSTALLED_APPS = (
@@ -130,6 +173,7 @@ MIDDLEWARE_CLASSES = [
 if 'test' in sys.argv:
     MIDDLEWARE_CLASSES.remove('pdc.apps.utils.middleware.RestrictAdminMiddleware')
     CACHE_MIDDLEWARE_SECONDS = 0
+    USAGE_FLUSH_SECONDS = 0
 
 AUTHENTICATION_BACKENDS = (
     'pdc.apps.auth.backends.KerberosUserBackend',
@@ -209,6 +253,8 @@ REST_API_VERSION = 'v1'
 REST_API_PAGE_SIZE = 20
 REST_API_PAGE_SIZE_QUERY_PARAM = 'page_size'
 REST_API_MAX_PAGE_SIZE = 100
+# number of items read and rendered at once when streaming unpaginated lists
+REST_API_STREAM_CHUNK_SIZE = 1000
 
 API_HELP_TEMPLATE = "api/help.html"
 
@@ -317,6 +363,14 @@ MESSAGE_BUS = {
     # 'TOPIC': 'pdc',
     # 'CERT_FILE': '',
     # 'KEY_FILE': '',
+    #
+    # # `local` config items (keeps messages in memory, for development):
+    # 'MLP': 'local',
+    # 'FILE': '/tmp/pdc-messages.json',    # optional, append messages as JSON lines
+    #
+    # # Store messages in database in the same transaction as the changes and
+    # # publish them with `manage.py dispatch_messages`:
+    # 'OUTBOX': True,
 }
 
 # ======== Email configuration =========